@@ -0,0 +1,207 @@
+"""
+Benchmark Suite
+
+This module measures the recommender pipeline on synthetic catalogs of
+increasing size and writes the results to a JSON file:
+
+    fit_docs_per_s        CustomTfidfVectorizer.fit_transform throughput
+    transform_docs_per_s  CustomTfidfVectorizer.transform throughput
+    normalize_ms          normalize_sparse_matrix on the feature matrix
+    load_npz_s            MovieRecommender load from movies.csv + .npz
+    load_artifact_s       MovieRecommender load from the catalog + index artifact
+    query_p50_ms          single get_recommendations latency (median)
+    query_p95_ms          single get_recommendations latency (95th percentile)
+    batch_ms              get_recommendations_batch latency for --batch-size queries
+    peak_fit_mb           peak traced memory while fitting
+    peak_load_mb          peak traced memory while loading from the artifact
+
+Given ``--baseline``, every metric is compared with the stored value and the
+run fails (exit code 1) if any is worse by more than ``--tolerance``.
+Metrics ending in ``_per_s`` are higher-is-better, all others lower-is-better.
+With ``--repeats`` every size is run several times and the median of each
+metric is kept, which steadies the comparison on a busy machine.
+``benchmarks/baseline.json`` holds a recorded ``--sizes 10000 --repeats 5``
+run; baselines are machine-specific, so on a new host record one first (last
+usage line).
+
+Usage:
+    python -m benchmarks.run --sizes 10000 100000 --out benchmarks/results.json
+    python -m benchmarks.run --sizes 10000 --repeats 3 --baseline benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10000 --repeats 5 --out benchmarks/baseline.json   # record a baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import scipy
+
+from benchmarks.synthetic import build_feature_matrix, generate_catalog, write_synthetic_catalog
+from src.knn_scratch import MovieRecommender
+from src.tf_idf import normalize_sparse_matrix
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[float, object]:
+    """Run ``fn`` once and return (seconds, result)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _best_of(repeats: int, fn: Callable, *args, **kwargs) -> float:
+    """Fastest of several runs of ``fn`` in seconds, to damp timer noise."""
+    return min(_timed(fn, *args, **kwargs)[0] for _ in range(repeats))
+
+
+def _peak_mb(fn: Callable, *args, **kwargs) -> Tuple[float, object]:
+    """Run ``fn`` under tracemalloc and return (peak MiB, result)."""
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2 ** 20, result
+
+
+def run_size(n_movies: int, n_queries: int = 200, batch_size: int = 64,
+             transform_docs: int = 10000, seed: int = 0) -> Dict[str, float]:
+    """
+    Benchmark one catalog size.
+
+    Args:
+        n_movies (int): Number of synthetic movies
+        n_queries (int, optional): Single queries to time. Defaults to 200.
+        batch_size (int, optional): Queries per batch call. Defaults to 64.
+        transform_docs (int, optional): Documents for the transform benchmark.
+            Defaults to 10000.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        Dict[str, float]: Metric name -> value
+    """
+    rng = np.random.default_rng(seed)
+    movies = generate_catalog(n_movies, seed)
+    overviews = movies['overview'].tolist()
+    metrics = {}
+
+    # tracemalloc slows allocation down, so memory is measured in separate runs
+    seconds, (matrix, vectorizer) = _timed(build_feature_matrix, movies)
+    metrics['fit_docs_per_s'] = n_movies / seconds
+    metrics['peak_fit_mb'], _ = _peak_mb(build_feature_matrix, movies)
+
+    sample = overviews[:transform_docs]
+    metrics['transform_docs_per_s'] = len(sample) / _best_of(3, vectorizer.transform, sample)
+    metrics['normalize_ms'] = _best_of(5, normalize_sparse_matrix, matrix) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = write_synthetic_catalog(movies, matrix, tmp_dir)
+        del movies, matrix, overviews, sample
+
+        metrics['load_npz_s'] = _best_of(3, MovieRecommender, paths['csv'], paths['matrix'])
+        metrics['load_artifact_s'] = _best_of(3, MovieRecommender, paths['catalog'], paths['index'])
+        metrics['peak_load_mb'], recommender = _peak_mb(MovieRecommender, paths['catalog'], paths['index'])
+
+        query_ids = [int(i) for i in rng.choice(recommender.catalog.ids, n_queries)]
+        recommender.get_recommendations(query_ids[0])  # Warm up
+        latencies = [_timed(recommender.get_recommendations, movie_id)[0] for movie_id in query_ids]
+        metrics['query_p50_ms'] = float(np.percentile(latencies, 50)) * 1000
+        metrics['query_p95_ms'] = float(np.percentile(latencies, 95)) * 1000
+
+        batches = [query_ids[i:i + batch_size] for i in range(0, n_queries, batch_size)]
+        batch_latencies = [_timed(recommender.get_recommendations_batch, batch)[0]
+                           for batch in batches if len(batch) == batch_size]
+        if batch_latencies:
+            metrics['batch_ms'] = float(np.median(batch_latencies)) * 1000
+        del recommender
+
+    return metrics
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): Size -> metric -> value
+        baseline (Dict[str, Dict[str, float]]): Same layout, stored earlier
+        tolerance (float): Allowed relative slowdown, e.g. 0.5 for 50%
+
+    Returns:
+        List[str]: One message per regression (empty if none)
+    """
+    regressions = []
+    for size, metrics in results.items():
+        for name, value in metrics.items():
+            expected = baseline.get(size, {}).get(name)
+            if not expected:
+                continue
+            if name.endswith('_per_s'):
+                change = (expected - value) / expected
+            else:
+                change = (value - expected) / expected
+            if change > tolerance:
+                regressions.append(f"{size} movies: {name} {value:.4g} vs baseline {expected:.4g} "
+                                   f"({change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    """Run the benchmarks and optionally compare them with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=1, help='Runs per size; the median is kept')
+    parser.add_argument('--out', default='benchmarks/results.json')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+    if args.baseline and not os.path.exists(args.baseline):
+        # Fail before the benchmarks run, not after
+        parser.error(f"baseline {args.baseline} not found; record one with "
+                     f"--out {args.baseline} first")
+
+    results = {}
+    for size in args.sizes:
+        print(f"Benchmarking {size} movies...")
+        runs = [run_size(size, args.queries, args.batch_size) for _ in range(args.repeats)]
+        results[str(size)] = {name: float(np.median([run[name] for run in runs if name in run]))
+                              for name in runs[0]}
+        for name, value in results[str(size)].items():
+            print(f"  {name:<22} {value:12.3f}")
+
+    with open(args.out, 'w') as f:
+        json.dump({
+            'environment': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'scipy': scipy.__version__,
+                'machine': platform.machine(),
+                'platform': platform.platform(),
+                'timestamp': int(time.time())
+            },
+            'results': results
+        }, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Synthetic Catalog Generator
+
+This module generates movie catalogs of any size whose statistics follow
+``data/movies.csv``: overview word counts are resampled from the real
+overviews, words are drawn from the real vocabulary with their observed
+(Zipf-like) frequencies plus a long tail of rare synthetic words, and genre
+sets are resampled from the real genre co-occurrences.
+
+Usage:
+    python -m benchmarks.synthetic --movies 100000 --out /tmp/catalog-100k
+"""
+
+import argparse
+import os
+import re
+from collections import Counter
+from typing import Tuple
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from src.catalog import Catalog, parse_genres, write_catalog
+from src.index_artifact import write_index_artifact
+from src.tf_idf import CustomTfidfVectorizer
+
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'movies.csv')
+
+# Share of generated words that come from the synthetic long tail, so the
+# vocabulary keeps growing with the catalog like real text does
+RARE_WORD_SHARE = 0.05
+
+
+def generate_catalog(n_movies: int, seed: int = 0, reference_path: str = REFERENCE_PATH) -> pd.DataFrame:
+    """
+    Generate a synthetic catalog shaped like ``movies.csv``.
+
+    Args:
+        n_movies (int): Number of movies
+        seed (int, optional): Random seed. Defaults to 0.
+        reference_path (str, optional): Catalog the statistics are taken from
+
+    Returns:
+        pd.DataFrame: id, title, overview, genres and release_year columns
+    """
+    rng = np.random.default_rng(seed)
+    reference = pd.read_csv(reference_path)
+    overviews = reference['overview'].fillna('').tolist()
+    tokens = [re.findall(r'\w+', text.lower()) for text in overviews]
+
+    word_counts = Counter(word for doc in tokens for word in doc)
+    words = np.array(list(word_counts))
+    probabilities = np.array(list(word_counts.values()), dtype=np.float64)
+    probabilities /= probabilities.sum()
+    lengths = rng.choice(np.array([max(len(doc), 1) for doc in tokens]), n_movies)
+
+    # Draw all words at once, then split them into documents
+    total = int(lengths.sum())
+    drawn = words[rng.choice(len(words), total, p=probabilities)]
+    rare = rng.random(total) < RARE_WORD_SHARE
+    n_rare_words = max(1000, n_movies // 2)
+    drawn[rare] = np.char.add('w', rng.zipf(1.3, rare.sum()).clip(max=n_rare_words).astype(str))
+    boundaries = np.cumsum(lengths)[:-1]
+    overviews = [' '.join(doc) for doc in np.split(drawn, boundaries)]
+
+    genre_sets = reference['genres'].tolist()
+    years = reference['release_year'].dropna().astype(int).to_numpy()
+    title_words = rng.choice(words, (n_movies, 3))
+    return pd.DataFrame({
+        'id': np.arange(1, n_movies + 1, dtype=np.int64) * 7 + 100_000,
+        'title': [' '.join(parts).title() + f' {i}' for i, parts in enumerate(title_words)],
+        'overview': overviews,
+        'genres': [str(parse_genres(genre_sets[i])) for i in rng.integers(0, len(genre_sets), n_movies)],
+        'release_year': rng.choice(years, n_movies)
+    })
+
+
+def build_feature_matrix(movies: pd.DataFrame, max_features: int = 5000,
+                         n_jobs: int = 1) -> Tuple[sparse.csr_matrix, CustomTfidfVectorizer]:
+    """
+    Build a feature matrix laid out like ``final_matrix``: TF-IDF columns
+    followed by multi-hot genre columns.
+
+    Args:
+        movies (pd.DataFrame): Catalog from ``generate_catalog``
+        max_features (int, optional): TF-IDF vocabulary size. Defaults to 5000.
+        n_jobs (int, optional): Tokenizer processes. Defaults to 1.
+
+    Returns:
+        Tuple[sparse.csr_matrix, CustomTfidfVectorizer]: One row per movie
+            and the fitted vectorizer
+    """
+    vectorizer = CustomTfidfVectorizer(max_features=max_features, n_jobs=n_jobs)
+    tfidf = vectorizer.fit_transform(movies['overview'].tolist())
+
+    catalog = Catalog.from_frame(movies)
+    bits = catalog.genre_bits[:, np.newaxis] >> np.arange(len(catalog.genre_names), dtype=np.uint64)
+    genre_matrix = sparse.csr_matrix((bits & np.uint64(1)).astype(np.float64))
+    return sparse.hstack([tfidf, genre_matrix], format='csr'), vectorizer
+
+
+def write_synthetic_catalog(movies: pd.DataFrame, matrix: sparse.csr_matrix, out_dir: str) -> dict:
+    """
+    Write a catalog and its feature matrix in every format the server loads.
+
+    Args:
+        movies (pd.DataFrame): Catalog from ``generate_catalog``
+        matrix (sparse.csr_matrix): Its feature matrix
+        out_dir (str): Output directory, created if missing
+
+    Returns:
+        dict: Paths of 'csv', 'catalog', 'matrix' and 'index'
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        'csv': os.path.join(out_dir, 'movies.csv'),
+        'catalog': os.path.join(out_dir, 'catalog'),
+        'matrix': os.path.join(out_dir, 'final_matrix.npz'),
+        'index': os.path.join(out_dir, 'index')
+    }
+    movies.to_csv(paths['csv'], index=False)
+    write_catalog(Catalog.from_frame(movies), paths['catalog'])
+    sparse.save_npz(paths['matrix'], matrix)
+    write_index_artifact(matrix, paths['index'])
+    return paths
+
+
+def main():
+    """Write a synthetic catalog to disk."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--movies', type=int, default=10000)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    movies = generate_catalog(args.movies, args.seed)
+    matrix, _ = build_feature_matrix(movies)
+    paths = write_synthetic_catalog(movies, matrix, args.out)
+    print(f"Wrote {args.movies} synthetic movies to {args.out}: {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
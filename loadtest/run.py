@@ -0,0 +1,279 @@
+"""
+Load Test Driver
+
+This module drives the app at a fixed request rate and reports latency
+percentiles, error rates and upstream (stub TMDB) calls per request, one
+phase per endpoint:
+
+    search       GET /search?title=...           legacy search + recommendations
+    api_search   GET /api/search?q=...           mixed movie/TV search
+    recommend    GET /api/recommend/{id}         recommendations for a catalog movie
+
+Load is open-loop: request ``i`` is sent at ``start + i / rps`` whether or
+not earlier ones have finished, and latency is measured from that scheduled
+time, so a slow server shows up as latency instead of a lower request rate.
+
+With ``--start`` the stub TMDB server and the app (``uvicorn web.main:app``,
+with an empty TMDB cache and ``TMDB_API_BASE`` pointing at the stub) are
+started as subprocesses and stopped afterwards; otherwise ``--app-url`` and
+``--stub-url`` must point at running servers.
+
+Usage:
+    python -m loadtest.run --start --rps 50 --duration 30 --latency-ms 80 --jitter-ms 40
+    python -m loadtest.run --start --rps 100 --error-rate 0.05 --timeout-rate 0.01 --out loadtest/results.json
+    python -m loadtest.run --app-url http://127.0.0.1:8000 --stub-url http://127.0.0.1:8765 --endpoints recommend
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from loadtest.stub_tmdb import REFERENCE_PATH
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ('search', 'api_search', 'recommend')
+
+
+def build_paths(endpoint: str, movies: pd.DataFrame, n: int, seed: int = 0) -> List[str]:
+    """
+    Request paths for one phase, drawn from the catalog with replacement.
+
+    Args:
+        endpoint (str): One of ``ENDPOINTS``
+        movies (pd.DataFrame): Catalog with 'id' and 'title' columns
+        n (int): Number of requests
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[str]: Paths relative to the app root
+
+    Raises:
+        ValueError: If the endpoint is unknown
+    """
+    rng = np.random.default_rng(seed)
+    picks = movies.iloc[rng.integers(0, len(movies), n)]
+    if endpoint == 'search':
+        return [f"/search?title={quote(str(title))}" for title in picks['title']]
+    if endpoint == 'api_search':
+        # Users type a word or two, not the full title
+        return [f"/api/search?q={quote(' '.join(str(title).split()[:2]))}" for title in picks['title']]
+    if endpoint == 'recommend':
+        return [f"/api/recommend/{int(movie_id)}" for movie_id in picks['id']]
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+def _is_error(response: httpx.Response) -> bool:
+    """Non-200 responses and 200s carrying an error body count as errors."""
+    if response.status_code != 200:
+        return True
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    return isinstance(body, dict) and (body.get('success') is False or 'error' in body)
+
+
+async def drive(app_url: str, paths: List[str], rps: float, timeout: float) -> List[Tuple[float, bool]]:
+    """
+    Send requests at a fixed rate (open loop).
+
+    Args:
+        app_url (str): App root, e.g. http://127.0.0.1:8000
+        paths (List[str]): Paths to request, in order
+        rps (float): Requests per second
+        timeout (float): Client timeout in seconds
+
+    Returns:
+        List[Tuple[float, bool]]: (latency in seconds from the scheduled send
+            time, True if the request failed) per request
+    """
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def send(path: str, scheduled: float) -> Tuple[float, bool]:
+            try:
+                failed = _is_error(await client.get(path))
+            except httpx.HTTPError:
+                failed = True
+            return loop.time() - scheduled, failed
+
+        tasks = []
+        for i, path in enumerate(paths):
+            scheduled = start + i / rps
+            await asyncio.sleep(max(0.0, scheduled - loop.time()))
+            tasks.append(asyncio.ensure_future(send(path, scheduled)))
+        return await asyncio.gather(*tasks)
+
+
+def summarize(results: List[Tuple[float, bool]], elapsed: float,
+              upstream: Dict[str, int]) -> Dict[str, object]:
+    """
+    Summarize one phase.
+
+    Args:
+        results (List[Tuple[float, bool]]): Output of ``drive``
+        elapsed (float): Wall-clock seconds of the phase
+        upstream (Dict[str, int]): Stub calls per route during the phase
+
+    Returns:
+        Dict[str, object]: requests, achieved_rps, error_rate, p50_ms, p90_ms,
+            p99_ms, max_ms, upstream_per_request and upstream_by_route (calls
+            per request for every stub route)
+    """
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    n = len(results)
+    return {
+        'requests': n,
+        'achieved_rps': n / elapsed,
+        'error_rate': sum(failed for _, failed in results) / n,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'upstream_per_request': sum(upstream.values()) / n,
+        'upstream_by_route': {route: count / n for route, count in sorted(upstream.items())}
+    }
+
+
+def wait_ready(url: str, timeout: float = 120) -> None:
+    """
+    Poll a URL until it answers.
+
+    Raises:
+        RuntimeError: If it does not answer within ``timeout`` seconds
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+@contextmanager
+def start_servers(args: argparse.Namespace) -> Iterator[Tuple[str, str]]:
+    """Start the stub TMDB server and the app, yield their URLs, stop them afterwards."""
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    stub_cmd = [sys.executable, '-m', 'loadtest.stub_tmdb', '--port', str(args.stub_port),
+                '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+                '--error-rate', str(args.error_rate), '--timeout-rate', str(args.timeout_rate),
+                '--timeout-s', str(args.timeout_s)]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ,
+                   TMDB_API_BASE=f"{stub_url}/3",
+                   TMDB_API_KEY=os.getenv('TMDB_API_KEY') or 'loadtest',
+                   TMDB_CACHE_PATH=os.path.join(cache_dir, 'tmdb_cache.sqlite'),
+                   INDEX_POLL_SECONDS='0')
+        app_cmd = [sys.executable, '-m', 'uvicorn', 'web.main:app', '--port', str(args.app_port),
+                   '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+        processes = []
+        try:
+            processes.append(subprocess.Popen(stub_cmd, cwd=BASE_DIR))
+            wait_ready(f"{stub_url}/_stats")
+            processes.append(subprocess.Popen(app_cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL))
+            wait_ready(f"{app_url}/api/cache/stats")
+            yield app_url, stub_url
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+def run_phases(app_url: str, stub_url: str, endpoints: List[str], rps: float, duration: float,
+               timeout: float, seed: int = 0) -> Dict[str, Dict[str, object]]:
+    """
+    Run one load phase per endpoint.
+
+    Args:
+        app_url (str): App root
+        stub_url (str): Stub TMDB root (for call counts)
+        endpoints (List[str]): Endpoints to load, in order
+        rps (float): Requests per second
+        duration (float): Seconds per phase
+        timeout (float): Client timeout in seconds
+        seed (int, optional): Random seed for the request mix. Defaults to 0.
+
+    Returns:
+        Dict[str, Dict[str, object]]: Endpoint -> summary
+    """
+    movies = pd.read_csv(REFERENCE_PATH)
+    results = {}
+    for phase_number, endpoint in enumerate(endpoints):
+        # A different draw per phase, so one phase doesn't warm the cache for the next
+        paths = build_paths(endpoint, movies, max(1, int(rps * duration)), seed + phase_number)
+        httpx.post(f"{stub_url}/_reset")
+        start = time.perf_counter()
+        phase = asyncio.run(drive(app_url, paths, rps, timeout))
+        elapsed = time.perf_counter() - start
+        upstream = httpx.get(f"{stub_url}/_stats").json()['calls']
+        results[endpoint] = summarize(phase, elapsed, upstream)
+    return results
+
+
+def main():
+    """Run the load test and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--start', action='store_true', help='Start the stub and the app as subprocesses')
+    parser.add_argument('--app-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--stub-url', default='http://127.0.0.1:8765')
+    parser.add_argument('--app-port', type=int, default=8001)
+    parser.add_argument('--stub-port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--rps', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per endpoint')
+    parser.add_argument('--timeout', type=float, default=10, help='Client timeout in seconds')
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--timeout-s', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='Write the results as JSON')
+    args = parser.parse_args()
+
+    if args.start:
+        with start_servers(args) as (app_url, stub_url):
+            results = run_phases(app_url, stub_url, args.endpoints, args.rps, args.duration, args.timeout, args.seed)
+    else:
+        results = run_phases(args.app_url, args.stub_url, args.endpoints, args.rps, args.duration,
+                             args.timeout, args.seed)
+
+    print(f"{'endpoint':<12} {'requests':>8} {'rps':>7} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'upstream/req':>13}")
+    for endpoint, row in results.items():
+        print(f"{endpoint:<12} {row['requests']:>8} {row['achieved_rps']:>7.1f} {row['error_rate']:>7.1%} "
+              f"{row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} "
+              f"{row['upstream_per_request']:>13.2f}")
+        for route, per_request in row['upstream_by_route'].items():
+            print(f"{'':<12} {route:<40} {per_request:>6.2f} calls/req")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'config': vars(args), 'results': results}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
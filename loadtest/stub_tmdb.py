@@ -0,0 +1,214 @@
+"""
+Stub TMDB Server
+
+This module serves a local stand-in for the parts of the TMDB API that
+``web/main.py`` calls, built from ``data/movies.csv``:
+
+    /3/movie/{id}                   details of a catalog movie (404 otherwise)
+    /3/movie/{id}/recommendations   a fixed pseudo-random page of catalog movies
+    /3/search/movie                 catalog titles containing the query
+    /3/search/tv                    synthetic shows whose name contains the query
+    /3/tv/{id}                      details of a synthetic show
+    /3/trending/movie/week          a fixed page of catalog movies
+
+Every response can be delayed (``--latency-ms`` plus up to ``--jitter-ms``),
+replaced by an error status (``--error-rate``) or held past the client's
+timeout (``--timeout-rate``, ``--timeout-s``). Calls are counted per route:
+
+    GET  /_stats    {"calls": {"/3/movie/{id}": 12, ...}, "total": 12}
+    POST /_reset    zero the counts
+
+Point the app at it with ``TMDB_API_BASE=http://127.0.0.1:8765/3``.
+
+Usage:
+    python -m loadtest.stub_tmdb --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import os
+import random
+from collections import Counter
+from typing import Dict, List
+
+import pandas as pd
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from src.catalog import parse_genres
+
+REFERENCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'movies.csv')
+PAGE_SIZE = 20
+TV_SHOW_BASE_ID = 900_000
+
+
+def build_fixtures(catalog_path: str = REFERENCE_PATH, seed: int = 0) -> Dict[str, object]:
+    """
+    Build TMDB-shaped responses from a catalog CSV.
+
+    Args:
+        catalog_path (str, optional): Path to ``movies.csv``
+        seed (int, optional): Random seed for recommendations and trending
+
+    Returns:
+        Dict[str, object]: 'movies' (id -> details), 'shows' (id -> details),
+            'trending' (list of results) and 'seed'
+    """
+    movies = {}
+    for row in pd.read_csv(catalog_path).itertuples(index=False):
+        year = '' if pd.isna(row.release_year) else f'{int(row.release_year)}-01-01'
+        movies[int(row.id)] = {
+            'id': int(row.id),
+            'title': row.title,
+            'overview': '' if pd.isna(row.overview) else row.overview,
+            'genres': [{'id': i, 'name': name} for i, name in enumerate(parse_genres(row.genres))],
+            'release_date': year,
+            'poster_path': f'/poster-{int(row.id)}.jpg',
+            'backdrop_path': f'/backdrop-{int(row.id)}.jpg',
+            'vote_average': 7.0,
+            'runtime': 110
+        }
+
+    # One show per movie, so TV searches find something for any title word
+    shows = {}
+    for i, movie in enumerate(movies.values()):
+        show_id = TV_SHOW_BASE_ID + i
+        shows[show_id] = {
+            'id': show_id,
+            'name': f"{movie['title']}: The Series",
+            'overview': movie['overview'],
+            'genres': movie['genres'],
+            'first_air_date': movie['release_date'],
+            'poster_path': f'/tv-poster-{show_id}.jpg',
+            'backdrop_path': None,
+            'vote_average': 7.5
+        }
+
+    rng = random.Random(seed)
+    trending = [movies[movie_id] for movie_id in rng.sample(sorted(movies), min(PAGE_SIZE, len(movies)))]
+    return {'movies': movies, 'shows': shows, 'trending': trending, 'seed': seed}
+
+
+def _page(results: List[dict]) -> dict:
+    """Wrap results in a TMDB paged response."""
+    return {'page': 1, 'results': results[:PAGE_SIZE], 'total_pages': 1, 'total_results': len(results)}
+
+
+def create_app(fixtures: Dict[str, object], latency_ms: float = 0, jitter_ms: float = 0,
+               error_rate: float = 0, error_status: int = 500, timeout_rate: float = 0,
+               timeout_s: float = 10, seed: int = 0) -> FastAPI:
+    """
+    Create the stub TMDB application.
+
+    Args:
+        fixtures (Dict[str, object]): Responses from ``build_fixtures``
+        latency_ms (float, optional): Delay added to every response. Defaults to 0.
+        jitter_ms (float, optional): Extra uniform random delay. Defaults to 0.
+        error_rate (float, optional): Share of calls answered with ``error_status``. Defaults to 0.
+        error_status (int, optional): Status of injected errors. Defaults to 500.
+        timeout_rate (float, optional): Share of calls held for ``timeout_s``. Defaults to 0.
+        timeout_s (float, optional): How long timed-out calls are held. Defaults to 10.
+        seed (int, optional): Random seed for fault injection. Defaults to 0.
+
+    Returns:
+        FastAPI: The application
+    """
+    app = FastAPI()
+    movies, shows = fixtures['movies'], fixtures['shows']
+    calls = Counter()
+    rng = random.Random(seed)
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        """Count the call, then apply the configured latency and failures"""
+        if request.url.path.startswith('/_'):
+            return await call_next(request)
+        # Routes are only matched inside call_next, so count by path template
+        calls[_route_template(request.url.path)] += 1
+
+        roll = rng.random()
+        delay = (latency_ms + rng.random() * jitter_ms) / 1000
+        if roll < timeout_rate:
+            delay = timeout_s
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if timeout_rate <= roll < timeout_rate + error_rate:
+            return JSONResponse({'status_message': 'Injected error'}, status_code=error_status)
+        return await call_next(request)
+
+    @app.get("/_stats")
+    async def stats():
+        return {'calls': dict(calls), 'total': sum(calls.values())}
+
+    @app.post("/_reset")
+    async def reset():
+        calls.clear()
+        return {'calls': {}, 'total': 0}
+
+    @app.get("/3/movie/{movie_id}")
+    async def movie_details(movie_id: int):
+        movie = movies.get(movie_id)
+        if movie is None:
+            return JSONResponse({'status_message': 'Not found'}, status_code=404)
+        return movie
+
+    @app.get("/3/movie/{movie_id}/recommendations")
+    async def movie_recommendations(movie_id: int):
+        rng_for_movie = random.Random(fixtures['seed'] * 1_000_003 + movie_id)
+        picks = rng_for_movie.sample(sorted(movies), min(PAGE_SIZE, len(movies)))
+        return _page([movies[pick] for pick in picks if pick != movie_id])
+
+    @app.get("/3/search/movie")
+    async def search_movie(query: str = ''):
+        needle = query.casefold()
+        return _page([movie for movie in movies.values() if needle in movie['title'].casefold()])
+
+    @app.get("/3/search/tv")
+    async def search_tv(query: str = ''):
+        needle = query.casefold()
+        return _page([show for show in shows.values() if needle in show['name'].casefold()])
+
+    @app.get("/3/tv/{tv_id}")
+    async def tv_details(tv_id: int):
+        show = shows.get(tv_id)
+        if show is None:
+            return JSONResponse({'status_message': 'Not found'}, status_code=404)
+        return show
+
+    @app.get("/3/trending/movie/week")
+    async def trending():
+        return _page(fixtures['trending'])
+
+    return app
+
+
+def _route_template(path: str) -> str:
+    """Call-count key for a path, e.g. "/3/movie/603" -> "/3/movie/{id}"."""
+    version, *parts = path.lstrip('/').split('/')
+    return '/' + '/'.join([version] + ['{id}' if part.isdigit() else part for part in parts])
+
+
+def main():
+    """Run the stub TMDB server."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--catalog', default=REFERENCE_PATH)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--timeout-s', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(build_fixtures(args.catalog, args.seed), args.latency_ms, args.jitter_ms,
+                     args.error_rate, args.error_status, args.timeout_rate, args.timeout_s, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Approximate Nearest Neighbor Search (IVF)
+
+This module implements an inverted-file (IVF) index for cosine similarity
+search over the TF-IDF + genre feature matrix, written with numpy/scipy only.
+
+Rows are L2-normalized and clustered with spherical k-means into ``n_lists``
+coarse cells. A query is compared against the cell centroids first and only
+the movies in the ``n_probe`` closest cells are scored exactly. ``n_probe``
+is the recall/latency knob: ``n_probe == n_lists`` is an exhaustive search.
+
+Usage:
+    python -m src.ann build --matrix models/final_matrix.npz --out models/ivf_index.npz
+    python -m src.ann report --matrix models/final_matrix.npz --index models/ivf_index.npz
+"""
+
+import argparse
+import time
+import numpy as np
+import scipy.sparse as sparse
+from typing import Optional, Tuple
+
+from src.knn_scratch import _top_k
+from src.tf_idf import normalize_sparse_matrix
+
+
+def _normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Convert to float32 CSR and scale every row to unit L2 norm."""
+    return normalize_sparse_matrix(sparse.csr_matrix(matrix, dtype=np.float32))
+
+
+def _normalize_dense(vectors: np.ndarray) -> np.ndarray:
+    """Scale every row of a dense array to unit L2 norm (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def exact_search(matrix: sparse.csr_matrix, queries: sparse.csr_matrix, k: int,
+                 exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force cosine search, used as the reference for recall reports.
+
+    Args:
+        matrix (sparse.csr_matrix): Row-normalized catalog matrix
+        queries (sparse.csr_matrix): Query vectors (one per row)
+        k (int): Number of neighbors per query
+        exclude (np.ndarray, optional): One catalog row per query to drop
+            from its results (usually the query movie itself)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Neighbor rows and scores (n_queries, k)
+    """
+    scores = (_normalize_rows(queries) @ matrix.T).toarray()
+    if exclude is not None:
+        scores[np.arange(len(exclude)), exclude] = -np.inf
+    return _top_k(scores, k)
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a spherical k-means coarse quantizer.
+
+    Attributes:
+        n_lists (int): Number of coarse cells
+        n_probe (int): Cells scanned per query (recall/latency trade-off)
+        centroids (np.ndarray): Unit-norm cell centroids (n_lists, n_features)
+        list_offsets (np.ndarray): Start of each cell in ``list_rows``
+        list_rows (np.ndarray): Catalog rows grouped by cell
+        matrix (sparse.csr_matrix): Row-normalized catalog matrix being searched
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8,
+                 n_iter: int = 15, sample_size: int = 100_000, seed: int = 0):
+        """
+        Initialize an empty index.
+
+        Args:
+            n_lists (int, optional): Number of cells. Defaults to ~sqrt(n_movies).
+            n_probe (int, optional): Cells scanned per query. Defaults to 8.
+            n_iter (int, optional): k-means iterations. Defaults to 15.
+            sample_size (int, optional): Rows used to train the centroids.
+                Defaults to 100,000.
+            seed (int, optional): Random seed. Defaults to 0.
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
+        self.matrix = None
+
+    def _train_centroids(self, matrix: sparse.csr_matrix) -> np.ndarray:
+        """Run spherical k-means on a sample of rows."""
+        rng = np.random.default_rng(self.seed)
+        n_rows = matrix.shape[0]
+        sample = matrix
+        if n_rows > self.sample_size:
+            sample = matrix[np.sort(rng.choice(n_rows, self.sample_size, replace=False))]
+
+        centroids = sample[rng.choice(sample.shape[0], self.n_lists, replace=False)].toarray()
+        for _ in range(self.n_iter):
+            assignment = np.asarray((sample @ centroids.T).argmax(axis=1)).ravel()
+            membership = sparse.csr_matrix(
+                (np.ones(sample.shape[0], dtype=np.float32), (assignment, np.arange(sample.shape[0]))),
+                shape=(self.n_lists, sample.shape[0]))
+            centroids = np.asarray((membership @ sample).todense())
+
+            # Reseed empty cells with random rows
+            empty = np.flatnonzero(np.abs(centroids).sum(axis=1) == 0)
+            if len(empty) > 0:
+                centroids[empty] = sample[rng.choice(sample.shape[0], len(empty), replace=False)].toarray()
+            centroids = _normalize_dense(centroids)
+        return centroids.astype(np.float32)
+
+    def _assign(self, matrix: sparse.csr_matrix, block_size: int = 65536) -> np.ndarray:
+        """Assign every row to its closest centroid, in memory-bounded blocks."""
+        assignment = np.empty(matrix.shape[0], dtype=np.int32)
+        for start in range(0, matrix.shape[0], block_size):
+            stop = min(start + block_size, matrix.shape[0])
+            assignment[start:stop] = np.asarray((matrix[start:stop] @ self.centroids.T).argmax(axis=1)).ravel()
+        return assignment
+
+    def build(self, matrix: sparse.csr_matrix) -> 'IVFIndex':
+        """
+        Train the coarse quantizer and fill the inverted lists.
+
+        Args:
+            matrix (sparse.csr_matrix): Catalog feature matrix
+
+        Returns:
+            IVFIndex: self
+        """
+        self.matrix = _normalize_rows(matrix)
+        n_rows = self.matrix.shape[0]
+        if self.n_lists is None:
+            self.n_lists = max(1, int(np.sqrt(n_rows)))
+        self.n_lists = min(self.n_lists, n_rows)
+
+        self.centroids = self._train_centroids(self.matrix)
+        assignment = self._assign(self.matrix)
+        self.list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        self.list_offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=self.n_lists), out=self.list_offsets[1:])
+        return self
+
+    def attach(self, matrix: sparse.csr_matrix, normalized: bool = False) -> 'IVFIndex':
+        """
+        Attach the catalog matrix to a loaded index.
+
+        Args:
+            matrix (sparse.csr_matrix): The matrix the index was built from
+            normalized (bool, optional): True if the rows already have unit
+                norm (e.g. a memory-mapped index artifact); a float32 CSR
+                matrix is then used as is instead of normalizing a copy.
+                Defaults to False.
+
+        Returns:
+            IVFIndex: self
+
+        Raises:
+            ValueError: If the matrix shape does not match the index
+        """
+        if matrix.shape[0] != len(self.list_rows) or matrix.shape[1] != self.centroids.shape[1]:
+            raise ValueError(f"Matrix shape {matrix.shape} does not match the IVF index "
+                             f"({len(self.list_rows)}, {self.centroids.shape[1]})")
+        if normalized and sparse.isspmatrix_csr(matrix) and matrix.dtype == np.float32:
+            self.matrix = matrix
+        else:
+            self.matrix = _normalize_rows(matrix)
+        return self
+
+    def extend(self, rows: sparse.csr_matrix, matrix: Optional[sparse.csr_matrix] = None) -> 'IVFIndex':
+        """
+        Return a copy of the index with new catalog rows appended.
+
+        New rows are assigned to the existing centroids; the quantizer is not
+        retrained. The current index is left untouched so it can keep serving.
+
+        Args:
+            rows (sparse.csr_matrix): Feature rows appended to the catalog
+            matrix (sparse.csr_matrix, optional): The full unit-norm float32
+                matrix (old rows followed by ``rows``) to share, instead of
+                stacking a normalized copy
+
+        Returns:
+            IVFIndex: A new index covering the old and new rows
+        """
+        extended = IVFIndex(n_lists=self.n_lists, n_probe=self.n_probe, n_iter=self.n_iter,
+                            sample_size=self.sample_size, seed=self.seed)
+        extended.centroids = self.centroids
+        new_rows = _normalize_rows(rows)
+        if matrix is not None:
+            extended.matrix = matrix
+        else:
+            extended.matrix = sparse.vstack([self.matrix, new_rows], format='csr')
+
+        # Recover the current cell of every row from the inverted lists
+        assignment = np.empty(len(self.list_rows), dtype=np.int32)
+        assignment[self.list_rows] = np.repeat(np.arange(self.n_lists, dtype=np.int32), np.diff(self.list_offsets))
+        assignment = np.concatenate([assignment, extended._assign(new_rows)])
+
+        extended.list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        extended.list_offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=self.n_lists), out=extended.list_offsets[1:])
+        return extended
+
+    def search(self, queries: sparse.csr_matrix, k: int, exclude: Optional[np.ndarray] = None,
+               n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximate top-k neighbors for each query.
+
+        Args:
+            queries (sparse.csr_matrix): Query vectors (one per row)
+            k (int): Number of neighbors per query
+            exclude (np.ndarray, optional): One catalog row per query to drop
+                from its results
+            n_probe (int, optional): Overrides ``self.n_probe`` for this call
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Neighbor rows and scores of shape
+                (n_queries, k). Unfilled slots hold -1 and -inf.
+        """
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        queries = _normalize_rows(queries)
+        centroid_scores = np.asarray(queries @ self.centroids.T)
+        probes, _ = _top_k(centroid_scores, n_probe)
+
+        indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        scores = np.full((queries.shape[0], k), -np.inf)
+        for i, cells in enumerate(probes):
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in cells])
+            if exclude is not None:
+                candidates = candidates[candidates != exclude[i]]
+            if len(candidates) == 0:
+                continue
+            candidate_scores = (self.matrix[candidates] @ queries[i].T).toarray().T
+            top, top_scores = _top_k(candidate_scores, k)
+            indices[i, :top.shape[1]] = candidates[top[0]]
+            scores[i, :top.shape[1]] = top_scores[0]
+        return indices, scores
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index (the catalog matrix itself is not included).
+
+        Args:
+            path (str): Output ``.npz`` path
+        """
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets,
+                 list_rows=self.list_rows, n_probe=np.int64(self.n_probe))
+
+    @classmethod
+    def load(cls, path: str, matrix: Optional[sparse.csr_matrix] = None) -> 'IVFIndex':
+        """
+        Load an index saved with ``save``.
+
+        Args:
+            path (str): Path to the ``.npz`` file
+            matrix (sparse.csr_matrix, optional): Catalog matrix to attach
+
+        Returns:
+            IVFIndex: The loaded index
+        """
+        with np.load(path) as data:
+            index = cls(n_lists=len(data['list_offsets']) - 1, n_probe=int(data['n_probe']))
+            index.centroids = data['centroids']
+            index.list_offsets = data['list_offsets']
+            index.list_rows = data['list_rows']
+        if matrix is not None:
+            index.attach(matrix)
+        return index
+
+
+def recall_report(index: IVFIndex, k: int = 10, n_queries: int = 200,
+                  n_probes: Tuple[int, ...] = (1, 2, 4, 8, 16, 32), seed: int = 0) -> list:
+    """
+    Measure recall@k and latency of the IVF index against brute force.
+
+    Catalog rows are used as queries, excluding themselves from results.
+
+    Args:
+        index (IVFIndex): A built index with its matrix attached
+        k (int, optional): Neighbors per query. Defaults to 10.
+        n_queries (int, optional): Number of sampled queries. Defaults to 200.
+        n_probes (Tuple[int, ...], optional): ``n_probe`` values to compare
+        seed (int, optional): Random seed for the query sample
+
+    Returns:
+        list: One dict per setting with 'n_probe', 'recall', 'ms_per_query'
+            and 'exact_ms_per_query'
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = index.matrix.shape[0]
+    rows = rng.choice(n_rows, min(n_queries, n_rows), replace=False)
+    queries = index.matrix[rows]
+
+    start = time.perf_counter()
+    _, exact_scores = exact_search(index.matrix, queries, k, exclude=rows)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(rows)
+
+    # Ties are common (e.g. genre-only matches), so a returned neighbor
+    # counts as a hit when it scores at least as high as the exact k-th one
+    thresholds = exact_scores[:, -1:] - 1e-6
+
+    report = []
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            continue
+        start = time.perf_counter()
+        _, approx_scores = index.search(queries, k, exclude=rows, n_probe=n_probe)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(rows)
+        hits = np.count_nonzero(approx_scores >= thresholds)
+        report.append({
+            'n_probe': n_probe,
+            'recall': hits / exact_scores.size,
+            'ms_per_query': elapsed_ms,
+            'exact_ms_per_query': exact_ms
+        })
+    return report
+
+
+def main():
+    """Build an IVF index or print its recall report."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('--matrix', default='models/final_matrix.npz')
+    build_parser.add_argument('--out', default='models/ivf_index.npz')
+    build_parser.add_argument('--n-lists', type=int, default=None)
+    build_parser.add_argument('--n-probe', type=int, default=8)
+
+    report_parser = subparsers.add_parser('report')
+    report_parser.add_argument('--matrix', default='models/final_matrix.npz')
+    report_parser.add_argument('--index', default='models/ivf_index.npz')
+    report_parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    matrix = sparse.load_npz(args.matrix).tocsr()
+    if args.command == 'build':
+        index = IVFIndex(n_lists=args.n_lists, n_probe=args.n_probe).build(matrix)
+        index.save(args.out)
+        print(f"Saved IVF index with {index.n_lists} lists to {args.out}")
+    else:
+        index = IVFIndex.load(args.index, matrix)
+        print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'exact ms':>10}")
+        for row in recall_report(index, k=args.k):
+            print(f"{row['n_probe']:>8} {row['recall']:>10.3f} {row['ms_per_query']:>10.3f} "
+                  f"{row['exact_ms_per_query']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Columnar Movie Catalog
+
+This module stores the movie catalog as a directory of typed column files
+instead of ``movies.csv``:
+
+    data/catalog/
+        ids.npy               int64 TMDB ids
+        release_year.npy      int16, 0 where unknown
+        genres.npy            uint64 bitset, bit i set for genre_names[i]
+        title_offsets.npy     int64 offsets into titles.bin
+        titles.bin            UTF-8 titles, concatenated
+        overview_offsets.npy  int64 offsets into overviews.bin
+        overviews.bin         UTF-8 overviews, concatenated
+        meta.json             row count, genre names and format version
+
+Ids, years, genre bits and offsets are memory-mapped read-only, so every
+server worker loading the same directory shares one copy through the page
+cache. Titles are decoded once at startup for the lookup index. Overviews are
+only decoded when a single movie's details are requested, so serving never
+pays for the text it does not read.
+
+Usage:
+    python -m src.catalog --csv data/movies.csv --out data/catalog
+"""
+
+import argparse
+import ast
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+MISSING_YEAR = 0
+MAX_GENRES = 64
+
+
+def parse_genres(value) -> List[str]:
+    """
+    Parse a genres cell, which is a list or its string repr in ``movies.csv``.
+
+    Args:
+        value: List of genre names or a string such as "['Action', 'Drama']"
+
+    Returns:
+        List[str]: Genre names
+    """
+    if isinstance(value, str):
+        return list(ast.literal_eval(value)) if value.strip() else []
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return []
+
+
+class TextColumn:
+    """
+    Variable-length UTF-8 strings stored as one byte buffer plus offsets.
+
+    String ``i`` is bytes ``offsets[i]:offsets[i + 1]`` of ``data`` followed by
+    ``tail``; only the strings that are accessed get decoded. Appended strings
+    go to ``tail``, so appending to a memory-mapped column never reads (or
+    copies) the mapped buffer.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, tail: Optional[np.ndarray] = None):
+        """
+        Args:
+            data (np.ndarray): uint8 buffer (may be memory-mapped)
+            offsets (np.ndarray): int64 offsets, one more than the number of strings
+            tail (np.ndarray, optional): uint8 bytes of strings appended after ``data``
+        """
+        self.data = data
+        self.offsets = offsets
+        self.tail = tail if tail is not None else np.empty(0, dtype=np.uint8)
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'TextColumn':
+        """Encode a sequence of strings."""
+        encoded = [str(s).encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        # A string lies entirely in data or entirely in the tail
+        if start >= len(self.data):
+            return bytes(self.tail[start - len(self.data):end - len(self.data)]).decode('utf-8')
+        return bytes(self.data[start:end]).decode('utf-8')
+
+    def to_list(self) -> List[str]:
+        """Decode every string."""
+        raw = bytes(self.data) + bytes(self.tail)
+        return [raw[start:end].decode('utf-8') for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def append(self, strings: Iterable[str]) -> 'TextColumn':
+        """Return a new column with extra strings at the end (``data`` is shared, not copied)."""
+        extra = TextColumn.from_strings(strings)
+        return TextColumn(self.data,
+                          np.concatenate([self.offsets, extra.offsets[1:] + self.offsets[-1]]),
+                          np.concatenate([self.tail, extra.data]))
+
+    def write_bytes(self, f, block_size: int = 16 * 1024 * 1024) -> None:
+        """Write the byte buffer to a binary file in blocks, without loading it whole."""
+        for buffer in (self.data, self.tail):
+            for start in range(0, len(buffer), block_size):
+                f.write(memoryview(np.ascontiguousarray(buffer[start:start + block_size])))
+
+
+class Catalog:
+    """
+    Typed, column-oriented movie catalog.
+
+    Attributes:
+        ids (np.ndarray): int64 TMDB ids
+        titles (np.ndarray): Titles as an object array
+        release_years (np.ndarray): int16 years, ``MISSING_YEAR`` if unknown
+        genre_bits (np.ndarray): uint64 genre bitsets
+        genre_names (List[str]): Genre of each bit
+        overviews (TextColumn): Lazily decoded overviews
+    """
+
+    def __init__(self, ids: np.ndarray, titles: np.ndarray, release_years: np.ndarray,
+                 genre_bits: np.ndarray, genre_names: List[str], overviews: TextColumn):
+        """
+        Initialize a catalog from its columns (all of the same length).
+
+        Use ``from_frame`` or ``load_catalog`` rather than calling this directly.
+        """
+        self.ids = ids
+        self.titles = titles
+        self.release_years = release_years
+        self.genre_bits = genre_bits
+        self.genre_names = genre_names
+        self.overviews = overviews
+
+    @classmethod
+    def from_frame(cls, movies: pd.DataFrame, genre_names: Optional[List[str]] = None) -> 'Catalog':
+        """
+        Build a catalog from a DataFrame shaped like ``movies.csv``.
+
+        Args:
+            movies (pd.DataFrame): id, title, overview, genres, release_year
+            genre_names (List[str], optional): Existing bit assignment to
+                extend; genres seen for the first time get the next free bits
+
+        Returns:
+            Catalog: The catalog
+
+        Raises:
+            ValueError: If there are more than ``MAX_GENRES`` distinct genres
+        """
+        genre_names = list(genre_names or [])
+        bit_of: Dict[str, int] = {name: bit for bit, name in enumerate(genre_names)}
+        genre_bits = np.zeros(len(movies), dtype=np.uint64)
+        for row, value in enumerate(movies['genres']):
+            bits = 0
+            for genre in parse_genres(value):
+                if genre not in bit_of:
+                    if len(genre_names) == MAX_GENRES:
+                        raise ValueError(f"More than {MAX_GENRES} distinct genres")
+                    bit_of[genre] = len(genre_names)
+                    genre_names.append(genre)
+                bits |= 1 << bit_of[genre]
+            genre_bits[row] = bits
+
+        years = pd.to_numeric(movies['release_year'], errors='coerce').fillna(MISSING_YEAR)
+        return cls(ids=movies['id'].to_numpy(dtype=np.int64),
+                   titles=movies['title'].astype(str).to_numpy(dtype=object),
+                   release_years=years.to_numpy(dtype=np.int16),
+                   genre_bits=genre_bits,
+                   genre_names=genre_names,
+                   overviews=TextColumn.from_strings(movies['overview'].fillna('')))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def genres(self, row: int) -> List[str]:
+        """Genre names of one movie."""
+        bits = int(self.genre_bits[row])
+        return [name for bit, name in enumerate(self.genre_names) if bits >> bit & 1]
+
+    def release_year(self, row: int) -> Optional[int]:
+        """Release year of one movie, None if unknown."""
+        year = int(self.release_years[row])
+        return None if year == MISSING_YEAR else year
+
+    def entry(self, row: int) -> dict:
+        """
+        All stored fields of one movie.
+
+        Args:
+            row (int): Catalog row
+
+        Returns:
+            dict: id, title, overview, genres and release_year
+        """
+        return {
+            'id': int(self.ids[row]),
+            'title': self.titles[row],
+            'overview': self.overviews[row],
+            'genres': self.genres(row),
+            'release_year': self.release_year(row)
+        }
+
+    def append(self, movies: pd.DataFrame) -> 'Catalog':
+        """
+        Return a new catalog with extra movies at the end.
+
+        Args:
+            movies (pd.DataFrame): Rows shaped like ``movies.csv``
+
+        Returns:
+            Catalog: The extended catalog (this one is left unchanged)
+        """
+        extra = Catalog.from_frame(movies, self.genre_names)
+        return Catalog(ids=np.concatenate([self.ids, extra.ids]),
+                       titles=np.concatenate([self.titles, extra.titles]),
+                       release_years=np.concatenate([self.release_years, extra.release_years]),
+                       genre_bits=np.concatenate([self.genre_bits, extra.genre_bits]),
+                       genre_names=extra.genre_names,
+                       overviews=self.overviews.append(movies['overview'].fillna('')))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize the catalog as a DataFrame shaped like ``movies.csv``.
+
+        This decodes every overview; serving code should use the columns.
+        """
+        return pd.DataFrame({
+            'id': self.ids,
+            'title': self.titles,
+            'overview': self.overviews.to_list(),
+            'genres': [self.genres(row) for row in range(len(self))],
+            'release_year': pd.array([self.release_year(row) for row in range(len(self))], dtype='Int64')
+        })
+
+
+def is_catalog(path: str) -> bool:
+    """
+    Check whether a path points to a columnar catalog directory.
+
+    Args:
+        path (str): Path to check
+
+    Returns:
+        bool: True if ``path`` is a directory containing ``meta.json``
+    """
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def write_catalog(catalog: Catalog, out_dir: str) -> None:
+    """
+    Write a catalog as column files, replacing ``out_dir`` atomically.
+
+    Args:
+        catalog (Catalog): Catalog to write
+        out_dir (str): Output directory
+    """
+    tmp_dir = out_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'ids.npy'), catalog.ids.astype(np.int64))
+    np.save(os.path.join(tmp_dir, 'release_year.npy'), catalog.release_years.astype(np.int16))
+    np.save(os.path.join(tmp_dir, 'genres.npy'), catalog.genre_bits.astype(np.uint64))
+    titles = TextColumn.from_strings(catalog.titles)
+    for name, column in (('title', titles), ('overview', catalog.overviews)):
+        np.save(os.path.join(tmp_dir, f'{name}_offsets.npy'), column.offsets.astype(np.int64))
+        with open(os.path.join(tmp_dir, f'{name}s.bin'), 'wb') as f:
+            column.write_bytes(f)
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'rows': len(catalog),
+            'genre_names': catalog.genre_names
+        }, f)
+
+    old_dir = out_dir.rstrip(os.sep) + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _map_bytes(path: str) -> np.ndarray:
+    """Memory-map a byte file (empty files cannot be mapped)."""
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def load_catalog(path: str) -> Catalog:
+    """
+    Load a catalog from a column directory or, for compatibility, a CSV file.
+
+    Args:
+        path (str): Catalog directory or ``movies.csv``
+
+    Returns:
+        Catalog: The catalog; numeric columns and overviews are memory-mapped
+            read-only, so processes loading the same directory share them
+
+    Raises:
+        ValueError: If the catalog format version is not supported
+    """
+    if not is_catalog(path):
+        return Catalog.from_frame(pd.read_csv(path))
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported catalog version {meta.get('format_version')} in {path}")
+
+    titles = TextColumn(_map_bytes(os.path.join(path, 'titles.bin')),
+                        np.load(os.path.join(path, 'title_offsets.npy'), mmap_mode='r'))
+    overviews = TextColumn(_map_bytes(os.path.join(path, 'overviews.bin')),
+                           np.load(os.path.join(path, 'overview_offsets.npy'), mmap_mode='r'))
+    return Catalog(ids=np.load(os.path.join(path, 'ids.npy'), mmap_mode='r'),
+                   titles=np.array(titles.to_list(), dtype=object),
+                   release_years=np.load(os.path.join(path, 'release_year.npy'), mmap_mode='r'),
+                   genre_bits=np.load(os.path.join(path, 'genres.npy'), mmap_mode='r'),
+                   genre_names=meta['genre_names'],
+                   overviews=overviews)
+
+
+def main():
+    """Convert ``movies.csv`` to a columnar catalog."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--csv', default='data/movies.csv')
+    parser.add_argument('--out', default='data/catalog')
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.csv)
+    write_catalog(catalog, args.out)
+    print(f"Wrote {len(catalog)} movies ({len(catalog.genre_names)} genres) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Incremental Catalog Updates
+
+This module appends newly scraped movies to the existing catalog without
+re-running the data preparation notebook:
+
+1. New overviews are vectorized with the fitted vocabulary. If the saved
+   vectorizer is a ``CustomTfidfVectorizer``, its document frequencies and IDF
+   are first updated with ``partial_fit`` and it is saved once the new files
+   are in place. The refreshed IDF only weights the appended rows: rows
+   already in ``final_matrix`` keep the weights they were built with until
+   the notebook is re-run. The vectorizer that ships in ``models/`` is
+   sklearn's ``TfidfVectorizer``, which does not keep document frequencies:
+   its IDF stays frozen at the notebook's fit (a warning is printed), so new
+   terms get no weight until the notebook is re-run.
+2. Genre columns are filled from the ``g_*`` entries of ``feature_names.npy``.
+3. The rows are appended to ``movies.csv`` and ``final_matrix.npz`` (and the
+   columnar catalog and index artifact, if they exist), and the neighbor graph,
+   if there is one, is extended to them. Files are replaced atomically so a running
+   server can pick them up with ``POST /api/admin/reload``.
+4. If an index store is in use, a new generation is published and every
+   server worker switches to it on its next poll. The previous generation's
+   neighbor graph is extended to the new rows, so existing movies can be
+   recommended the new ones.
+
+Usage:
+    python -m src.catalog_update new_movies.csv
+"""
+
+import argparse
+import os
+import shutil
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+from typing import Sequence
+
+from src.index_artifact import is_index_artifact, write_index_artifact
+from src.catalog import Catalog, is_catalog, load_catalog, parse_genres, write_catalog
+from src.index_store import current_generation, generation_paths, publish_generation
+from src.neighbor_graph import extend_neighbor_graph, load_neighbor_graph, save_neighbor_graph
+
+GENRE_PREFIX = 'g_'
+
+
+def vectorize_movies(movies: pd.DataFrame, vectorizer, feature_names: Sequence[str]) -> sparse.csr_matrix:
+    """
+    Build feature rows laid out like ``final_matrix`` (TF-IDF, then genres).
+
+    Args:
+        movies (pd.DataFrame): Movies with 'overview' and 'genres' columns
+        vectorizer: Fitted vectorizer whose vocabulary matches the matrix
+        feature_names (Sequence[str]): Column names of ``final_matrix``
+
+    Returns:
+        sparse.csr_matrix: One feature row per movie
+
+    Raises:
+        ValueError: If the vectorizer output does not match the text columns
+    """
+    genre_columns = [name for name in feature_names if name.startswith(GENRE_PREFIX)]
+    tfidf = vectorizer.transform(movies['overview'].fillna('').tolist())
+    n_text = len(feature_names) - len(genre_columns)
+    if tfidf.shape[1] != n_text:
+        raise ValueError(f"Vectorizer produces {tfidf.shape[1]} columns, matrix has {n_text} text columns")
+
+    genre_position = {name[len(GENRE_PREFIX):]: col for col, name in enumerate(genre_columns)}
+    rows, cols = [], []
+    for row, genres in enumerate(movies['genres']):
+        for genre in parse_genres(genres):
+            if genre in genre_position:
+                rows.append(row)
+                cols.append(genre_position[genre])
+    genre_matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                                     shape=(len(movies), len(genre_columns)))
+    return sparse.hstack([tfidf, genre_matrix], format='csr')
+
+
+def update_catalog(data_path: str, matrix_path: str, new_movies: pd.DataFrame,
+                   vectorizer_path: str, feature_names_path: str,
+                   index_dir: str = None, catalog_dir: str = None, store_dir: str = None,
+                   graph_path: str = None) -> int:
+    """
+    Append new movies to the catalog files on disk.
+
+    The vectorizer's IDF is only updated if it supports ``partial_fit``
+    (``CustomTfidfVectorizer``); otherwise it stays frozen and a warning is printed.
+    An updated IDF weights the new rows only; rows already in the matrix keep
+    their weights until a full refit. The vectorizer is saved after the matrix
+    and ``movies.csv`` have been replaced, so a failed update leaves its
+    document frequencies untouched and can simply be re-run.
+
+    Args:
+        data_path (str): Path to ``movies.csv``
+        matrix_path (str): Path to ``final_matrix.npz``
+        new_movies (pd.DataFrame): Movies to add (same columns as ``movies.csv``)
+        vectorizer_path (str): Path to the fitted vectorizer (joblib)
+        feature_names_path (str): Path to ``feature_names.npy``
+        index_dir (str, optional): Index artifact directory to rewrite
+        catalog_dir (str, optional): Columnar catalog directory to rewrite
+        store_dir (str, optional): Index store to publish a new generation to,
+            if one has been published before
+        graph_path (str, optional): Neighbor graph (``.npz`` or directory) to
+            extend to the new rows
+
+    Returns:
+        int: Number of movies added (ids already in the catalog are skipped)
+    """
+    catalog = pd.read_csv(data_path)
+    new_movies = new_movies[~new_movies['id'].isin(catalog['id'])].drop_duplicates('id')
+    if len(new_movies) == 0:
+        return 0
+
+    vectorizer = joblib.load(vectorizer_path)
+    refit = hasattr(vectorizer, 'partial_fit')
+    if refit:
+        vectorizer.partial_fit(new_movies['overview'].fillna('').tolist())
+    else:
+        print(f"Warning: {type(vectorizer).__name__} in {vectorizer_path} has no partial_fit; "
+              f"IDF weights stay frozen at the last full fit")
+
+    feature_names = np.load(feature_names_path, allow_pickle=True)
+    vectors = vectorize_movies(new_movies, vectorizer, feature_names)
+    matrix = sparse.vstack([sparse.load_npz(matrix_path), vectors], format='csr')
+
+    # Write next to the originals and swap them in atomically
+    sparse.save_npz(matrix_path + '.tmp.npz', matrix)
+    os.replace(matrix_path + '.tmp.npz', matrix_path)
+    pd.concat([catalog, new_movies[catalog.columns]], ignore_index=True).to_csv(data_path + '.tmp', index=False)
+    os.replace(data_path + '.tmp', data_path)
+    if refit:
+        joblib.dump(vectorizer, vectorizer_path + '.tmp')
+        os.replace(vectorizer_path + '.tmp', vectorizer_path)
+    if index_dir is not None and is_index_artifact(index_dir):
+        write_index_artifact(matrix, index_dir)
+    if catalog_dir is not None and is_catalog(catalog_dir):
+        write_catalog(load_catalog(catalog_dir).append(new_movies), catalog_dir)
+    if graph_path is not None and os.path.exists(graph_path):
+        indices, scores, n_features = load_neighbor_graph(graph_path)
+        indices, scores = extend_neighbor_graph(indices, scores, matrix)
+        tmp_path = graph_path + '.tmp.npz' if graph_path.endswith('.npz') else graph_path + '.tmp'
+        save_neighbor_graph(tmp_path, indices, scores, n_features)
+        if os.path.isdir(graph_path):
+            shutil.rmtree(graph_path)
+        os.replace(tmp_path, graph_path)
+    previous = current_generation(store_dir) if store_dir is not None else None
+    if previous is not None:
+        updated = load_catalog(catalog_dir) if catalog_dir is not None and is_catalog(catalog_dir) \
+            else Catalog.from_frame(pd.read_csv(data_path))
+        publish_generation(store_dir, updated, matrix, generation_paths(store_dir, previous)['graph'])
+    return len(new_movies)
+
+
+def main():
+    """Append the movies of a CSV file to the catalog."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('new_movies', help='CSV with id, title, overview, genres, release_year')
+    parser.add_argument('--data', default='data/movies.csv')
+    parser.add_argument('--matrix', default='models/final_matrix.npz')
+    parser.add_argument('--vectorizer', default='models/tfidf_vectorizer.joblib')
+    parser.add_argument('--feature-names', default='models/feature_names.npy')
+    parser.add_argument('--index-dir', default='models/index')
+    parser.add_argument('--catalog-dir', default='data/catalog')
+    parser.add_argument('--store', default='models/store')
+    parser.add_argument('--graph', default='models/neighbor_graph.npz')
+    args = parser.parse_args()
+
+    added = update_catalog(args.data, args.matrix, pd.read_csv(args.new_movies),
+                           args.vectorizer, args.feature_names, args.index_dir, args.catalog_dir,
+                           args.store, args.graph)
+    print(f"Added {added} movies to {args.data}")
+
+
+if __name__ == "__main__":
+    main()
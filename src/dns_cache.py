@@ -0,0 +1,231 @@
+"""
+Cached DNS Resolution for TMDB Hosts
+
+This module resolves a fixed set of hosts (``api.themoviedb.org``,
+``image.tmdb.org``) through chosen nameservers, e.g. Google DNS to bypass ISP
+blocks, without paying a DNS round trip per connection:
+
+- Answers are cached for their record TTL (clamped to ``min_ttl``/``max_ttl``).
+- A lookup past ``refresh_ratio`` of the TTL is still served from the cache
+  while one background thread refreshes the entry, so callers never wait on
+  a renewal.
+- Every lookup returns all A records, rotated by one position, so connections
+  are spread across addresses and a dead address is skipped by the connector.
+- If the nameservers fail, a stale answer is served for up to ``max_stale``
+  seconds; after that, or if there never was an answer, the lookup falls back
+  to system DNS. Failures are remembered for ``negative_ttl`` seconds so a
+  broken nameserver does not add a timeout to every connection.
+
+``install`` wraps ``socket.getaddrinfo``, which the HTTP clients (and the
+asyncio event loop's executor lookups) go through. The resolve function is
+injectable, so tests can use a stub instead of the network.
+"""
+
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# (addresses, ttl seconds) for a host name
+ResolveFunction = Callable[[str], Tuple[List[str], float]]
+
+
+def dnspython_resolver(nameservers: Sequence[str], port: int = 53,
+                       timeout: float = 2.0) -> ResolveFunction:
+    """
+    Build a resolve function that queries A records with dnspython.
+
+    Args:
+        nameservers (Sequence[str]): Nameserver addresses
+        port (int, optional): Nameserver port (e.g. a local stub). Defaults to 53.
+        timeout (float, optional): Total seconds per lookup. Defaults to 2.0.
+
+    Returns:
+        ResolveFunction: host -> (addresses, ttl)
+
+    Raises:
+        ImportError: If dnspython is not installed
+    """
+    import dns.resolver
+
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.nameservers = list(nameservers)
+    resolver.port = port
+    resolver.lifetime = timeout
+
+    def resolve(host: str) -> Tuple[List[str], float]:
+        answers = resolver.resolve(host, 'A')
+        return [record.address for record in answers], answers.rrset.ttl
+
+    return resolve
+
+
+class _Entry:
+    """Cached answer for one host."""
+
+    __slots__ = ('addresses', 'resolved_at', 'ttl', 'turn')
+
+    def __init__(self, addresses: List[str], resolved_at: float, ttl: float):
+        self.addresses = addresses
+        self.resolved_at = resolved_at
+        self.ttl = ttl
+        self.turn = 0
+
+
+class CachedResolver:
+    """
+    TTL cache with background refresh in front of a resolve function.
+
+    Attributes:
+        hosts (frozenset): Host names handled by this resolver
+        stats (Dict[str, int]): Lookup counts by outcome ('hit', 'miss',
+            'stale', 'refresh', 'error', 'system')
+    """
+
+    def __init__(self, hosts: Iterable[str], resolve: Optional[ResolveFunction] = None,
+                 nameservers: Sequence[str] = ('8.8.8.8', '8.8.4.4'), min_ttl: float = 30,
+                 max_ttl: float = 3600, refresh_ratio: float = 0.75, max_stale: float = 3600,
+                 negative_ttl: float = 30, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the resolver.
+
+        Args:
+            hosts (Iterable[str]): Host names to resolve; others go to system DNS
+            resolve (ResolveFunction, optional): host -> (addresses, ttl). Defaults
+                to dnspython querying ``nameservers``.
+            nameservers (Sequence[str], optional): Used when ``resolve`` is None
+            min_ttl (float, optional): Shortest time an answer is cached. Defaults to 30.
+            max_ttl (float, optional): Longest time an answer is cached. Defaults to 3600.
+            refresh_ratio (float, optional): Share of the TTL after which a lookup
+                triggers a background refresh. Defaults to 0.75.
+            max_stale (float, optional): Seconds past expiry an answer may be served
+                while the nameservers fail. Defaults to 3600.
+            negative_ttl (float, optional): Seconds to skip the nameservers after a
+                failure. Defaults to 30.
+            clock (Callable[[], float], optional): Time source. Defaults to time.monotonic.
+
+        Raises:
+            ImportError: If ``resolve`` is None and dnspython is not installed
+        """
+        self.hosts = frozenset(host.lower() for host in hosts)
+        self.resolve = resolve if resolve is not None else dnspython_resolver(nameservers)
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.refresh_ratio = refresh_ratio
+        self.max_stale = max_stale
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.stats: Dict[str, int] = {outcome: 0 for outcome in
+                                      ('hit', 'miss', 'stale', 'refresh', 'error', 'system')}
+        self._entries: Dict[str, _Entry] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._original_getaddrinfo = None
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _fetch(self, host: str) -> Optional[_Entry]:
+        """Query the nameservers and cache the answer, None on failure."""
+        try:
+            addresses, ttl = self.resolve(host)
+        except Exception as e:
+            print(f"Warning: DNS resolution failed for {host}: {e}")
+            addresses = []
+        now = self.clock()
+        with self._lock:
+            if not addresses:
+                self.stats['error'] += 1
+                self._failed_at[host] = now
+                return None
+            entry = _Entry(list(addresses), now, min(max(ttl, self.min_ttl), self.max_ttl))
+            self._entries[host] = entry
+            self._failed_at.pop(host, None)
+            return entry
+
+    def _refresh(self, host: str) -> None:
+        try:
+            self._fetch(host)
+        finally:
+            with self._lock:
+                self._refreshing.discard(host)
+
+    def _refresh_in_background(self, host: str) -> None:
+        """Start one refresh thread per host at most."""
+        with self._lock:
+            if host in self._refreshing:
+                return
+            self._refreshing.add(host)
+            self.stats['refresh'] += 1
+        threading.Thread(target=self._refresh, args=(host,), name=f'dns-refresh-{host}', daemon=True).start()
+
+    def lookup(self, host: str) -> Optional[List[str]]:
+        """
+        Addresses of a host, rotated by one position per call.
+
+        Args:
+            host (str): Host name
+
+        Returns:
+            Optional[List[str]]: IPv4 addresses, None if the host is not handled
+                or should be resolved by system DNS
+        """
+        host = host.lower()
+        if host not in self.hosts:
+            return None
+
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(host)
+            failed_at = self._failed_at.get(host)
+        recently_failed = failed_at is not None and now - failed_at < self.negative_ttl
+
+        if entry is not None and now - entry.resolved_at < entry.ttl:
+            self._count('hit')
+            if now - entry.resolved_at >= entry.ttl * self.refresh_ratio and not recently_failed:
+                self._refresh_in_background(host)
+        else:
+            if not recently_failed:
+                self._count('miss')
+                entry = self._fetch(host) or entry
+            if entry is None or now - entry.resolved_at >= entry.ttl + self.max_stale:
+                self._count('system')
+                return None
+            if now - entry.resolved_at >= entry.ttl:
+                self._count('stale')
+
+        with self._lock:
+            turn = entry.turn % len(entry.addresses)
+            entry.turn += 1
+        return entry.addresses[turn:] + entry.addresses[:turn]
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Drop-in ``socket.getaddrinfo`` that answers handled hosts from the cache."""
+        original = self._original_getaddrinfo or socket.getaddrinfo
+        addresses = None
+        if isinstance(host, str) and family in (0, socket.AF_INET):
+            addresses = self.lookup(host)
+        if not addresses:
+            return original(host, port, family, type, proto, flags)
+
+        # Numeric lookups don't touch the network; the connector tries the
+        # results in order, so a dead address falls through to the next one
+        results = []
+        for address in addresses:
+            results.extend(original(address, port, socket.AF_INET, type, proto,
+                                    flags | socket.AI_NUMERICHOST))
+        return results
+
+    def install(self) -> None:
+        """Route ``socket.getaddrinfo`` through this resolver."""
+        if self._original_getaddrinfo is None:
+            self._original_getaddrinfo = socket.getaddrinfo
+            socket.getaddrinfo = self.getaddrinfo
+
+    def uninstall(self) -> None:
+        """Restore the original ``socket.getaddrinfo``."""
+        if self._original_getaddrinfo is not None:
+            socket.getaddrinfo = self._original_getaddrinfo
+            self._original_getaddrinfo = None
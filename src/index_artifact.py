@@ -0,0 +1,125 @@
+"""
+Pre-normalized, Memory-Mappable Index Artifact
+
+This module writes the feature matrix as a directory of raw CSR arrays that
+can be memory-mapped at startup instead of decompressed and parsed:
+
+    models/index/
+        data.npy      float32, rows already scaled to unit L2 norm
+        indices.npy   int32 column indices
+        indptr.npy    int32 (int64 for very large matrices) row pointers
+        meta.json     shape, nnz and format version
+
+Because every row has unit norm, cosine similarity is a plain dot product and
+no per-query norm arithmetic is needed. Arrays are stored as float32, which
+roughly halves resident memory compared to the float64 ``final_matrix.npz``.
+
+Usage:
+    python -m src.index_artifact --matrix models/final_matrix.npz --out models/index
+"""
+
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import scipy.sparse as sparse
+
+from src.tf_idf import normalize_sparse_matrix
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def is_index_artifact(path: str) -> bool:
+    """
+    Check whether a path points to an index artifact directory.
+
+    Args:
+        path (str): Path to check
+
+    Returns:
+        bool: True if ``path`` is a directory containing ``meta.json``
+    """
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def write_index_artifact(matrix: sparse.csr_matrix, out_dir: str) -> None:
+    """
+    Normalize a feature matrix and write it as raw CSR arrays.
+
+    Args:
+        matrix (sparse.csr_matrix): Feature matrix (one row per movie)
+        out_dir (str): Output directory, replaced if it exists
+    """
+    matrix = normalize_sparse_matrix(sparse.csr_matrix(matrix, dtype=np.float32))
+    matrix.sort_indices()
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+
+    # Write into a sibling directory first: files that running servers have
+    # memory-mapped are never overwritten in place
+    tmp_dir = out_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'data.npy'), matrix.data.astype(np.float32))
+    np.save(os.path.join(tmp_dir, 'indices.npy'), matrix.indices.astype(index_dtype))
+    np.save(os.path.join(tmp_dir, 'indptr.npy'), matrix.indptr.astype(index_dtype))
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'shape': list(matrix.shape),
+            'nnz': int(matrix.nnz),
+            'normalized': True
+        }, f)
+
+    old_dir = out_dir.rstrip(os.sep) + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def load_index_artifact(path: str) -> sparse.csr_matrix:
+    """
+    Memory-map an index artifact as a read-only CSR matrix.
+
+    The arrays are not parsed or copied; pages are loaded by the OS on first
+    access and shared between processes mapping the same files.
+
+    Args:
+        path (str): Artifact directory
+
+    Returns:
+        sparse.csr_matrix: Row-normalized float32 matrix backed by the files
+
+    Raises:
+        ValueError: If the artifact format version is not supported
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported index artifact version {meta.get('format_version')} in {path}")
+
+    data = np.load(os.path.join(path, 'data.npy'), mmap_mode='r')
+    indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode='r')
+    indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r')
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=tuple(meta['shape']), copy=False)
+    matrix.has_sorted_indices = True
+    return matrix
+
+
+def main():
+    """Convert a saved ``final_matrix.npz`` to an index artifact."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--matrix', default='models/final_matrix.npz')
+    parser.add_argument('--out', default='models/index')
+    args = parser.parse_args()
+
+    matrix = sparse.load_npz(args.matrix)
+    write_index_artifact(matrix, args.out)
+    print(f"Wrote {matrix.shape[0]} x {matrix.shape[1]} index artifact to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Versioned Index Store Shared by Server Workers
+
+This module publishes the serving files (columnar catalog, index artifact and,
+optionally, the neighbor graph) as numbered generations:
+
+    models/store/
+        CURRENT           number of the generation to serve, e.g. "3"
+        gen-000002/       previous generation, kept for workers still on it
+        gen-000003/
+            catalog/      see src/catalog.py
+            index/        see src/index_artifact.py
+            graph/        see src/neighbor_graph.py (optional)
+
+Every file in a generation is memory-mapped read-only, so all workers on a
+host share one copy of the matrix through the page cache instead of each
+loading its own. A generation is written completely before ``CURRENT`` is
+replaced atomically, and is never modified afterwards. Workers poll
+``CURRENT`` and load a newer generation when one is published, so a rebuilt
+index reaches every worker without a restart.
+
+Usage:
+    python -m src.index_store publish --data data/movies.csv --matrix models/final_matrix.npz \\
+        --graph models/neighbor_graph.npz --store models/store
+    python -m src.index_store current --store models/store
+"""
+
+import argparse
+import os
+import re
+import shutil
+from typing import Dict, Optional
+import scipy.sparse as sparse
+
+from src.catalog import Catalog, load_catalog, write_catalog
+from src.index_artifact import load_index_artifact, write_index_artifact
+from src.neighbor_graph import extend_neighbor_graph, load_neighbor_graph, save_neighbor_graph
+
+CURRENT_FILE = 'CURRENT'
+GENERATION_PATTERN = re.compile(r'^gen-(\d+)$')
+
+
+def generation_paths(store_dir: str, generation: int) -> Dict[str, str]:
+    """
+    Paths of the files of one generation.
+
+    Args:
+        store_dir (str): Store directory
+        generation (int): Generation number
+
+    Returns:
+        Dict[str, str]: 'root', 'catalog', 'index' and 'graph' paths
+    """
+    root = os.path.join(store_dir, f'gen-{generation:06d}')
+    return {
+        'root': root,
+        'catalog': os.path.join(root, 'catalog'),
+        'index': os.path.join(root, 'index'),
+        'graph': os.path.join(root, 'graph')
+    }
+
+
+def current_generation(store_dir: str) -> Optional[int]:
+    """
+    Read the generation workers should serve.
+
+    This is a single small file read, cheap enough to poll every few seconds.
+
+    Args:
+        store_dir (str): Store directory
+
+    Returns:
+        Optional[int]: Generation number, None if nothing has been published
+    """
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _generations(store_dir: str) -> list:
+    """Numbers of the generation directories present, in ascending order."""
+    if not os.path.isdir(store_dir):
+        return []
+    found = (GENERATION_PATTERN.match(name) for name in os.listdir(store_dir))
+    return sorted(int(match.group(1)) for match in found if match)
+
+
+def publish_generation(store_dir: str, catalog: Catalog, matrix: sparse.csr_matrix,
+                       graph_path: Optional[str] = None, keep: int = 2) -> int:
+    """
+    Write a new generation and make it current.
+
+    Args:
+        store_dir (str): Store directory, created if missing
+        catalog (Catalog): Movie catalog
+        matrix (sparse.csr_matrix): Feature matrix, one row per catalog movie
+        graph_path (str, optional): Neighbor graph to include (``.npz`` or
+            directory). A graph of an older generation may be passed after an
+            append-only update: it is extended to the appended rows, which are
+            also merged into the existing rows' neighbor lists.
+        keep (int, optional): Generations to keep, including the new one.
+            Defaults to 2.
+
+    Returns:
+        int: The new generation number
+
+    Raises:
+        ValueError: If the catalog and matrix row counts differ, or the graph
+            has more rows than the matrix
+    """
+    if len(catalog) != matrix.shape[0]:
+        raise ValueError(f"Catalog has {len(catalog)} movies but the matrix has {matrix.shape[0]} rows")
+
+    os.makedirs(store_dir, exist_ok=True)
+    generation = max(_generations(store_dir) + [current_generation(store_dir) or 0]) + 1
+    paths = generation_paths(store_dir, generation)
+    os.makedirs(paths['root'])
+    write_catalog(catalog, paths['catalog'])
+    write_index_artifact(matrix, paths['index'])
+    if graph_path is not None and os.path.exists(graph_path):
+        indices, scores, n_features = load_neighbor_graph(graph_path)
+        indices, scores = extend_neighbor_graph(indices, scores, matrix)
+        save_neighbor_graph(paths['graph'], indices, scores, n_features)
+
+    # Readers only ever see a complete generation number
+    current_path = os.path.join(store_dir, CURRENT_FILE)
+    with open(current_path + '.tmp', 'w') as f:
+        f.write(f'{generation}\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_path + '.tmp', current_path)
+
+    # Workers that still map an old generation keep their pages until they
+    # move on: unlinking a mapped file does not invalidate the mapping
+    for old in _generations(store_dir)[:-keep]:
+        shutil.rmtree(generation_paths(store_dir, old)['root'], ignore_errors=True)
+    return generation
+
+
+def main():
+    """Publish a generation or print the current one."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('command', choices=['publish', 'current'])
+    parser.add_argument('--store', default='models/store')
+    parser.add_argument('--data', default='data/movies.csv', help='movies.csv or a catalog directory')
+    parser.add_argument('--matrix', default='models/final_matrix.npz', help='.npz or an index artifact')
+    parser.add_argument('--graph', default=None, help='Neighbor graph to include')
+    parser.add_argument('--keep', type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == 'current':
+        print(current_generation(args.store))
+        return
+
+    catalog = load_catalog(args.data)
+    if os.path.isdir(args.matrix):
+        matrix = load_index_artifact(args.matrix)
+    else:
+        matrix = sparse.load_npz(args.matrix)
+    generation = publish_generation(args.store, catalog, matrix, args.graph, args.keep)
+    print(f"Published generation {generation} ({len(catalog)} movies) to {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,87 @@ The system uses pre-computed TF-IDF vectors combined with genre information
 to find movies similar to a query movie based on both content and genre similarity.
 """
 
+import copy
+import os
+import re
+import unicodedata
 import numpy as np
 import pandas as pd
 import scipy.sparse as sparse
-from typing import List, Tuple, Optional
+from typing import Dict, List, Mapping, Tuple, Optional, Sequence, Union
+
+from src.catalog import MISSING_YEAR, load_catalog, parse_genres
+from src.index_artifact import is_index_artifact, load_index_artifact
+from src.metrics import counter, histogram
+from src.tf_idf import normalize_sparse_matrix
+
+STAGE_SECONDS = histogram('movie_match_recommender_stage_seconds',
+                          'Time spent in each MovieRecommender stage', ['stage'])
+NEIGHBOR_ROWS = counter('movie_match_recommender_neighbor_rows_total',
+                        'Query rows answered by each neighbor source', ['source'])
+
+# Bound children, so the hot path skips the label lookup
+_LOOKUP = STAGE_SECONDS.labels('lookup')
+_FILTER = STAGE_SECONDS.labels('filter')
+_SCORE = STAGE_SECONDS.labels('score')
+_FORMAT = STAGE_SECONDS.labels('format')
+_PROFILE = STAGE_SECONDS.labels('profile')
+_FROM_GRAPH = NEIGHBOR_ROWS.labels('graph')
+_FROM_ANN = NEIGHBOR_ROWS.labels('ann')
+_FROM_EMBEDDING = NEIGHBOR_ROWS.labels('embedding')
+_FROM_QUANTIZED = NEIGHBOR_ROWS.labels('quantized')
+_FROM_EXACT = NEIGHBOR_ROWS.labels('exact')
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a movie title for lookups.
+    
+    Accents are stripped, case is folded, apostrophes are dropped and any
+    other punctuation becomes whitespace, so "Amélie", "AMELIE" and
+    "Spider-Man" / "Spider Man" compare equal.
+    
+    Args:
+        title (str): Raw title
+        
+    Returns:
+        str: Normalized title
+    """
+    title = unicodedata.normalize('NFKD', str(title))
+    title = ''.join(ch for ch in title if not unicodedata.combining(ch)).casefold()
+    title = re.sub(r"['\u2019`]", '', title)
+    title = re.sub(r'[\W_]+', ' ', title)
+    return title.strip()
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k highest scores of every row without sorting the full row.
+
+    Uses ``np.argpartition`` (linear time) to isolate the top-k candidates
+    and only sorts those k entries.
+
+    Args:
+        scores (np.ndarray): 2-D array of shape (n_queries, n_movies)
+        k (int): Number of entries to keep per row
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Column indices and scores of shape
+            (n_queries, k), ordered by descending score
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
+
 
 class MovieRecommender:
     """
@@ -21,45 +98,366 @@ class MovieRecommender:
     based on their descriptions (TF-IDF vectors) and genres.
     
     Attributes:
-        data_path (str): Path to the CSV file containing movie information
+        data_path (str): Path to the movie catalog (columnar directory or CSV)
         matrix_path (str): Path to the NPZ file containing the feature matrix
-        df (pd.DataFrame): DataFrame containing movie information
+        catalog (Catalog): Columnar movie information
         final_matrix (sparse.csr_matrix): Combined TF-IDF and genre feature matrix
+        prenormalized (bool): True if rows of final_matrix already have unit norm
         k (int): Number of recommendations to return
+        graph_indices (np.ndarray): Precomputed neighbor rows, None if no graph is loaded
+        graph_scores (np.ndarray): Precomputed neighbor scores, None if no graph is loaded
+        search_mode (str): 'exact' for brute-force scoring, 'ann' for the IVF index,
+            'embedding' for dense scoring in the low-rank embedding or
+            'quantized' for an int8 scan with exact re-ranking
+        ann_index (IVFIndex): Approximate index, None if no index is loaded
+        embedding (LowRankEmbedding): Dense embedding, None if none is loaded
+        quantized (QuantizedIndex): int8 index, None if none is loaded
+        text_encoder (TextQueryEncoder): Free-text query encoder, None if no vectorizer is loaded
+        genre_bitmaps (Dict[str, np.ndarray]): Casefolded genre -> packed row bitmap
+        year_order (np.ndarray): Rows sorted by release year
     """
+
+    MEDIA_TYPES = ('movie', 'tv')
+    SEARCH_MODES = ('exact', 'ann', 'embedding', 'quantized')
     
-    def __init__(self, data_path: str, matrix_path: str, k: int = 5):
+    def __init__(self, data_path: str, matrix_path: str, k: int = 5,
+                 graph_path: Optional[str] = None, search_mode: str = 'exact',
+                 ann_index_path: Optional[str] = None, n_probe: Optional[int] = None,
+                 vectorizer_path: Optional[str] = None, feature_names_path: Optional[str] = None,
+                 embedding_path: Optional[str] = None, quantized_path: Optional[str] = None):
         """
         Initialize the recommender system.
         
         Args:
-            data_path (str): Path to the movies CSV file
-            matrix_path (str): Path to the pre-computed feature matrix
+            data_path (str): Path to a columnar catalog directory written by
+                ``src.catalog`` or to the movies CSV file
+            matrix_path (str): Path to the pre-computed feature matrix, either a
+                ``.npz`` file or an index artifact directory written by
+                ``src.index_artifact`` (memory-mapped, pre-normalized)
             k (int, optional): Number of recommendations to return. Defaults to 5.
+            graph_path (str, optional): Path to a neighbor graph built by
+                ``src.neighbor_graph``. Ignored if the file does not exist or
+                was built for a different matrix (feature space or row count).
+            search_mode (str, optional): 'exact', 'ann', 'embedding' or 'quantized'.
+                Defaults to 'exact'.
+            ann_index_path (str, optional): Path to an IVF index built by
+                ``src.ann``. Required for 'ann' mode.
+            n_probe (int, optional): IVF cells scanned per query, overriding
+                the value stored in the index. Higher is slower but more accurate.
+            vectorizer_path (str, optional): Fitted TF-IDF vectorizer (joblib),
+                enables ``describe``. Used together with ``feature_names_path``.
+            feature_names_path (str, optional): Column names of the feature matrix
+            embedding_path (str, optional): Path to an embedding built by
+                ``src.embedding``. Required for 'embedding' mode.
+            quantized_path (str, optional): Path to an int8 index built by
+                ``src.quantized``. Required for 'quantized' mode; pair it with an
+                index artifact so re-ranking reads candidate rows from disk.
+        
+        Raises:
+            ValueError: If 'ann', 'embedding' or 'quantized' mode is requested
+                without a usable index
         """
         self.data_path = data_path
         self.matrix_path = matrix_path
         self.k = k
         
         # Load data
-        self.df = pd.read_csv(data_path)
-        self.final_matrix = sparse.load_npz(matrix_path)
+        self.catalog = load_catalog(data_path)
+        self._df = None
+        self.prenormalized = is_index_artifact(matrix_path)
+        if self.prenormalized:
+            # Rows already have unit norm: cosine similarity is a dot product
+            self.final_matrix = load_index_artifact(matrix_path)
+            self.movie_norms = np.ones(self.final_matrix.shape[0], dtype=np.float32)
+        else:
+            self.final_matrix = sparse.load_npz(matrix_path).tocsr()
+            
+            # Calculate norms for all movies (pre-computed)
+            self.movie_norms = sparse.linalg.norm(self.final_matrix, axis=1)
+
+        # Build title and id lookup tables once
+        self._build_indexes()
+        self._build_filter_indexes()
+
+        # Load precomputed neighbors if available
+        self.graph_indices = None
+        self.graph_scores = None
+        if graph_path is not None and os.path.exists(graph_path):
+            from src.neighbor_graph import load_neighbor_graph
+            indices, scores, n_features = load_neighbor_graph(graph_path)
+            if n_features == self.final_matrix.shape[1] and len(indices) == self.final_matrix.shape[0]:
+                self.graph_indices = indices
+                self.graph_scores = scores
+            else:
+                # A graph for fewer rows would hide the newer movies from the older ones
+                print(f"Warning: ignoring neighbor graph {graph_path} built for a different matrix "
+                      f"({len(indices)} rows, {n_features} features)")
+
+        # Load the approximate index if requested
+        self.ann_index = None
+        if ann_index_path is not None and os.path.exists(ann_index_path):
+            from src.ann import IVFIndex
+            self.ann_index = IVFIndex.load(ann_index_path)
+            n_indexed = len(self.ann_index.list_rows)
+            # A pre-normalized artifact is shared with the index instead of copied
+            shared = self.final_matrix if self.prenormalized else None
+            if n_indexed == self.final_matrix.shape[0]:
+                self.ann_index.attach(self.final_matrix, normalized=self.prenormalized)
+            else:
+                # Rows appended after the index was built
+                self.ann_index.attach(self.final_matrix[:n_indexed], normalized=self.prenormalized)
+                self.ann_index = self.ann_index.extend(self.final_matrix[n_indexed:], matrix=shared)
+            if n_probe is not None:
+                self.ann_index.n_probe = n_probe
+
+        # Load the dense embedding if requested
+        self.embedding = None
+        if embedding_path is not None and os.path.exists(embedding_path):
+            from src.embedding import LowRankEmbedding
+            embedding = LowRankEmbedding.load(embedding_path)
+            n_embedded = len(embedding.vectors)
+            if embedding.components.shape[1] == self.final_matrix.shape[1] and n_embedded <= self.final_matrix.shape[0]:
+                if n_embedded < self.final_matrix.shape[0]:
+                    # Rows appended after the embedding was built
+                    embedding = embedding.extend(self.final_matrix[n_embedded:])
+                self.embedding = embedding
+
+        # Load the int8 index if requested
+        self.quantized = None
+        if quantized_path is not None and os.path.exists(quantized_path):
+            from src.quantized import QuantizedIndex
+            quantized = QuantizedIndex.load(quantized_path)
+            n_quantized = quantized.codes.shape[0]
+            if quantized.codes.shape[1] == self.final_matrix.shape[1] and n_quantized <= self.final_matrix.shape[0]:
+                if n_quantized < self.final_matrix.shape[0]:
+                    # Rows appended after the index was built
+                    quantized = quantized.extend(self.final_matrix[n_quantized:])
+                self.quantized = quantized.attach(self.final_matrix, self.movie_norms)
+        self.set_search_mode(search_mode)
+
+        # Load the vectorizer for free-text queries once
+        self.text_encoder = None
+        if (vectorizer_path is not None and feature_names_path is not None
+                and os.path.exists(vectorizer_path) and os.path.exists(feature_names_path)):
+            from src.text_query import TextQueryEncoder
+            self.text_encoder = TextQueryEncoder(vectorizer_path, feature_names_path)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        The catalog as a DataFrame, built on first access.
+        
+        Kept for compatibility; it decodes every overview, so serving code
+        uses ``catalog`` instead.
+        """
+        if self._df is None:
+            self._df = self.catalog.to_frame()
+        return self._df
+
+    def set_search_mode(self, mode: str) -> None:
+        """
+        Switch between exact, approximate, embedding and quantized live scoring.
+        
+        Args:
+            mode (str): 'exact', 'ann', 'embedding' or 'quantized'
+            
+        Raises:
+            ValueError: If the mode is unknown or its index is not loaded
+        """
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'")
+        if mode == 'ann' and self.ann_index is None:
+            raise ValueError("Search mode 'ann' requires an ANN index")
+        if mode == 'embedding' and self.embedding is None:
+            raise ValueError("Search mode 'embedding' requires an embedding")
+        if mode == 'quantized' and self.quantized is None:
+            raise ValueError("Search mode 'quantized' requires a quantized index")
+        self.search_mode = mode
+        
+    def _build_indexes(self) -> None:
+        """
+        Build the normalized-title -> rows and TMDB id -> row hash indexes.
+        
+        Titles shared by several movies keep every row, in catalog order.
+        Duplicate ids keep their first row.
+        """
+        self.title_index: Dict[str, List[int]] = {}
+        for row, title in enumerate(self.catalog.titles):
+            self.title_index.setdefault(normalize_title(title), []).append(row)
+
+        self.id_index: Dict[int, int] = {}
+        for row, movie_id in enumerate(self.catalog.ids):
+            self.id_index.setdefault(int(movie_id), row)
+
+    def _build_filter_indexes(self) -> None:
+        """
+        Build the per-genre row bitmaps and the year-sorted row order used to
+        restrict candidates before scoring.
+        """
+        self.genre_bitmaps: Dict[str, np.ndarray] = {}
+        for bit, name in enumerate(self.catalog.genre_names):
+            has_genre = (self.catalog.genre_bits >> np.uint64(bit)) & np.uint64(1)
+            self.genre_bitmaps[name.casefold()] = np.packbits(has_genre.astype(bool))
+
+        self.year_order = np.argsort(self.catalog.release_years, kind='stable')
+        self._sorted_years = self.catalog.release_years[self.year_order]
+
+    def filter_rows(self, genres: Optional[Sequence[str]] = None, year_min: Optional[int] = None,
+                    year_max: Optional[int] = None, media_type: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Get the catalog rows matching a filter.
+        
+        Args:
+            genres (Sequence[str], optional): Movies must have all of these
+                genres (case-insensitive)
+            year_min (int, optional): Earliest release year, inclusive
+            year_max (int, optional): Latest release year, inclusive
+            media_type (str, optional): 'movie' or 'tv'. The catalog only
+                holds movies, so 'tv' matches nothing.
+            
+        Returns:
+            Optional[np.ndarray]: Sorted matching rows, or None if no filter is set
+            
+        Raises:
+            ValueError: If a genre or the media type is unknown
+        """
+        if not genres and year_min is None and year_max is None and media_type is None:
+            return None
+        if media_type is not None and media_type not in self.MEDIA_TYPES:
+            raise ValueError(f"Unknown media type '{media_type}'")
+
+        n_movies = len(self.catalog)
+        mask = np.ones(n_movies, dtype=bool)
+        if media_type == 'tv':
+            mask[:] = False
+
+        if genres:
+            bitmap = None
+            for genre in genres:
+                genre_bitmap = self.genre_bitmaps.get(genre.strip().casefold())
+                if genre_bitmap is None:
+                    raise ValueError(f"Unknown genre '{genre}'")
+                bitmap = genre_bitmap if bitmap is None else bitmap & genre_bitmap
+            mask &= np.unpackbits(bitmap, count=n_movies).astype(bool)
+
+        if year_min is not None or year_max is not None:
+            # Movies without a release year never match a year filter
+            low = max(year_min if year_min is not None else MISSING_YEAR + 1, MISSING_YEAR + 1)
+            start = np.searchsorted(self._sorted_years, low, side='left')
+            end = (np.searchsorted(self._sorted_years, year_max, side='right')
+                   if year_max is not None else n_movies)
+            in_years = np.zeros(n_movies, dtype=bool)
+            in_years[self.year_order[start:end]] = True
+            mask &= in_years
+
+        return np.flatnonzero(mask)
+
+    def add_movies(self, movies: pd.DataFrame, vectors: sparse.csr_matrix) -> 'MovieRecommender':
+        """
+        Return a new recommender with extra movies appended to the catalog.
+        
+        The feature matrix, norms, lookup indexes and search indexes are extended
+        incrementally. The current instance is not modified, so it can keep
+        serving in-flight requests until the new one is swapped in. The
+        precomputed neighbor graph is extended too: appended rows get their
+        own lists and are merged into the existing rows' lists.
+        
+        Args:
+            movies (pd.DataFrame): New catalog rows (same columns as ``movies.csv``)
+            vectors (sparse.csr_matrix): Their feature rows, built the same way
+                as ``final_matrix`` (TF-IDF followed by genre columns)
+            
+        Returns:
+            MovieRecommender: The extended recommender
+            
+        Raises:
+            ValueError: If ``vectors`` does not match ``movies`` and the feature space
+        """
+        expected_shape = (len(movies), self.final_matrix.shape[1])
+        if vectors.shape != expected_shape:
+            raise ValueError(f"Expected vectors of shape {expected_shape}, got {vectors.shape}")
+        
+        vectors = sparse.csr_matrix(vectors, dtype=self.final_matrix.dtype)
+        if self.prenormalized:
+            vectors = normalize_sparse_matrix(vectors)
         
-        # Calculate norms for all movies (pre-computed)
-        self.movie_norms = sparse.linalg.norm(self.final_matrix, axis=1)
+        extended = copy.copy(self)
+        first_row = len(self.catalog)
+        extended.catalog = self.catalog.append(movies)
+        extended._df = None
+        extended.final_matrix = sparse.vstack([self.final_matrix, vectors], format='csr')
+        extended.movie_norms = np.concatenate([self.movie_norms, sparse.linalg.norm(vectors, axis=1)])
+        if self.ann_index is not None:
+            extended.ann_index = self.ann_index.extend(
+                vectors, matrix=extended.final_matrix if self.prenormalized else None)
+        if self.embedding is not None:
+            extended.embedding = self.embedding.extend(vectors)
+        if self.quantized is not None:
+            extended.quantized = self.quantized.extend(vectors).attach(extended.final_matrix,
+                                                                       extended.movie_norms)
+        if self.graph_indices is not None:
+            from src.neighbor_graph import extend_neighbor_graph
+            extended.graph_indices, extended.graph_scores = extend_neighbor_graph(
+                self.graph_indices, self.graph_scores, extended.final_matrix)
         
+        # Extend the lookup indexes without touching the ones in use
+        extended.title_index = dict(self.title_index)
+        extended.id_index = dict(self.id_index)
+        for row, (title, movie_id) in enumerate(zip(movies['title'], movies['id']), start=first_row):
+            key = normalize_title(title)
+            extended.title_index[key] = extended.title_index.get(key, []) + [row]
+            extended.id_index.setdefault(int(movie_id), row)
+        extended._build_filter_indexes()
+        return extended
+
     def _get_movie_index(self, title: str) -> Optional[int]:
         """
         Get the index of a movie by its title.
         
+        Among movies sharing the same normalized title, one whose title
+        matches case-insensitively wins; otherwise the first in the catalog.
+        
         Args:
             title (str): The title of the movie to look up
             
         Returns:
             Optional[int]: Index of the movie if found, None if not found
         """
-        matches = self.df[self.df['title'].str.lower() == title.lower()].index
-        return matches[0] if len(matches) > 0 else None
+        matches = self.title_index.get(normalize_title(title))
+        if not matches:
+            return None
+        if len(matches) > 1:
+            titles = self.catalog.titles
+            for row in matches:
+                if str(titles[row]).lower() == title.lower():
+                    return row
+        return matches[0]
+
+    def _get_movie_index_by_id(self, movie_id: int) -> Optional[int]:
+        """
+        Get the index of a movie by its TMDB id.
+        
+        Args:
+            movie_id (int): The TMDB id of the movie to look up
+            
+        Returns:
+            Optional[int]: Index of the movie if found, None if not found
+        """
+        return self.id_index.get(int(movie_id))
+
+    def _resolve_query(self, query: Union[str, int]) -> Optional[int]:
+        """
+        Resolve a title (str) or TMDB id (int) to a row index.
+        
+        Args:
+            query (Union[str, int]): Movie title or TMDB id
+            
+        Returns:
+            Optional[int]: Index of the movie if found, None if not found
+        """
+        if isinstance(query, (int, np.integer)):
+            return self._get_movie_index_by_id(query)
+        return self._get_movie_index(query)
     
     def _calculate_similarity(self, query_vec: sparse.csr_matrix) -> np.ndarray:
         """
@@ -73,6 +471,8 @@ class MovieRecommender:
         """
         # Calculate dot products (sparse @ sparse)
         dot_products = self.final_matrix.dot(query_vec.T).toarray().flatten()
+        if self.prenormalized:
+            return dot_products / (sparse.linalg.norm(query_vec) + 1e-10)
         
         # Calculate query norm
         norm_query = sparse.linalg.norm(query_vec)
@@ -80,49 +480,431 @@ class MovieRecommender:
         # Calculate cosine similarity
         return dot_products / (self.movie_norms * norm_query + 1e-10)
     
-    def get_recommendations(self, title: str) -> List[dict]:
+    def _score_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Calculate cosine similarity between several movies and all movies.
+        
+        Args:
+            rows (np.ndarray): Row indices of the query movies
+            
+        Returns:
+            np.ndarray: Array of shape (len(rows), n_movies); each query's own
+                column is set to -inf so it is never recommended
+        """
+        # One sparse product scores every query against every movie
+        cosine_sims = (self.final_matrix[rows] @ self.final_matrix.T).toarray()
+        if not self.prenormalized:
+            query_norms = self.movie_norms[rows]
+            cosine_sims /= query_norms[:, np.newaxis] * self.movie_norms[np.newaxis, :] + 1e-10
+        cosine_sims[np.arange(len(rows)), rows] = -np.inf
+        return cosine_sims
+
+    def _filtered_neighbors(self, rows: np.ndarray, k: int,
+                            candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k nearest neighbors of several movies among candidate rows.
+        
+        A row whose precomputed neighbor list contains at least k candidates
+        is answered from it: those are exactly the k best candidates. The
+        other rows are scored against the candidate rows only (in the
+        embedding or the int8 index in those modes), so narrower filters
+        mean less work.
+        
+        Args:
+            rows (np.ndarray): Row indices of the query movies
+            k (int): Number of neighbors per movie
+            candidates (np.ndarray): Sorted rows allowed in the results
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Neighbor rows and cosine scores of
+                shape (len(rows), k); -1 / -inf where fewer than k candidates exist
+        """
+        indices = np.full((len(rows), k), -1, dtype=np.int64)
+        scores = np.full((len(rows), k), -np.inf)
+        live = np.ones(len(rows), dtype=bool)
+
+        if self.graph_indices is not None and k > 0:
+            allowed = np.zeros(self.final_matrix.shape[0], dtype=bool)
+            allowed[candidates] = True
+            in_graph = np.flatnonzero(rows < len(self.graph_indices))
+            graph_rows = self.graph_indices[rows[in_graph]]
+            hits = (graph_rows >= 0) & allowed[graph_rows]
+            covered = hits.sum(axis=1) >= k
+            # Positions of the first k allowed neighbors, in score order
+            first_hits = np.argsort(~hits[covered], axis=1, kind='stable')[:, :k]
+            served = in_graph[covered]
+            indices[served] = np.take_along_axis(graph_rows[covered], first_hits, axis=1)
+            scores[served] = np.take_along_axis(self.graph_scores[rows[served]], first_hits, axis=1)
+            live[served] = False
+            _FROM_GRAPH.inc(len(served))
+
+        if live.any() and len(candidates) > 0 and self.search_mode == 'embedding':
+            live_rows = rows[live]
+            indices[live], scores[live] = self.embedding.search(self.embedding.vectors[live_rows], k,
+                                                                exclude=live_rows, candidates=candidates)
+            _FROM_EMBEDDING.inc(len(live_rows))
+        elif live.any() and len(candidates) > 0 and self.search_mode == 'quantized':
+            live_rows = rows[live]
+            indices[live], scores[live] = self.quantized.search(self.final_matrix[live_rows], k,
+                                                                exclude=live_rows, candidates=candidates)
+            _FROM_QUANTIZED.inc(len(live_rows))
+        elif live.any() and len(candidates) > 0:
+            live_rows = rows[live]
+            cosine_sims = (self.final_matrix[live_rows] @ self.final_matrix[candidates].T).toarray()
+            if not self.prenormalized:
+                cosine_sims /= (self.movie_norms[live_rows][:, np.newaxis]
+                                * self.movie_norms[candidates][np.newaxis, :] + 1e-10)
+            # Never recommend a query movie to itself
+            positions = np.minimum(np.searchsorted(candidates, live_rows), len(candidates) - 1)
+            is_self = candidates[positions] == live_rows
+            cosine_sims[np.flatnonzero(is_self), positions[is_self]] = -np.inf
+
+            top, top_scores = _top_k(cosine_sims, k)
+            top_rows = np.where(np.isfinite(top_scores), candidates[top], -1)
+            n_found = top.shape[1]
+            indices[np.flatnonzero(live), :n_found] = top_rows
+            scores[np.flatnonzero(live), :n_found] = top_scores
+            _FROM_EXACT.inc(len(live_rows))
+
+        return indices, scores
+
+    def _neighbors(self, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the k nearest neighbors of several movies.
+        
+        Rows covered by the precomputed neighbor graph are served from it in
+        O(k); the remaining rows are scored live in one batch, through the
+        ANN index in 'ann' mode, with one dense product in 'embedding' mode,
+        through the int8 index in 'quantized' mode, or by brute force otherwise.
+        
+        Args:
+            rows (np.ndarray): Row indices of the query movies
+            k (int): Number of neighbors per movie
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Neighbor rows and cosine scores,
+                both of shape (len(rows), k)
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        indices = np.empty((len(rows), k), dtype=np.int64)
+        scores = np.empty((len(rows), k))
+
+        live = np.ones(len(rows), dtype=bool)
+        if self.graph_indices is not None and k <= self.graph_indices.shape[1]:
+            in_graph = rows < len(self.graph_indices)
+            covered = np.zeros(len(rows), dtype=bool)
+            covered[in_graph] = (self.graph_indices[rows[in_graph], :k] >= 0).all(axis=1)
+            indices[covered] = self.graph_indices[rows[covered], :k]
+            scores[covered] = self.graph_scores[rows[covered], :k]
+            live = ~covered
+            _FROM_GRAPH.inc(int(covered.sum()))
+
+        if live.any() and self.search_mode == 'ann':
+            live_rows = rows[live]
+            ann_indices, ann_scores = self.ann_index.search(self.final_matrix[live_rows], k, exclude=live_rows)
+            # Rows whose probed cells held fewer than k movies are scored exactly
+            complete = (ann_indices >= 0).all(axis=1)
+            served = np.flatnonzero(live)[complete]
+            indices[served], scores[served] = ann_indices[complete], ann_scores[complete]
+            live[served] = False
+            _FROM_ANN.inc(len(served))
+
+        if live.any() and self.search_mode == 'embedding':
+            live_rows = rows[live]
+            indices[live], scores[live] = self.embedding.search(self.embedding.vectors[live_rows], k,
+                                                                exclude=live_rows)
+            live[:] = False
+            _FROM_EMBEDDING.inc(len(live_rows))
+
+        if live.any() and self.search_mode == 'quantized':
+            live_rows = rows[live]
+            indices[live], scores[live] = self.quantized.search(self.final_matrix[live_rows], k,
+                                                                exclude=live_rows)
+            live[:] = False
+            _FROM_QUANTIZED.inc(len(live_rows))
+
+        if live.any():
+            indices[live], scores[live] = _top_k(self._score_rows(rows[live]), k)
+            _FROM_EXACT.inc(int(live.sum()))
+
+        return indices, scores
+
+    def get_recommendations(self, title: Union[str, int], genres: Optional[Sequence[str]] = None,
+                            year_min: Optional[int] = None, year_max: Optional[int] = None,
+                            media_type: Optional[str] = None) -> List[dict]:
         """
         Get movie recommendations based on a query movie title.
         
+        Filters restrict the candidate movies before similarity is scored;
+        fewer than ``k`` results are returned if fewer movies match.
+        
         Args:
-            title (str): Title of the movie to base recommendations on
+            title (Union[str, int]): Title (or TMDB id) of the movie to base
+                recommendations on
+            genres (Sequence[str], optional): Only recommend movies with all of these genres
+            year_min (int, optional): Only recommend movies released in or after this year
+            year_max (int, optional): Only recommend movies released in or before this year
+            media_type (str, optional): 'movie' or 'tv'
             
         Returns:
             List[dict]: List of dictionaries containing movie details (title, similarity, id)
             
         Raises:
-            ValueError: If the movie title is not found in the database
+            ValueError: If the movie title is not found in the database or
+                the filter is invalid
         """
         # Find movie index
-        query_index = self._get_movie_index(title)
+        with _LOOKUP.time():
+            query_index = self._resolve_query(title)
         if query_index is None:
             raise ValueError(f"Movie '{title}' not found in database")
             
-        # Get query vector and calculate similarities
-        query_vec = self.final_matrix[query_index]
-        cosine_sims = self._calculate_similarity(query_vec)
-        
         # Get top k similar movies (excluding the query movie itself)
-        top_indices = np.argsort(cosine_sims)[::-1][1:self.k+1]
+        k = min(self.k, self.final_matrix.shape[0] - 1)
+        with _FILTER.time():
+            candidates = self.filter_rows(genres, year_min, year_max, media_type)
+        with _SCORE.time():
+            if candidates is None:
+                top_indices, top_scores = self._neighbors(np.array([query_index]), k)
+            else:
+                top_indices, top_scores = self._filtered_neighbors(np.array([query_index]), k, candidates)
         
         # Return movie titles and similarity scores
+        with _FORMAT.time():
+            recommendations = []
+            for idx, score in zip(top_indices[0], top_scores[0]):
+                if idx < 0:
+                    break
+                recommendations.append({
+                    'title': self.catalog.titles[idx],
+                    'similarity': float(score),
+                    'id': int(self.catalog.ids[idx])
+                })
+            
+        return recommendations
+
+    def build_profile(self, liked: Mapping[Union[str, int], float],
+                      disliked: Optional[Mapping[Union[str, int], float]] = None
+                      ) -> Tuple[sparse.csr_matrix, np.ndarray, List[Union[str, int]]]:
+        """
+        Build a taste profile vector from weighted liked and disliked movies.
+        
+        The profile is the weighted sum of the seeds' unit-norm feature rows,
+        liked movies added and disliked ones subtracted, computed with one
+        sparse product over the seed rows.
+        
+        Args:
+            liked (Mapping[Union[str, int], float]): Title or TMDB id -> weight
+            disliked (Mapping[Union[str, int], float], optional): Title or TMDB id -> weight
+            
+        Returns:
+            Tuple[sparse.csr_matrix, np.ndarray, List[Union[str, int]]]: The
+                unit-norm (1, n_features) profile, the seed rows and the
+                seeds that are not in the catalog
+            
+        Raises:
+            ValueError: If no liked movie is in the catalog or the profile is empty
+        """
+        seeds = [(query, float(weight)) for query, weight in liked.items()]
+        seeds += [(query, -float(weight)) for query, weight in (disliked or {}).items()]
+        rows, weights, missing = [], [], []
+        for query, weight in seeds:
+            row = self._resolve_query(query)
+            if row is None:
+                missing.append(query)
+            else:
+                rows.append(row)
+                weights.append(weight)
+        if not any(weight > 0 for weight in weights):
+            raise ValueError("None of the liked movies are in the database")
+        
+        rows = np.array(rows, dtype=np.int64)
+        weights = np.array(weights) / (self.movie_norms[rows] + 1e-10)
+        profile = sparse.csr_matrix(weights[np.newaxis, :]) @ self.final_matrix[rows]
+        norm = sparse.linalg.norm(profile)
+        if norm == 0:
+            raise ValueError("Liked and disliked movies cancel out")
+        return sparse.csr_matrix(profile / norm), np.unique(rows), missing
+
+    def recommend_profile(self, profile: sparse.csr_matrix, seed_rows: np.ndarray,
+                          k: Optional[int] = None, offset: int = 0,
+                          genres: Optional[Sequence[str]] = None, year_min: Optional[int] = None,
+                          year_max: Optional[int] = None, media_type: Optional[str] = None) -> List[dict]:
+        """
+        Get the movies closest to a taste profile, excluding its seeds.
+        
+        Every candidate is scored in one sparse matrix-vector product, one
+        dense product with the projected profile in 'embedding' mode, or an
+        int8 scan plus exact re-ranking of the best matches in 'quantized' mode.
+        
+        Args:
+            profile (sparse.csr_matrix): Unit-norm profile from ``build_profile``
+            seed_rows (np.ndarray): Rows never to recommend
+            k (int, optional): Number of recommendations. Defaults to ``self.k``.
+            offset (int, optional): Number of top results to skip, for paging.
+                Defaults to 0.
+            genres, year_min, year_max, media_type: Filters, as in ``get_recommendations``
+            
+        Returns:
+            List[dict]: List of dictionaries containing movie details (title, similarity, id)
+            
+        Raises:
+            ValueError: If the filter is invalid
+        """
+        k = self.k if k is None else k
+        with _FILTER.time():
+            # None scores every row in place instead of copying them out
+            candidates = self.filter_rows(genres, year_min, year_max, media_type)
+        
+        with _PROFILE.time():
+            if self.search_mode == 'embedding':
+                vectors = self.embedding.vectors
+                if candidates is not None:
+                    vectors = vectors[candidates]
+                scores = (vectors @ self.embedding.transform(profile)[0]).astype(np.float64)
+            elif self.search_mode == 'quantized':
+                approx = self.quantized.approximate_scores(profile)
+                if candidates is not None:
+                    outside = np.ones(len(approx), dtype=bool)
+                    outside[candidates] = False
+                    approx[outside] = -np.inf
+                approx[seed_rows] = -np.inf
+                shortlist, exact = self.quantized.rerank(profile, approx,
+                                                         max(offset + k, self.quantized.n_candidates))
+                scores = np.full(len(approx) if candidates is None else len(candidates), -np.inf)
+                scores[shortlist if candidates is None else np.searchsorted(candidates, shortlist)] = exact
+            elif candidates is None:
+                scores = (self.final_matrix @ profile.T).toarray().ravel()
+                scores = scores / (self.movie_norms + 1e-10)
+            else:
+                scores = (self.final_matrix[candidates] @ profile.T).toarray().ravel()
+                scores = scores / (self.movie_norms[candidates] + 1e-10)
+            if candidates is None:
+                scores[seed_rows] = -np.inf
+            else:
+                scores[np.isin(candidates, seed_rows)] = -np.inf
+            top, top_scores = _top_k(scores[np.newaxis, :], offset + k)
+        
         recommendations = []
-        for idx in top_indices:
-            row = self.df.iloc[idx]
+        for idx, score in zip(top[0, offset:], top_scores[0, offset:]):
+            if not np.isfinite(score):
+                break
+            row = idx if candidates is None else candidates[idx]
             recommendations.append({
-                'title': row['title'],
-                'similarity': cosine_sims[idx],
-                'id': int(row['id'])
+                'title': self.catalog.titles[row],
+                'similarity': float(score),
+                'id': int(self.catalog.ids[row])
             })
-            
         return recommendations
 
-    def get_movie_details(self, title: str) -> dict:
+    def describe(self, text: str, genre_hints: Optional[Sequence[str]] = None,
+                 k: Optional[int] = None, offset: int = 0, year_min: Optional[int] = None,
+                 year_max: Optional[int] = None) -> List[dict]:
+        """
+        Get the movies closest to a free-text description.
+        
+        The text is encoded with the fitted vectorizer (genre hints fill the
+        genre columns) and scored like a taste profile.
+        
+        Args:
+            text (str): Description, e.g. "heist in space with a twist ending"
+            genre_hints (Sequence[str], optional): Genres the movie should have
+            k (int, optional): Number of recommendations. Defaults to ``self.k``.
+            offset (int, optional): Number of top results to skip. Defaults to 0.
+            year_min (int, optional): Earliest release year
+            year_max (int, optional): Latest release year
+            
+        Returns:
+            List[dict]: List of dictionaries containing movie details (title, similarity, id)
+            
+        Raises:
+            ValueError: If no vectorizer is loaded or the query cannot be encoded
+        """
+        if self.text_encoder is None:
+            raise ValueError("Free-text queries need the fitted vectorizer")
+        with _LOOKUP.time():
+            vector = self.text_encoder.encode(text, genre_hints)
+        return self.recommend_profile(vector, np.empty(0, dtype=np.int64), k, offset,
+                                      year_min=year_min, year_max=year_max)
+
+    def get_recommendations_batch(self, titles_or_ids: Sequence[Union[str, int]],
+                                  k: Optional[int] = None) -> dict:
+        """
+        Get recommendations for many query movies at once.
+        
+        All queries are scored with a single sparse matrix-matrix product and
+        the top-k of each row is found with a partial selection, so the cost
+        is one pass over ``final_matrix`` instead of one pass per query.
+        Queries covered by the precomputed neighbor graph skip scoring.
+        
+        Args:
+            titles_or_ids (Sequence[Union[str, int]]): Movie titles (str) or
+                TMDB ids (int), may be mixed
+            k (int, optional): Number of recommendations per query.
+                Defaults to ``self.k``.
+            
+        Returns:
+            dict: Columnar results with one entry per query:
+                - 'query': the queries as given
+                - 'found': boolean array, False for unknown movies
+                - 'ids': (n_queries, k) int64 array of TMDB ids (-1 if missing)
+                - 'titles': list of k titles per query (empty if missing)
+                - 'similarity': (n_queries, k) float array (NaN if missing)
+        """
+        k = self.k if k is None else k
+        queries = list(titles_or_ids)
+        with _LOOKUP.time():
+            query_indices = [self._resolve_query(q) for q in queries]
+        found = np.array([idx is not None for idx in query_indices], dtype=bool)
+        k = max(0, min(k, self.final_matrix.shape[0] - 1))
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        similarity = np.full((len(queries), k), np.nan)
+        titles = [[] for _ in queries]
+
+        rows = np.array([idx for idx in query_indices if idx is not None], dtype=np.int64)
+        if len(rows) > 0 and k > 0:
+            with _SCORE.time():
+                top_indices, top_scores = self._neighbors(rows, k)
+
+            with _FORMAT.time():
+                all_ids = self.catalog.ids
+                all_titles = self.catalog.titles
+                ids[found] = all_ids[top_indices]
+                similarity[found] = top_scores
+                for position, row_indices in zip(np.flatnonzero(found), top_indices):
+                    titles[position] = all_titles[row_indices].tolist()
+
+        return {
+            'query': queries,
+            'found': found,
+            'ids': ids,
+            'titles': titles,
+            'similarity': similarity
+        }
+
+    def get_catalog_entry(self, movie_id: int) -> Optional[dict]:
+        """
+        Get the locally stored data of a movie, without any TMDB call.
+        
+        Args:
+            movie_id (int): TMDB id of the movie
+            
+        Returns:
+            Optional[dict]: id, title, overview, genres and release_year, or
+                None if the movie is not in the catalog
+        """
+        row_index = self._get_movie_index_by_id(movie_id)
+        if row_index is None:
+            return None
+        return self.catalog.entry(row_index)
+
+    def get_movie_details(self, title: Union[str, int]) -> dict:
         """
         Get details of a specific movie.
         
         Args:
-            title (str): Title of the movie
+            title (Union[str, int]): Title (or TMDB id) of the movie
             
         Returns:
             dict: Dictionary containing movie details (title, id)
@@ -130,14 +912,13 @@ class MovieRecommender:
         Raises:
             ValueError: If the movie title is not found
         """
-        query_index = self._get_movie_index(title)
+        query_index = self._resolve_query(title)
         if query_index is None:
             raise ValueError(f"Movie '{title}' not found in database")
             
-        row = self.df.iloc[query_index]
         return {
-            'title': row['title'],
-            'id': int(row['id'])
+            'title': self.catalog.titles[query_index],
+            'id': int(self.catalog.ids[query_index])
         }
 
 def main():
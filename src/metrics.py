@@ -0,0 +1,298 @@
+"""
+Lightweight Prometheus Metrics
+
+This module provides counters, gauges and histograms with labels, rendered
+in the Prometheus text exposition format, without any dependency. Updating
+a metric costs a dict lookup and a short lock, so it is safe on the request
+path:
+
+    STAGE_SECONDS = histogram('movie_match_stage_seconds', 'Time per stage', ['stage'])
+
+    with STAGE_SECONDS.labels('score').time():
+        ...
+
+Values are per process; with several server workers, Prometheus scrapes and
+sums each worker.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from 0.5 ms to 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render a label set such as {stage="score",le="0.1"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class: a named metric with one child per label-value tuple."""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> object:
+        """
+        Get the child metric for a set of label values.
+
+        Args:
+            *values: One value per label name, in order
+
+        Returns:
+            object: The child, created on first use
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def _samples(self, key: Tuple[str, ...], child) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Exposition-format lines for this metric."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            for suffix, labels, value in self._samples(key, child):
+                lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter."""
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. upstream responses by status.
+    Names should end in ``_total``.
+    """
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled counter."""
+        self.labels().inc(amount)
+
+    def _samples(self, key, child):
+        yield '', _format_labels(self.labelnames, key), child.value
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        """Set the gauge."""
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        """Count the enclosed block as in progress."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase an unlabelled gauge."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrease an unlabelled gauge."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Set an unlabelled gauge."""
+        self.labels().set(value)
+
+    def track_inprogress(self):
+        """Count the enclosed block as in progress (unlabelled gauge)."""
+        return self.labels().track_inprogress()
+
+    def _samples(self, key, child):
+        yield '', _format_labels(self.labelnames, key), child.value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, e.g. latencies."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record one observation on an unlabelled histogram."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Time the enclosed block (unlabelled histogram)."""
+        return self.labels().time()
+
+    def _samples(self, key, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            yield '_bucket', _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), cumulative
+        yield '_sum', _format_labels(self.labelnames, key), child.sum
+        yield '_count', _format_labels(self.labelnames, key), cumulative
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from a function at scrape time."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 type_name: str, collect: Callable[[], Dict[Tuple, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.type_name = type_name
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together on ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Add a metric, or return the existing one with the same name (so
+        modules can be re-imported safely).
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Create (or get) a counter in the default registry."""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Create (or get) a gauge in the default registry."""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Create (or get) a histogram in the default registry."""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def callback(name: str, documentation: str, labelnames: Sequence[str], type_name: str,
+             collect: Callable[[], Dict[Tuple, float]]) -> CallbackMetric:
+    """
+    Create a metric read at scrape time in the default registry.
+
+    Args:
+        name (str): Metric name
+        documentation (str): Help text
+        labelnames (Sequence[str]): Label names
+        type_name (str): 'counter' or 'gauge'
+        collect (Callable[[], Dict[Tuple, float]]): Returns label values -> value
+
+    Returns:
+        CallbackMetric: The metric
+    """
+    return REGISTRY.register(CallbackMetric(name, documentation, labelnames, type_name, collect))
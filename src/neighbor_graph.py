@@ -0,0 +1,211 @@
+"""
+Precomputed Top-K Neighbor Graph
+
+This module builds, saves and loads a top-K cosine neighbor graph for the
+feature matrix used by the recommender.
+
+The catalog only changes when the data preparation notebook is re-run, so the
+all-pairs similarity can be computed once offline. The product is done in row
+blocks so peak memory is bounded by ``block_size x n_movies`` floats instead of
+``n_movies x n_movies``. The result is stored as two dense arrays (neighbor
+row indices as int32 and scores as float32) in a single ``.npz`` file, or in
+a directory of ``.npy`` files that is memory-mapped (and so shared between
+server workers) when loaded.
+
+Usage:
+    python -m src.neighbor_graph --matrix models/final_matrix.npz \\
+        --out models/neighbor_graph.npz --k 50
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+import scipy.sparse as sparse
+from typing import Optional, Tuple
+
+from src.knn_scratch import _top_k
+from src.tf_idf import normalize_sparse_matrix
+
+# Marks a missing neighbor slot (e.g. catalogs smaller than k + 1)
+MISSING = -1
+
+
+def _unit_rows(matrix: sparse.spmatrix) -> sparse.csr_matrix:
+    """L2-normalized float32 copy of ``matrix`` with duplicate entries summed first."""
+    # The saved matrix may hold duplicate entries, which the norm would count separately
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32, copy=True)
+    matrix.sum_duplicates()
+    return normalize_sparse_matrix(matrix)
+
+
+def build_neighbor_graph(matrix: sparse.csr_matrix, k: int = 50,
+                         block_size: Optional[int] = None,
+                         memory_budget_mb: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the top-k cosine neighbors of every row of ``matrix``.
+
+    Args:
+        matrix (sparse.csr_matrix): Feature matrix (one row per movie)
+        k (int, optional): Neighbors to keep per movie. Defaults to 50.
+        block_size (int, optional): Rows scored per block. Derived from
+            ``memory_budget_mb`` when not given.
+        memory_budget_mb (int, optional): Upper bound for the dense score
+            block. Defaults to 256.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: ``indices`` (int32) and ``scores``
+            (float32), both of shape (n_movies, k). Slots that cannot be
+            filled hold ``MISSING`` and NaN.
+    """
+    matrix = _unit_rows(matrix)
+    n_rows = matrix.shape[0]
+    if block_size is None:
+        block_size = max(1, (memory_budget_mb * 1024 * 1024) // max(1, n_rows * 4))
+
+    indices = np.full((n_rows, k), MISSING, dtype=np.int32)
+    scores = np.full((n_rows, k), np.nan, dtype=np.float32)
+    matrix_t = matrix.T.tocsc()
+
+    for start in range(0, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        block = (matrix[start:stop] @ matrix_t).toarray()
+
+        # A movie is never its own neighbor
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top_indices, top_scores = _top_k(block, min(k, n_rows - 1))
+
+        width = top_indices.shape[1]
+        indices[start:stop, :width] = top_indices
+        scores[start:stop, :width] = top_scores
+
+    return indices, scores
+
+
+def extend_neighbor_graph(indices: np.ndarray, scores: np.ndarray, matrix: sparse.csr_matrix,
+                          memory_budget_mb: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Neighbor graph of ``matrix`` from the graph of its first ``len(indices)`` rows.
+
+    The rows after those are scored against every row, and each existing
+    row's list is merged with its scores against the new rows. The result
+    matches ``build_neighbor_graph`` on the whole matrix, but costs
+    ``n_new x n_movies`` products instead of ``n_movies x n_movies``.
+
+    Args:
+        indices (np.ndarray): Neighbor row indices of the existing rows (n_old, k)
+        scores (np.ndarray): Their cosine scores (n_old, k)
+        matrix (sparse.csr_matrix): Feature matrix whose first n_old rows the
+            graph was built from, followed by the new rows
+        memory_budget_mb (int, optional): Upper bound for a dense score
+            block. Defaults to 256.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: ``indices`` (int32) and ``scores``
+            (float32) of shape (n_movies, k)
+
+    Raises:
+        ValueError: If the graph has more rows than the matrix
+    """
+    n_old, k = indices.shape
+    n_rows = matrix.shape[0]
+    if n_old > n_rows:
+        raise ValueError(f"Graph has {n_old} rows but the matrix only {n_rows}")
+    if n_old == n_rows:
+        return indices, scores
+
+    matrix = _unit_rows(matrix)
+    new_rows = np.arange(n_old, n_rows)
+    new_t = matrix[n_old:].T.tocsc()
+    out_indices = np.full((n_rows, k), MISSING, dtype=np.int32)
+    out_scores = np.full((n_rows, k), np.nan, dtype=np.float32)
+
+    # Existing rows: merge the stored list with the scores against the new rows
+    block_size = max(1, (memory_budget_mb * 1024 * 1024) // ((k + len(new_rows)) * 8))
+    for start in range(0, n_old, block_size):
+        stop = min(start + block_size, n_old)
+        stored = np.asarray(indices[start:stop])
+        stored_scores = np.where(stored != MISSING, np.asarray(scores[start:stop]), -np.inf)
+        merged_scores = np.hstack([stored_scores, (matrix[start:stop] @ new_t).toarray()])
+        merged_rows = np.hstack([stored, np.broadcast_to(new_rows, (stop - start, len(new_rows)))])
+        top, top_scores = _top_k(merged_scores, k)
+        found = np.isfinite(top_scores)
+        out_indices[start:stop][found] = np.take_along_axis(merged_rows, top, axis=1)[found]
+        out_scores[start:stop][found] = top_scores[found]
+
+    # New rows: score against every row
+    matrix_t = matrix.T.tocsc()
+    block_size = max(1, (memory_budget_mb * 1024 * 1024) // max(1, n_rows * 4))
+    for start in range(n_old, n_rows, block_size):
+        stop = min(start + block_size, n_rows)
+        block = (matrix[start:stop] @ matrix_t).toarray()
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        top, top_scores = _top_k(block, min(k, n_rows - 1))
+        width = top.shape[1]
+        out_indices[start:stop, :width] = top
+        out_scores[start:stop, :width] = top_scores
+
+    return out_indices, out_scores
+
+
+def save_neighbor_graph(path: str, indices: np.ndarray, scores: np.ndarray,
+                        n_features: int) -> None:
+    """
+    Save a neighbor graph to an uncompressed ``.npz`` file, or to a
+    directory of ``.npy`` files if ``path`` does not end in ``.npz``.
+
+    Args:
+        path (str): Output path
+        indices (np.ndarray): Neighbor row indices (n_movies, k)
+        scores (np.ndarray): Neighbor cosine scores (n_movies, k)
+        n_features (int): Width of the matrix the graph was built from, used
+            to reject graphs built for a different feature space
+    """
+    if not path.endswith('.npz'):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'indices.npy'), indices.astype(np.int32))
+        np.save(os.path.join(path, 'scores.npy'), scores.astype(np.float32))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'n_features': int(n_features)}, f)
+        return
+    np.savez(path, indices=indices.astype(np.int32), scores=scores.astype(np.float32),
+             n_features=np.int64(n_features))
+
+
+def load_neighbor_graph(path: str) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Load a neighbor graph saved by ``save_neighbor_graph``.
+
+    Args:
+        path (str): Path to the ``.npz`` file or graph directory (memory-mapped)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: indices, scores and the feature
+            width the graph was built for
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            n_features = json.load(f)['n_features']
+        return (np.load(os.path.join(path, 'indices.npy'), mmap_mode='r'),
+                np.load(os.path.join(path, 'scores.npy'), mmap_mode='r'), n_features)
+    with np.load(path) as graph:
+        return graph['indices'], graph['scores'], int(graph['n_features'])
+
+
+def main():
+    """Build the neighbor graph from the saved feature matrix."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--matrix', default='models/final_matrix.npz')
+    parser.add_argument('--out', default='models/neighbor_graph.npz')
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--memory-budget-mb', type=int, default=256)
+    args = parser.parse_args()
+
+    matrix = sparse.load_npz(args.matrix).tocsr()
+    indices, scores = build_neighbor_graph(matrix, k=args.k, memory_budget_mb=args.memory_budget_mb)
+    save_neighbor_graph(args.out, indices, scores, matrix.shape[1])
+    print(f"Saved {indices.shape[0]} x {indices.shape[1]} neighbor graph to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
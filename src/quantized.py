@@ -0,0 +1,347 @@
+"""
+int8-Quantized Index with Exact Re-Ranking
+
+This module stores the row-normalized feature matrix as an inverted index of
+int8 codes with one float32 scale per movie (``value ~= code * scale``): 5
+bytes per stored value (code and row id) instead of 8 in the float32 index
+artifact and 12 in the float64 ``final_matrix.npz``:
+
+    models/quantized/
+        codes.npy     int8 codes, grouped by feature column
+        rows.npy      int32 (int64 for very large matrices) movie row of every code
+        col_ptr.npy   int32 (int64 for very large matrices) start of each column
+        scales.npy    float32 per-movie scale
+        meta.json     shape and format version
+
+A query first scores every movie approximately by walking only the columns
+(terms and genres) it contains. The best ``n_candidates`` movies are then
+re-ranked with exact cosine similarity against the full-precision matrix,
+which is normally the memory-mapped index artifact: only the candidate rows
+are read from disk, so the full matrix does not need to stay resident.
+
+Usage:
+    python -m src.quantized build --matrix models/final_matrix.npz --out models/quantized
+    python -m src.quantized report --matrix models/final_matrix.npz --index models/quantized
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import scipy.sparse as sparse
+from typing import Optional, Tuple
+
+from src.knn_scratch import _top_k
+from src.tf_idf import normalize_sparse_matrix
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def _quantize_rows(matrix: sparse.csr_matrix) -> Tuple[sparse.csc_matrix, np.ndarray]:
+    """Normalize rows and encode them as int8 codes (column-major) plus per-row scales."""
+    matrix = normalize_sparse_matrix(sparse.csr_matrix(matrix, dtype=np.float32))
+    row_max = np.zeros(matrix.shape[0], dtype=np.float32)
+    non_empty = np.diff(matrix.indptr) > 0
+    row_max[non_empty] = np.maximum.reduceat(np.abs(matrix.data), matrix.indptr[:-1][non_empty])
+    scales = np.where(row_max > 0, row_max / 127, 1).astype(np.float32)
+    row_of_value = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    codes = np.rint(matrix.data / scales[row_of_value]).astype(np.int8)
+    quantized = sparse.csr_matrix((codes, matrix.indices, matrix.indptr), shape=matrix.shape)
+    return quantized.tocsc(), scales
+
+
+class QuantizedIndex:
+    """
+    Approximate first-pass scan over int8 codes, exact re-ranking of the best candidates.
+
+    Attributes:
+        codes (sparse.csc_matrix): int8 codes of the normalized rows, column-major
+        scales (np.ndarray): float32 scale of every row
+        n_candidates (int): Movies re-ranked exactly per query
+        matrix (sparse.csr_matrix): Full-precision matrix used for re-ranking
+        norms (np.ndarray): Row norms of ``matrix``
+    """
+
+    def __init__(self, codes: sparse.csc_matrix, scales: np.ndarray, n_candidates: int = 200):
+        """
+        Args:
+            codes (sparse.csc_matrix): int8 codes (n_movies, n_features)
+            scales (np.ndarray): Per-row scales
+            n_candidates (int, optional): Movies re-ranked exactly. Defaults to 200.
+        """
+        self.codes = codes
+        self.scales = scales
+        self.n_candidates = n_candidates
+        self.matrix = None
+        self.norms = None
+
+    @classmethod
+    def build(cls, matrix: sparse.csr_matrix, n_candidates: int = 200) -> 'QuantizedIndex':
+        """
+        Quantize a feature matrix.
+
+        Args:
+            matrix (sparse.csr_matrix): Feature matrix (one row per movie)
+            n_candidates (int, optional): Movies re-ranked exactly. Defaults to 200.
+
+        Returns:
+            QuantizedIndex: The index (attach a matrix before searching)
+        """
+        codes, scales = _quantize_rows(matrix)
+        return cls(codes, scales, n_candidates)
+
+    def attach(self, matrix: sparse.csr_matrix, norms: Optional[np.ndarray] = None) -> 'QuantizedIndex':
+        """
+        Set the full-precision matrix used for re-ranking (not copied).
+
+        Args:
+            matrix (sparse.csr_matrix): Feature matrix, e.g. the memory-mapped artifact
+            norms (np.ndarray, optional): Its row norms; computed if omitted
+
+        Returns:
+            QuantizedIndex: self, for chaining
+
+        Raises:
+            ValueError: If the matrix shape does not match the index
+        """
+        if matrix.shape != self.codes.shape:
+            raise ValueError(f"Matrix shape {matrix.shape} does not match the quantized index {self.codes.shape}")
+        self.matrix = matrix
+        self.norms = norms if norms is not None else sparse.linalg.norm(matrix, axis=1)
+        return self
+
+    def extend(self, rows: sparse.csr_matrix) -> 'QuantizedIndex':
+        """
+        Return a copy of the index with new catalog rows appended.
+
+        Attach the extended matrix to the copy before searching.
+
+        Args:
+            rows (sparse.csr_matrix): Feature rows appended to the catalog
+
+        Returns:
+            QuantizedIndex: Index covering the old and new rows
+        """
+        codes, scales = _quantize_rows(rows)
+        return QuantizedIndex(sparse.vstack([self.codes, codes], format='csc'),
+                              np.concatenate([self.scales, scales]), self.n_candidates)
+
+    def approximate_scores(self, query: sparse.csr_matrix) -> np.ndarray:
+        """
+        Approximate dot products of a unit-norm query with every normalized row.
+
+        Only the columns where the query is non-zero are read.
+
+        Args:
+            query (sparse.csr_matrix): One query row of shape (1, n_features)
+
+        Returns:
+            np.ndarray: float32 scores, one per movie
+        """
+        col_ptr, rows, codes = self.codes.indptr, self.codes.indices, self.codes.data
+        starts, ends = col_ptr[query.indices], col_ptr[query.indices + 1]
+        lengths = ends - starts
+        # Positions of every stored code in the query's columns
+        positions = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        weights = codes[positions] * np.repeat(query.data.astype(np.float32), lengths)
+        scores = np.bincount(rows[positions], weights=weights, minlength=self.codes.shape[0])
+        return scores.astype(np.float32) * self.scales
+
+    def search(self, queries: sparse.csr_matrix, k: int, exclude: Optional[np.ndarray] = None,
+               candidates: Optional[np.ndarray] = None,
+               n_candidates: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k most similar movies of each query.
+
+        Args:
+            queries (sparse.csr_matrix): Query vectors (one per row)
+            k (int): Number of neighbors per query
+            exclude (np.ndarray, optional): One catalog row per query to drop
+                from its results (usually the query movie itself)
+            candidates (np.ndarray, optional): Rows allowed in the results
+            n_candidates (int, optional): Override of ``self.n_candidates``
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Catalog rows and exact cosine scores
+                of shape (n_queries, k); -1 / -inf where fewer than k movies qualify
+        """
+        n_candidates = max(k, n_candidates or self.n_candidates)
+        queries = normalize_sparse_matrix(sparse.csr_matrix(queries, dtype=np.float32))
+        allowed = None
+        if candidates is not None:
+            allowed = np.zeros(self.codes.shape[0], dtype=bool)
+            allowed[candidates] = True
+
+        indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        scores = np.full((queries.shape[0], k), -np.inf)
+        for position in range(queries.shape[0]):
+            query = queries[position]
+            approx = self.approximate_scores(query)
+            if allowed is not None:
+                approx[~allowed] = -np.inf
+            if exclude is not None:
+                approx[exclude[position]] = -np.inf
+            shortlist, exact = self.rerank(query, approx, n_candidates)
+            top, top_scores = _top_k(exact[np.newaxis, :], k)
+            indices[position, :top.shape[1]] = shortlist[top[0]]
+            scores[position, :top.shape[1]] = top_scores[0]
+        return indices, scores
+
+    def rerank(self, query: sparse.csr_matrix, approx: np.ndarray,
+               n_candidates: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score the best approximate matches exactly.
+
+        Args:
+            query (sparse.csr_matrix): Unit-norm query row
+            approx (np.ndarray): Approximate score per movie, -inf for movies
+                that must not be returned
+            n_candidates (int): Number of movies to re-rank
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Shortlisted rows and their exact
+                cosine scores, in no particular order
+        """
+        shortlist, shortlist_scores = _top_k(approx[np.newaxis, :], n_candidates)
+        shortlist = shortlist[0][np.isfinite(shortlist_scores[0])]
+        # Only the shortlisted rows of the full-precision matrix are read
+        exact = (self.matrix[shortlist] @ query.T).toarray().ravel()
+        return shortlist, exact / (self.norms[shortlist] + 1e-10)
+
+    def nbytes(self) -> int:
+        """Bytes held by the codes, row ids, column pointers and scales."""
+        return (self.codes.data.nbytes + self.codes.indices.nbytes + self.codes.indptr.nbytes
+                + self.scales.nbytes)
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index (the full-precision matrix is not included).
+
+        Args:
+            path (str): Output directory, created if missing
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'codes.npy'), self.codes.data.astype(np.int8))
+        # Matching index dtypes keep scipy from copying the mapped arrays on load
+        index_dtype = np.int32 if self.codes.nnz < np.iinfo(np.int32).max else np.int64
+        np.save(os.path.join(path, 'rows.npy'), self.codes.indices.astype(index_dtype))
+        np.save(os.path.join(path, 'col_ptr.npy'), self.codes.indptr.astype(index_dtype))
+        np.save(os.path.join(path, 'scales.npy'), self.scales.astype(np.float32))
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump({'format_version': FORMAT_VERSION, 'shape': list(self.codes.shape),
+                       'n_candidates': self.n_candidates}, f)
+
+    @classmethod
+    def load(cls, path: str, matrix: Optional[sparse.csr_matrix] = None) -> 'QuantizedIndex':
+        """
+        Memory-map an index saved with ``save``.
+
+        Args:
+            path (str): Index directory
+            matrix (sparse.csr_matrix, optional): Full-precision matrix to attach
+
+        Returns:
+            QuantizedIndex: The loaded index
+
+        Raises:
+            ValueError: If the format version is not supported
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported quantized index version {meta.get('format_version')} in {path}")
+        codes = sparse.csc_matrix((np.load(os.path.join(path, 'codes.npy'), mmap_mode='r'),
+                                   np.load(os.path.join(path, 'rows.npy'), mmap_mode='r'),
+                                   np.load(os.path.join(path, 'col_ptr.npy'), mmap_mode='r')),
+                                  shape=tuple(meta['shape']), copy=False)
+        index = cls(codes, np.load(os.path.join(path, 'scales.npy')), meta['n_candidates'])
+        if matrix is not None:
+            index.attach(matrix)
+        return index
+
+
+def recall_report(matrix: sparse.csr_matrix, index: QuantizedIndex, k: int = 10, n_queries: int = 200,
+                  shortlists: Tuple[int, ...] = (50, 100, 200, 400), seed: int = 0) -> list:
+    """
+    Measure recall@k and latency of quantized search against exact search.
+
+    Catalog rows are used as queries, excluding themselves from results.
+
+    Args:
+        matrix (sparse.csr_matrix): Feature matrix the index was built from
+        index (QuantizedIndex): The index, attached to ``matrix``
+        k (int, optional): Neighbors per query. Defaults to 10.
+        n_queries (int, optional): Number of sampled queries. Defaults to 200.
+        shortlists (Tuple[int, ...], optional): ``n_candidates`` values to compare
+        seed (int, optional): Random seed for the query sample
+
+    Returns:
+        list: One dict per setting with 'n_candidates', 'recall',
+            'max_score_error', 'ms_per_query' and 'exact_ms_per_query'
+    """
+    rng = np.random.default_rng(seed)
+    normalized = normalize_sparse_matrix(sparse.csr_matrix(matrix, dtype=np.float32))
+    rows = rng.choice(matrix.shape[0], min(n_queries, matrix.shape[0]), replace=False)
+
+    start = time.perf_counter()
+    exact_scores = np.empty((len(rows), k))
+    for position, row in enumerate(rows):
+        scores = (normalized @ normalized[row].T).toarray().ravel()
+        scores[row] = -np.inf
+        exact_scores[position] = _top_k(scores[np.newaxis, :], k)[1][0]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(rows)
+    # Ties are common, so a result counts when it scores at least the exact k-th score
+    thresholds = exact_scores[:, -1:] - 1e-6
+
+    report = []
+    for n_candidates in shortlists:
+        start = time.perf_counter()
+        _, scores = index.search(matrix[rows], k, exclude=rows, n_candidates=n_candidates)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(rows)
+        report.append({
+            'n_candidates': n_candidates,
+            'recall': np.count_nonzero(scores >= thresholds) / scores.size,
+            'max_score_error': float(np.abs(scores - exact_scores).max()),
+            'ms_per_query': elapsed_ms,
+            'exact_ms_per_query': exact_ms
+        })
+    return report
+
+
+def main():
+    """Build a quantized index or print its memory and recall report."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('--matrix', default='models/final_matrix.npz')
+    build_parser.add_argument('--out', default='models/quantized')
+    build_parser.add_argument('--n-candidates', type=int, default=200)
+
+    report_parser = subparsers.add_parser('report')
+    report_parser.add_argument('--matrix', default='models/final_matrix.npz')
+    report_parser.add_argument('--index', default='models/quantized')
+    report_parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    matrix = sparse.load_npz(args.matrix).tocsr()
+    if args.command == 'build':
+        index = QuantizedIndex.build(matrix, args.n_candidates)
+        index.save(args.out)
+        print(f"Saved {matrix.shape[0]} x {matrix.shape[1]} quantized index to {args.out}")
+    else:
+        index = QuantizedIndex.load(args.index, matrix)
+        float32_bytes = matrix.nnz * 8 + (matrix.shape[0] + 1) * 4
+        print(f"Memory: quantized {index.nbytes() / 2 ** 20:.2f} MiB, float32 artifact "
+              f"{float32_bytes / 2 ** 20:.2f} MiB, float64 matrix "
+              f"{(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes) / 2 ** 20:.2f} MiB")
+        print(f"{'shortlist':>10} {'recall@' + str(args.k):>10} {'max err':>9} {'ms/query':>10} {'exact ms':>10}")
+        for row in recall_report(matrix, index, k=args.k):
+            print(f"{row['n_candidates']:>10} {row['recall']:>10.3f} {row['max_score_error']:>9.2e} "
+                  f"{row['ms_per_query']:>10.3f} {row['exact_ms_per_query']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Resilience Policies for Upstream Calls
+
+This module keeps a degraded upstream (TMDB) from stalling the service:
+
+- ``CircuitBreaker`` tracks the outcome of recent calls. When too many of
+  them fail it opens, and calls are refused immediately (so callers fall back
+  to local catalog data) instead of each waiting out its timeout. After
+  ``reset_timeout`` seconds a few probe calls are let through; success closes
+  the breaker again, failure re-opens it.
+- ``LatencyTracker`` keeps a window of recent latencies per endpoint, and
+  ``Hedger`` sends a duplicate request when the first has not answered by a
+  high percentile of that latency, returning whichever succeeds first. Hedges
+  are capped to a share of all calls, so a slow upstream is not hit with
+  twice the load.
+
+Both are used from a single event loop and are not thread-safe.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a window of recent calls.
+
+    Attributes:
+        stats (Dict[str, int]): Event counts ('opened', 'closed', 'short_circuited')
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 10, failure_ratio: float = 0.5,
+                 reset_timeout: float = 30, half_open_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the breaker (closed).
+
+        Args:
+            window (int, optional): Number of recent outcomes considered. Defaults to 20.
+            min_calls (int, optional): Outcomes needed before the breaker can open. Defaults to 10.
+            failure_ratio (float, optional): Share of failures in the window that opens
+                the breaker. Defaults to 0.5.
+            reset_timeout (float, optional): Seconds the breaker stays open before
+                probing. Defaults to 30.
+            half_open_calls (int, optional): Probe calls allowed at once while
+                half-open. Defaults to 1.
+            clock (Callable[[], float], optional): Time source. Defaults to time.monotonic.
+        """
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.stats: Dict[str, int] = {'opened': 0, 'closed': 0, 'short_circuited': 0}
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker turns half-open once ``reset_timeout`` has passed."""
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go upstream. Every allowed call must be followed by
+        ``record`` or ``release``.
+
+        Returns:
+            bool: False if the call should be short-circuited
+        """
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        self.stats['short_circuited'] += 1
+        return False
+
+    def record(self, success: bool) -> None:
+        """
+        Record the outcome of an allowed call.
+
+        Args:
+            success (bool): False for timeouts, transport errors and server errors
+        """
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if success:
+                self._close()
+            else:
+                self._open()
+            return
+        if self._state == OPEN:
+            # A call allowed before the breaker opened; its outcome is already moot
+            return
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self._outcomes):
+            self._open()
+
+    def release(self) -> None:
+        """Give back an allowed call that ended without an outcome (e.g. was cancelled)."""
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+        self.stats['opened'] += 1
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._outcomes.clear()
+        self.stats['closed'] += 1
+
+
+class LatencyTracker:
+    """Window of recent successful latencies per key (e.g. endpoint)."""
+
+    def __init__(self, window: int = 200, percentile: float = 95, min_samples: int = 20,
+                 min_delay: float = 0.05):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (int, optional): Latencies kept per key. Defaults to 200.
+            percentile (float, optional): Percentile used as the hedge delay. Defaults to 95.
+            min_samples (int, optional): Latencies needed before a delay is given. Defaults to 20.
+            min_delay (float, optional): Shortest delay in seconds. Defaults to 0.05.
+        """
+        self.window = window
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        """Record the latency of a successful call."""
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def threshold(self, key: str) -> Optional[float]:
+        """
+        The configured percentile of recent latencies for a key.
+
+        Returns:
+            Optional[float]: Seconds, None until ``min_samples`` latencies were seen
+        """
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[rank])
+
+
+class Hedger:
+    """
+    Sends a second copy of a slow request and keeps the first good answer.
+
+    Attributes:
+        latencies (LatencyTracker): Source of the hedge delay per key
+        stats (Dict[str, int]): 'calls', 'sent' (hedges sent) and 'won'
+            (hedges that answered first)
+    """
+
+    def __init__(self, latencies: Optional[LatencyTracker] = None, max_ratio: float = 0.1):
+        """
+        Initialize the hedger.
+
+        Args:
+            latencies (LatencyTracker, optional): Latency source. Defaults to a new tracker.
+            max_ratio (float, optional): Most hedges per call. Defaults to 0.1.
+        """
+        self.latencies = latencies if latencies is not None else LatencyTracker()
+        self.max_ratio = max_ratio
+        self.stats: Dict[str, int] = {'calls': 0, 'sent': 0, 'won': 0}
+
+    async def run(self, key: str, call: Callable[[float], Awaitable[Any]], timeout: float,
+                  accept: Callable[[Any], bool], can_hedge: Callable[[], bool] = lambda: True) -> Any:
+        """
+        Run ``call``, hedging it once if it is slower than the key's threshold.
+
+        Args:
+            key (str): Latency key, e.g. an endpoint label
+            call (Callable[[float], Awaitable[Any]]): Makes one attempt with the given timeout
+            timeout (float): Timeout of the whole call in seconds; the hedge gets what is left
+            accept (Callable[[Any], bool]): Whether an attempt's result is good enough
+                to return without waiting for the other one
+            can_hedge (Callable[[], bool], optional): Checked before sending a hedge,
+                e.g. to skip it when the upstream is unhealthy
+
+        Returns:
+            Any: The first accepted result, otherwise the last result
+        """
+        self.stats['calls'] += 1
+        delay = self.latencies.threshold(key)
+        first = asyncio.ensure_future(call(timeout))
+        if delay is None or delay >= timeout:
+            return await first
+
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not can_hedge() or self.stats['sent'] >= self.max_ratio * self.stats['calls']:
+                return await first
+
+            self.stats['sent'] += 1
+            hedge = asyncio.ensure_future(call(timeout - delay))
+            pending.add(hedge)
+            result = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if accept(result):
+                        if task is hedge:
+                            self.stats['won'] += 1
+                        return result
+            return result
+        finally:
+            for task in pending:
+                task.cancel()
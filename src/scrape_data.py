@@ -1,31 +1,31 @@
-import pandas as pd
-import requests
-from api_auth import get_data, genre_ids,  API_KEY, genre_url
+import argparse
+from api_auth import API_KEY
+from scraper import Scraper, merge_chunks, TMDB_API_BASE
 
 
-genre_lookup = genre_ids(genre_url)
+def main():
+    parser = argparse.ArgumentParser(description="Scrape popular TMDB movies into movies.csv (resumable)")
+    parser.add_argument('--pages', type=int, default=25)
+    parser.add_argument('--ids-file', help='Scrape these movie ids (one per line) instead of popular pages')
+    parser.add_argument('--out-dir', default='scrape_output')
+    parser.add_argument('--output', default='movies.csv')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=40, help='Requests per second')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--base-url', default=TMDB_API_BASE)
+    args = parser.parse_args()
 
-movies = []
-pages = 25
+    scraper = Scraper(API_KEY, args.out_dir, base_url=args.base_url, workers=args.workers,
+                      rate=args.rate, chunk_size=args.chunk_size)
+    if args.ids_file:
+        with open(args.ids_file) as f:
+            written = scraper.scrape_ids(int(line) for line in f if line.strip())
+    else:
+        written = scraper.scrape_pages(args.pages)
 
-for page in range(1, pages + 1):
-    movie_url = movie_url = f"https://api.themoviedb.org/3/movie/popular?api_key={API_KEY}&language=en-US&page={page}"
-    response = requests.get(movie_url)
-    results = response.json()['results']
-    
-    for movie in results:
-        genres = [genre_lookup[g] for g in movie['genre_ids']]
-        release_date = movie.get('release_date','')
-        release_year = int(release_date[:4]) if release_date else None
+    total = merge_chunks(args.out_dir, args.output)
+    print(f"Fetched {written} new records; {total} movies in {args.output}")
 
-        movies.append({
-            'id':movie['id'],
-            'title': movie['title'],
-            'overview': movie['overview'],
-            'genres': genres,
-            'release_year': release_year
-        })
 
-
-df = pd.DataFrame(movies)
-df.to_csv('movies.csv', index=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
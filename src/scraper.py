@@ -0,0 +1,305 @@
+"""
+Resumable, Rate-Limited TMDB Scraper
+
+This module fetches movies from TMDB with a pool of worker threads sharing a
+token-bucket rate limiter, retries failed calls with exponential backoff and
+streams records to disk in chunk files (``movies-part-00001.csv``, ...).
+
+Progress is checkpointed after every chunk, so an interrupted run resumes
+with the pages (or movie ids) that were not yet written. ``merge_chunks``
+combines the chunk files into a single ``movies.csv``.
+
+Two sources are supported:
+    - list endpoints such as ``/movie/popular``, one task per page
+    - detail lookups ``/movie/{id}``, one task per id (e.g. the ids of
+      TMDB's daily export file)
+
+The API root is configurable, so the scraper can run against a local stub.
+"""
+
+import glob
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+import requests
+
+TMDB_API_BASE = os.getenv('TMDB_API_BASE', 'https://api.themoviedb.org/3')
+
+CHECKPOINT_FILE = 'checkpoint.json'
+CHUNK_PATTERN = 'movies-part-*.csv'
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: ``rate`` tokens per second, bursts of up to
+    ``capacity`` tokens.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float, optional): Bucket size. Defaults to ``rate``.
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ScrapeCheckpoint:
+    """
+    Set of completed task keys persisted as JSON.
+
+    Attributes:
+        path (str): Checkpoint file
+        completed (set): Keys of tasks whose records are on disk
+        chunks_written (int): Number of chunk files written so far
+    """
+
+    def __init__(self, path: str):
+        """
+        Load the checkpoint at ``path`` if it exists.
+
+        Args:
+            path (str): Checkpoint file
+        """
+        self.path = path
+        self.completed = set()
+        self.chunks_written = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.completed = set(state['completed'])
+            self.chunks_written = state['chunks_written']
+
+    def save(self) -> None:
+        """Write the checkpoint atomically."""
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({'completed': sorted(self.completed), 'chunks_written': self.chunks_written}, f)
+        os.replace(self.path + '.tmp', self.path)
+
+
+class Scraper:
+    """
+    Concurrent TMDB scraper with rate limiting, retries and checkpointing.
+
+    Attributes:
+        out_dir (str): Directory for chunk files and the checkpoint
+        genre_lookup (Dict[int, str]): TMDB genre id -> name
+    """
+
+    def __init__(self, api_key: str, out_dir: str, base_url: str = TMDB_API_BASE,
+                 workers: int = 8, rate: float = 40, chunk_size: int = 1000,
+                 max_retries: int = 5, backoff: float = 0.5, timeout: float = 10):
+        """
+        Initialize the scraper.
+
+        Args:
+            api_key (str): TMDB API key
+            out_dir (str): Output directory, created if missing
+            base_url (str, optional): API root. Defaults to ``TMDB_API_BASE``.
+            workers (int, optional): Concurrent requests. Defaults to 8.
+            rate (float, optional): Requests per second across all workers.
+                Defaults to 40, below TMDB's documented limit.
+            chunk_size (int, optional): Records per chunk file. Defaults to 1000.
+            max_retries (int, optional): Retries per request. Defaults to 5.
+            backoff (float, optional): Base backoff in seconds. Defaults to 0.5.
+            timeout (float, optional): Per-request timeout. Defaults to 10.
+        """
+        self.api_key = api_key
+        self.out_dir = out_dir
+        self.base_url = base_url.rstrip('/')
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.genre_lookup: Dict[int, str] = {}
+        self._local = threading.local()
+
+        os.makedirs(out_dir, exist_ok=True)
+        self.checkpoint = ScrapeCheckpoint(os.path.join(out_dir, CHECKPOINT_FILE))
+
+    def _session(self) -> requests.Session:
+        """One keep-alive session per worker thread."""
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def get_json(self, path: str, params: Optional[dict] = None) -> Optional[dict]:
+        """
+        GET an endpoint, retrying rate-limit, server and connection errors.
+
+        Args:
+            path (str): Endpoint path, e.g. "/movie/popular"
+            params (dict, optional): Extra query parameters
+
+        Returns:
+            Optional[dict]: The JSON body, or None for a 404
+
+        Raises:
+            RuntimeError: If the request still fails after all retries
+        """
+        query = {'api_key': self.api_key, 'language': 'en-US', **(params or {})}
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            retry_after = None
+            try:
+                response = self._session().get(f"{self.base_url}{path}", params=query, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code == 404:
+                    return None
+                if response.status_code not in RETRY_STATUS:
+                    raise RuntimeError(f"TMDB returned {response.status_code} for {path}")
+                retry_after = response.headers.get('Retry-After')
+                error = f"status {response.status_code}"
+            except requests.RequestException as e:
+                error = repr(e)
+
+            if attempt < self.max_retries:
+                delay = float(retry_after) if retry_after else self.backoff * 2 ** attempt
+                time.sleep(delay + random.uniform(0, self.backoff))
+        raise RuntimeError(f"Giving up on {path} after {self.max_retries + 1} attempts ({error})")
+
+    def load_genres(self) -> Dict[int, str]:
+        """Fetch the TMDB genre id -> name lookup."""
+        data = self.get_json('/genre/movie/list') or {'genres': []}
+        self.genre_lookup = {genre['id']: genre['name'] for genre in data['genres']}
+        return self.genre_lookup
+
+    def _record(self, movie: dict) -> dict:
+        """Convert a TMDB list entry or detail response to a catalog record."""
+        if 'genres' in movie:
+            genres = [g['name'] for g in movie['genres']]
+        else:
+            genres = [self.genre_lookup[g] for g in movie.get('genre_ids', []) if g in self.genre_lookup]
+        release_date = movie.get('release_date', '')
+        return {
+            'id': movie['id'],
+            'title': movie['title'],
+            'overview': movie['overview'],
+            'genres': genres,
+            'release_year': int(release_date[:4]) if release_date else None
+        }
+
+    def _fetch_page(self, endpoint: str, page: int) -> List[dict]:
+        data = self.get_json(endpoint, {'page': page}) or {'results': []}
+        return [self._record(movie) for movie in data['results']]
+
+    def _fetch_movie(self, movie_id: int) -> List[dict]:
+        data = self.get_json(f"/movie/{movie_id}")
+        return [self._record(data)] if data else []
+
+    def _write_chunk(self, records: List[dict], keys: List) -> None:
+        """Write one chunk file, then mark its tasks complete."""
+        self.checkpoint.chunks_written += 1
+        path = os.path.join(self.out_dir, f"movies-part-{self.checkpoint.chunks_written:05d}.csv")
+        pd.DataFrame(records, columns=['id', 'title', 'overview', 'genres', 'release_year']).to_csv(path, index=False)
+        self.checkpoint.completed.update(keys)
+        self.checkpoint.save()
+
+    def _run(self, keys: Iterable, fetch: Callable[[object], List[dict]]) -> int:
+        """
+        Run tasks concurrently, streaming records to chunk files.
+
+        At most ``2 * workers`` tasks are submitted at a time, and finished ones
+        are dropped once their records are buffered, so memory is bounded by
+        the chunk buffer rather than the whole job. If a task fails, the tasks
+        not yet started are cancelled before the error is raised.
+        """
+        pending = (key for key in keys if key not in self.checkpoint.completed)
+        written = 0
+        buffer, buffer_keys = [], []
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        in_flight = {}
+        try:
+            for key in islice(pending, 2 * self.workers):
+                in_flight[executor.submit(fetch, key)] = key
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = in_flight.pop(future)
+                    buffer.extend(future.result())
+                    buffer_keys.append(key)
+                    for next_key in islice(pending, 1):
+                        in_flight[executor.submit(fetch, next_key)] = next_key
+                if len(buffer) >= self.chunk_size:
+                    self._write_chunk(buffer, buffer_keys)
+                    written += len(buffer)
+                    buffer, buffer_keys = [], []
+        finally:
+            # On errors, don't wait for the queued rate-limited requests
+            executor.shutdown(wait=True, cancel_futures=True)
+        if buffer_keys:
+            self._write_chunk(buffer, buffer_keys)
+            written += len(buffer)
+        return written
+
+    def scrape_pages(self, pages: int, endpoint: str = '/movie/popular') -> int:
+        """
+        Scrape pages 1..``pages`` of a list endpoint.
+
+        Args:
+            pages (int): Number of pages
+            endpoint (str, optional): List endpoint. Defaults to "/movie/popular".
+
+        Returns:
+            int: Records written in this run
+        """
+        if not self.genre_lookup:
+            self.load_genres()
+        return self._run(range(1, pages + 1), lambda page: self._fetch_page(endpoint, page))
+
+    def scrape_ids(self, movie_ids: Iterable[int]) -> int:
+        """
+        Scrape movie details for a list of ids.
+
+        Args:
+            movie_ids (Iterable[int]): TMDB movie ids
+
+        Returns:
+            int: Records written in this run
+        """
+        return self._run(movie_ids, self._fetch_movie)
+
+
+def merge_chunks(out_dir: str, output_path: str) -> int:
+    """
+    Combine chunk files into one CSV, dropping duplicate ids.
+
+    Args:
+        out_dir (str): Directory with ``movies-part-*.csv`` files
+        output_path (str): Output CSV path
+
+    Returns:
+        int: Number of movies written
+    """
+    parts = [pd.read_csv(path) for path in sorted(glob.glob(os.path.join(out_dir, CHUNK_PATTERN)))]
+    movies = pd.concat(parts, ignore_index=True).drop_duplicates('id') if parts else pd.DataFrame()
+    movies.to_csv(output_path, index=False)
+    return len(movies)
@@ -0,0 +1,59 @@
+"""
+Single-Flight Request Coalescing
+
+When many coroutines ask for the same resource at the same time (e.g. a
+trending movie's details right after its cache entry expired), only the first
+one calls upstream; the others await the same in-flight result.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    Attributes:
+        stats (Counter): 'leader' (calls that did the work) and 'shared'
+            (calls that reused an in-flight result)
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = Counter()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn()`` unless a call for ``key`` is already in flight, in which
+        case wait for that call's result (or exception) instead.
+
+        The shared call is shielded: a caller being cancelled (e.g. a client
+        disconnecting) does not cancel the fetch for the other callers.
+
+        Args:
+            key (Hashable): Identifies the resource
+            fn (Callable[[], Awaitable[Any]]): Starts the fetch
+
+        Returns:
+            Any: The result of the shared call
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats['leader'] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats['shared'] += 1
+        return await asyncio.shield(task)
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        """Whether a call for ``key`` is currently in flight."""
+        return key in self._inflight
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently in flight."""
+        return len(self._inflight)
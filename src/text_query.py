@@ -0,0 +1,82 @@
+"""
+Free-Text Queries
+
+This module turns a description such as "heist in space with a twist ending"
+into a feature vector laid out like ``final_matrix``: the fitted TF-IDF
+vectorizer encodes the text and optional genre hints fill the ``g_*``
+columns, exactly as for catalog movies. The vector can then be scored by the
+same similarity engine as a title query.
+"""
+
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sparse
+
+from src.catalog_update import GENRE_PREFIX, vectorize_movies
+
+
+class TextQueryEncoder:
+    """
+    Encodes free text (plus genre hints) with the saved vectorizer.
+
+    Attributes:
+        vectorizer: Fitted vectorizer whose vocabulary matches ``final_matrix``
+        feature_names (np.ndarray): Column names of ``final_matrix``
+        genres (Dict[str, str]): Casefolded genre name -> genre name
+    """
+
+    def __init__(self, vectorizer_path: str, feature_names_path: str, cache_size: int = 4096):
+        """
+        Load the vectorizer and feature names once.
+
+        Args:
+            vectorizer_path (str): Path to the fitted vectorizer (joblib)
+            feature_names_path (str): Path to ``feature_names.npy``
+            cache_size (int, optional): Encoded queries kept in memory. Defaults to 4096.
+        """
+        self.vectorizer = joblib.load(vectorizer_path)
+        self.feature_names = np.load(feature_names_path, allow_pickle=True)
+        self.genres = {name[len(GENRE_PREFIX):].casefold(): name[len(GENRE_PREFIX):]
+                       for name in self.feature_names if name.startswith(GENRE_PREFIX)}
+        self._encode_cached = lru_cache(maxsize=cache_size)(self._encode)
+
+    def encode(self, text: str, genres: Optional[Sequence[str]] = None) -> sparse.csr_matrix:
+        """
+        Encode a description into a unit-norm feature vector.
+
+        Repeated queries (ignoring case and extra whitespace) are served from
+        an LRU cache.
+
+        Args:
+            text (str): Free-text description
+            genres (Sequence[str], optional): Genre hints, case-insensitive
+
+        Returns:
+            sparse.csr_matrix: Vector of shape (1, n_features)
+
+        Raises:
+            ValueError: If a genre hint is unknown or nothing in the query is
+                in the vocabulary
+        """
+        hints = []
+        for genre in genres or []:
+            name = self.genres.get(genre.strip().casefold())
+            if name is None:
+                raise ValueError(f"Unknown genre '{genre}'")
+            hints.append(name)
+        return self._encode_cached(' '.join(text.casefold().split()), tuple(sorted(set(hints))))
+
+    def _encode(self, text: str, genres: Tuple[str, ...]) -> sparse.csr_matrix:
+        query = pd.DataFrame({'overview': [text], 'genres': [list(genres)]})
+        vector = vectorize_movies(query, self.vectorizer, self.feature_names)
+        norm = sparse.linalg.norm(vector)
+        if norm == 0:
+            raise ValueError("None of the query words are in the vocabulary")
+        return sparse.csr_matrix(vector / norm)
+
+    def cache_info(self):
+        """Hit/miss statistics of the query cache."""
+        return self._encode_cached.cache_info()
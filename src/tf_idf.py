@@ -1,17 +1,58 @@
 import math
+import os
 import numpy as np
 import pandas as pd
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 import re
-from typing import List, Dict
+import tempfile
+from typing import Iterable, Iterator, List, Tuple
 from scipy import sparse
 
+def _tokenize(text: str, stop_words: set) -> List[str]:
+    """Lowercase, strip non-letters and drop stop words"""
+    text = re.sub(r'[^a-zA-Z\s]', '', text.lower())
+    return [word for word in text.split() if word not in stop_words]
+
+def _count_chunk(docs: List[str], stop_words: set) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tokenize and count a chunk of documents (runs in a worker process).
+
+    Returns the chunk-local vocabulary (in first-appearance order), the token
+    count of every document, and the term counts as CSR-style integer arrays
+    (indptr, local term ids, counts).
+    """
+    local_vocab = {}
+    doc_lengths = np.zeros(len(docs), dtype=np.int32)
+    indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+    term_ids = []
+    counts = []
+    for doc_idx, doc in enumerate(docs):
+        words = _tokenize(doc, stop_words)
+        doc_lengths[doc_idx] = len(words)
+        for word, count in Counter(words).items():
+            term_ids.append(local_vocab.setdefault(word, len(local_vocab)))
+            counts.append(count)
+        indptr[doc_idx + 1] = len(term_ids)
+    return (list(local_vocab), doc_lengths, indptr,
+            np.array(term_ids, dtype=np.int32), np.array(counts, dtype=np.int32))
+
+def _load_chunk(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Read back chunk counts spilled by fit_transform"""
+    with np.load(path) as arrays:
+        return tuple(arrays[f'arr_{i}'] for i in range(4))
+
 class CustomTfidfVectorizer:
-    def __init__(self, stop_words='english', max_features=None):
+    def __init__(self, stop_words='english', max_features=None, n_jobs=-1, chunk_size=10000):
         self.stop_words = self._get_stop_words() if stop_words == 'english' else set(stop_words)
         self.max_features = max_features
+        self.n_jobs = n_jobs  # Worker processes for fit_transform (-1 = all cores)
+        self.chunk_size = chunk_size  # Documents tokenized per task
         self.vocabulary_ = {}
         self.idf_ = None
+        self.n_docs_ = 0  # Documents seen by fit_transform / partial_fit
+        self.document_frequency_ = {}  # Documents containing each term (all terms, not just the vocabulary)
         
     def _get_stop_words(self) -> set:
         """Default English stop words"""
@@ -29,99 +70,144 @@ class CustomTfidfVectorizer:
 
     def _preprocess_text(self, text: str) -> List[str]:
         """Clean and tokenize text"""
-        # Convert to lowercase and split into words
-        text = text.lower()
-        # Remove special characters and digits
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
-        # Split into words and remove stop words
-        words = [word for word in text.split() if word not in self.stop_words]
-        return words
-
-    def _compute_tf(self, document: List[str]) -> Dict[str, float]:
-        """Compute Term Frequency for a document"""
-        # Count word frequencies
-        word_counts = Counter(document)
-        # Normalize by document length
-        doc_length = len(document)
-        return {word: count/doc_length for word, count in word_counts.items()}
-
-    def _compute_idf(self, documents: List[List[str]]) -> None:
-        """Compute Inverse Document Frequency for all terms"""
-        N = len(documents)
-        # Count document frequency for each term
-        doc_frequency = Counter()
-        for doc in documents:
-            doc_frequency.update(set(doc))  # Count each term only once per document
-
-        # Compute IDF
-        self.idf_ = {term: np.log((N + 1)/(df + 1)) + 1 for term, df in doc_frequency.items()}
+        # Lowercase, remove special characters and digits, drop stop words
+        return _tokenize(text, self.stop_words)
+
+    def _iter_chunk_counts(self, raw_documents: Iterable[str]) -> Iterator[tuple]:
+        """Yield _count_chunk results in order, tokenizing chunks across a process pool"""
+        docs = iter(raw_documents)
+        chunks = iter(lambda: list(islice(docs, self.chunk_size)), [])
+        n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+
+        if n_jobs is not None and n_jobs > 1:
+            # A single chunk is not worth starting worker processes for
+            first, second = next(chunks, None), next(chunks, None)
+            if second is None:
+                n_jobs = 1
+            chunks = chain(filter(None, [first, second]), chunks)
+
+        if n_jobs is None or n_jobs <= 1:
+            for chunk in chunks:
+                yield _count_chunk(chunk, self.stop_words)
+            return
+
+        # Keep a bounded number of chunks in flight so memory stays fixed
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            pending = []
+            for chunk in chunks:
+                pending.append(executor.submit(_count_chunk, chunk, self.stop_words))
+                if len(pending) >= 2 * n_jobs:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def _chunk_to_csr(self, chunk_counts: tuple, term_to_col: np.ndarray, idf: np.ndarray) -> sparse.csr_matrix:
+        """Build the (unnormalized) TF-IDF rows of one chunk from its integer arrays"""
+        doc_lengths, indptr, term_ids, counts = chunk_counts
+        cols = term_to_col[term_ids]
+        rows = np.repeat(np.arange(len(doc_lengths)), np.diff(indptr))
+        keep = cols >= 0  # Only consider terms in our vocabulary
+        tf = counts[keep] / doc_lengths[rows[keep]]
+        return sparse.csr_matrix((tf * idf[term_ids[keep]], (rows[keep], cols[keep])),
+                                 shape=(len(doc_lengths), len(self.vocabulary_)))
+
+    def fit_transform(self, raw_documents: Iterable[str]) -> sparse.csr_matrix:
+        """
+        Fit the vectorizer and transform the documents into a sparse matrix.
+
+        Documents are streamed in chunks of ``chunk_size`` and tokenized across
+        ``n_jobs`` processes. Only integer term counts are kept per chunk, so
+        memory scales with the output matrix rather than the raw text. With
+        ``max_features`` the vocabulary is only known once every chunk has been
+        counted, so the counts are spilled to a temporary directory until then
+        and memory scales with the (truncated) output matrix plus the document
+        frequency of every term.
+        """
+        with tempfile.TemporaryDirectory() as spill_dir:
+            return self._fit_transform(raw_documents, spill_dir if self.max_features is not None else None)
+
+    def _fit_transform(self, raw_documents: Iterable[str], spill_dir: str = None) -> sparse.csr_matrix:
+        """fit_transform, keeping chunk counts in ``spill_dir`` instead of memory if given"""
+        # Count terms per chunk, assigning global term ids in first-appearance order
+        term_index = {}
+        doc_frequency = np.zeros(0, dtype=np.int64)
+        chunks = []
+        N = 0
+        for local_vocab, doc_lengths, indptr, local_ids, counts in self._iter_chunk_counts(raw_documents):
+            local_to_global = np.array([term_index.setdefault(term, len(term_index)) for term in local_vocab],
+                                       dtype=np.int32)
+            term_ids = local_to_global[local_ids]
+            if len(term_index) > len(doc_frequency):
+                doc_frequency = np.concatenate([doc_frequency, np.zeros(len(term_index) - len(doc_frequency), dtype=np.int64)])
+            doc_frequency += np.bincount(term_ids, minlength=len(term_index))  # Each term once per document
+            N += len(doc_lengths)
+            chunk = (doc_lengths, indptr, term_ids, counts)
+            if spill_dir is not None:
+                chunk_path = os.path.join(spill_dir, f'chunk_{len(chunks)}.npz')
+                np.savez(chunk_path, *chunk)
+                chunk = chunk_path
+            chunks.append(chunk)
+
+        # Compute IDF for every term
+        terms = list(term_index)
+        idf = np.log((N + 1) / (doc_frequency + 1)) + 1
 
         # If max_features is set, keep only the top terms by IDF value
+        order = np.arange(len(terms))
         if self.max_features is not None:
-            sorted_terms = sorted(self.idf_.items(), key=lambda x: x[1], reverse=True)
-            top_terms = sorted_terms[:self.max_features]
-            self.idf_ = dict(top_terms)
+            order = np.argsort(-idf, kind='stable')[:self.max_features]
 
         # Create vocabulary mapping
-        self.vocabulary_ = {term: idx for idx, term in enumerate(self.idf_.keys())}
+        self.n_docs_ = N
+        self.document_frequency_ = dict(zip(terms, doc_frequency.tolist()))
+        self.vocabulary_ = {terms[i]: col for col, i in enumerate(order)}
+        self.idf_ = {terms[i]: idf[i] for i in order}
+        term_to_col = np.full(len(terms), -1, dtype=np.int64)
+        term_to_col[order] = np.arange(len(order))
+
+        # Assemble the CSR directly from the per-chunk integer arrays
+        blocks = [self._chunk_to_csr(_load_chunk(chunk) if spill_dir is not None else chunk, term_to_col, idf)
+                  for chunk in chunks]
+        X = sparse.vstack(blocks, format='csr') if blocks else sparse.csr_matrix((0, len(self.vocabulary_)))
 
-    def fit_transform(self, raw_documents: List[str]) -> sparse.csr_matrix:
-        """Fit the vectorizer and transform the documents into a sparse matrix"""
-        # Preprocess all documents
-        processed_docs = [self._preprocess_text(doc) for doc in raw_documents]
-        
-        # Compute IDF
-        self._compute_idf(processed_docs)
-        
-        # Initialize lists to construct sparse matrix
-        rows = []
-        cols = []
-        data = []
-        
-        # Compute TF-IDF for each document
-        for doc_idx, doc in enumerate(processed_docs):
-            tf = self._compute_tf(doc)
-            for term, tf_value in tf.items():
-                if term in self.vocabulary_:  # Only consider terms in our vocabulary
-                    term_idx = self.vocabulary_[term]
-                    tfidf_value = tf_value * self.idf_.get(term, 0)
-                    rows.append(doc_idx)
-                    cols.append(term_idx)
-                    data.append(tfidf_value)
-        
-        # Create sparse matrix
-        X = sparse.csr_matrix((data, (rows, cols)), 
-                            shape=(len(raw_documents), len(self.vocabulary_)))
-        
         # Normalize the vectors to unit length (L2 norm)
         return normalize_sparse_matrix(X)
 
+    def partial_fit(self, raw_documents: Iterable[str]) -> 'CustomTfidfVectorizer':
+        """
+        Update document frequencies and IDF weights with new documents.
+
+        The vocabulary (and therefore the column layout of transformed
+        matrices) stays fixed once fitted so existing feature matrices remain
+        valid; only the IDF of vocabulary terms is refreshed. Frequencies of
+        out-of-vocabulary terms are still tracked for the next full fit.
+        An unfitted vectorizer is simply fitted.
+        """
+        if not self.vocabulary_:
+            self.fit_transform(raw_documents)
+            return self
+
+        for local_vocab, doc_lengths, indptr, local_ids, counts in self._iter_chunk_counts(raw_documents):
+            chunk_df = np.bincount(local_ids, minlength=len(local_vocab))
+            for term, df in zip(local_vocab, chunk_df.tolist()):
+                self.document_frequency_[term] = self.document_frequency_.get(term, 0) + df
+            self.n_docs_ += len(doc_lengths)
+
+        N = self.n_docs_
+        self.idf_ = {term: np.log((N + 1) / (self.document_frequency_[term] + 1)) + 1
+                     for term in self.vocabulary_}
+        return self
+
     def transform(self, raw_documents: List[str]) -> sparse.csr_matrix:
         """Transform new documents using the fitted vectorizer"""
         if not self.vocabulary_:
             raise ValueError("Vectorizer needs to be fitted before transform")
         
-        # Initialize lists to construct sparse matrix
-        rows = []
-        cols = []
-        data = []
-        
-        # Process each document
-        for doc_idx, doc in enumerate(raw_documents):
-            processed_doc = self._preprocess_text(doc)
-            tf = self._compute_tf(processed_doc)
-            
-            for term, tf_value in tf.items():
-                if term in self.vocabulary_:
-                    term_idx = self.vocabulary_[term]
-                    tfidf_value = tf_value * self.idf_.get(term, 0)
-                    rows.append(doc_idx)
-                    cols.append(term_idx)
-                    data.append(tfidf_value)
-        
-        # Create sparse matrix
-        X = sparse.csr_matrix((data, (rows, cols)), 
-                            shape=(len(raw_documents), len(self.vocabulary_)))
+        # Map every term seen in the documents to its column and IDF (-1 / 0 if unknown)
+        local_vocab, doc_lengths, indptr, term_ids, counts = _count_chunk(list(raw_documents), self.stop_words)
+        term_to_col = np.array([self.vocabulary_.get(term, -1) for term in local_vocab], dtype=np.int64)
+        idf = np.array([self.idf_.get(term, 0) for term in local_vocab], dtype=np.float64)
+        X = self._chunk_to_csr((doc_lengths, indptr, term_ids, counts), term_to_col, idf)
         
         # Normalize the vectors
         return normalize_sparse_matrix(X)
@@ -129,14 +215,14 @@ class CustomTfidfVectorizer:
 def normalize_sparse_matrix(X: sparse.csr_matrix) -> sparse.csr_matrix:
     """Normalize sparse matrix rows to unit length (L2 norm)"""
     # Calculate L2 norm for each row
-    norms = sparse.linalg.norm(X, axis=1)
+    norms = np.asarray(sparse.linalg.norm(X, axis=1)).ravel()
     norms[norms == 0] = 1  # Prevent division by zero
     
-    # Create diagonal matrix with 1/norm values
-    normalizer = sparse.diags(1/norms.A.ravel())
+    # Create diagonal matrix with 1/norm values (keeping the input dtype)
+    normalizer = sparse.diags(1/norms).astype(X.dtype)
     
     # Multiply by normalizer to get normalized matrix
-    return normalizer @ X
+    return (normalizer @ X).tocsr()
 
 def compare_with_sklearn(text_data):
     """Compare custom TF-IDF with sklearn's implementation"""
@@ -0,0 +1,236 @@
+"""
+Shared TTL Cache for TMDB Responses
+
+This module implements a small persistent cache backed by SQLite. All uvicorn
+workers on a host open the same database file (in WAL mode), so a response
+fetched by one worker is served by the others and survives restarts.
+
+Every entry has:
+    - a freshness TTL (per endpoint), after which it is stale
+    - a stale window, during which the stale value is still served while a
+      background task refreshes it (stale-while-revalidate)
+    - a shorter TTL for negative results (failed or empty lookups), so
+      upstream errors are retried soon instead of being cached forever
+
+SQLite calls block, so the async wrapper runs them on one dedicated thread
+(``aget``/``aset``) rather than on the event loop. The busy timeout is a few
+milliseconds: when another worker holds the write lock, a read is treated as
+a miss and a write is dropped instead of stalling requests.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Tuple
+
+from src.singleflight import SingleFlight
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+
+class TMDBCache:
+    """
+    SQLite-backed key/value cache with TTLs and hit/miss statistics.
+
+    Attributes:
+        path (str): Database file shared by all workers
+        stats (Counter): Per-process counts keyed by (namespace, outcome)
+        flights (dict): Single-flight group of each cached namespace
+        busy (int): Reads and writes skipped because the database was locked
+    """
+
+    def __init__(self, path: str, prune_every: int = 1000, busy_timeout_ms: int = 20):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): Database file path; parent directories are created
+            prune_every (int, optional): Delete expired rows every N writes.
+                Defaults to 1000.
+            busy_timeout_ms (int, optional): How long to wait for another
+                connection's lock before giving up. Defaults to 20.
+        """
+        self.path = path
+        self.prune_every = prune_every
+        self.stats = Counter()
+        self.flights = {}
+        self.busy = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tmdb-cache')
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Generous timeout while setting up; lookups then use the short busy timeout
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' fresh_until REAL NOT NULL,'
+            ' stale_until REAL NOT NULL)')
+        self._conn.commit()
+        self._conn.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+
+    def get(self, key: str) -> Tuple[Any, str]:
+        """
+        Look up a key.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Tuple[Any, str]: The cached value (None on a miss) and FRESH,
+                STALE or MISS (also when the database is locked)
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT value, fresh_until, stale_until FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.OperationalError:
+            self.busy += 1
+            return None, MISS
+        now = time.time()
+        if row is None or row[2] <= now:
+            return None, MISS
+        return json.loads(row[0]), FRESH if row[1] > now else STALE
+
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0) -> None:
+        """
+        Store a JSON-serializable value.
+
+        Args:
+            key (str): Cache key
+            value (Any): Value to store
+            ttl (float): Seconds the value is fresh
+            stale_ttl (float, optional): Extra seconds the value may be served
+                stale while it is refreshed. Defaults to 0.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, fresh_until, stale_until) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(value), now + ttl, now + ttl + stale_ttl))
+                self._writes += 1
+                if self._writes % self.prune_every == 0:
+                    self._conn.execute('DELETE FROM cache WHERE stale_until <= ?', (now,))
+                self._conn.commit()
+            except sqlite3.OperationalError:
+                # Locked by another worker: the value is simply not cached this time
+                self.busy += 1
+                self._conn.rollback()
+
+    async def aget(self, key: str) -> Tuple[Any, str]:
+        """``get`` on the cache thread, without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: float, stale_ttl: float = 0) -> None:
+        """``set`` on the cache thread, without blocking the event loop."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.set, key, value, ttl, stale_ttl)
+
+    def record(self, namespace: str, outcome: str) -> None:
+        """Count a cache outcome ('hit', 'stale', 'miss', 'negative') for a namespace."""
+        self.stats[(namespace, outcome)] += 1
+
+    def report(self) -> dict:
+        """
+        Summarize this process's cache statistics.
+
+        Returns:
+            dict: Per-namespace counts, hit ratio and coalesced calls
+        """
+        report = {}
+        for (namespace, outcome), count in self.stats.items():
+            report.setdefault(namespace, {'hit': 0, 'stale': 0, 'miss': 0, 'negative': 0})[outcome] = count
+        for namespace, counts in report.items():
+            lookups = counts['hit'] + counts['stale'] + counts['miss']
+            counts['hit_ratio'] = (counts['hit'] + counts['stale']) / lookups if lookups else 0.0
+            if namespace in self.flights:
+                counts['coalesced'] = self.flights[namespace].stats['shared']
+        return report
+
+    def close(self) -> None:
+        """Wait for pending cache I/O and close the database connection."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+
+def cached(cache: TMDBCache, namespace: str, ttl: float, negative_ttl: float = 60,
+           stale_ttl: float = 0, is_negative: Callable[[Any], bool] = lambda value: not value):
+    """
+    Cache the results of a coroutine function in a ``TMDBCache``.
+
+    Results for which ``is_negative`` is true (by default None or empty) are
+    kept only for ``negative_ttl`` seconds and are never served stale.
+
+    Concurrent misses (and refreshes) of the same key are coalesced, so only
+    one upstream call is made per key at a time; ``wrapper.flight.stats``
+    counts the calls that were shared.
+
+    Args:
+        cache (TMDBCache): Cache to use
+        namespace (str): Key prefix, also used for statistics
+        ttl (float): Freshness TTL in seconds
+        negative_ttl (float, optional): TTL for negative results. Defaults to 60.
+        stale_ttl (float, optional): Stale-while-revalidate window in seconds.
+            Defaults to 0 (disabled).
+        is_negative (Callable, optional): Classifies a result as negative
+    """
+    def decorator(func):
+        flight = SingleFlight()
+
+        async def fetch_and_store(key: str, args: tuple) -> Any:
+            value = await func(*args)
+            if is_negative(value):
+                cache.record(namespace, 'negative')
+                await cache.aset(key, value, negative_ttl)
+            else:
+                await cache.aset(key, value, ttl, stale_ttl)
+            return value
+
+        async def refresh(key: str, args: tuple) -> Any:
+            # A failed refresh keeps serving the stale value until it expires
+            value = await func(*args)
+            if not is_negative(value):
+                await cache.aset(key, value, ttl, stale_ttl)
+            return value
+
+        async def refresh_quietly(key: str, args: tuple) -> None:
+            try:
+                await flight.do(('refresh', key), lambda: refresh(key, args))
+            except Exception as e:
+                print(f"Cache refresh failed for {key}: {e}")
+
+        @wraps(func)
+        async def wrapper(*args):
+            key = f"{namespace}:{json.dumps(args)}"
+            value, state = await cache.aget(key)
+            if state == FRESH:
+                cache.record(namespace, 'hit')
+                return value
+            if state == STALE:
+                cache.record(namespace, 'stale')
+                if not flight.is_in_flight(('refresh', key)):
+                    task = asyncio.create_task(refresh_quietly(key, args))
+                    wrapper.background_tasks.add(task)
+                    task.add_done_callback(wrapper.background_tasks.discard)
+                return value
+            cache.record(namespace, 'miss')
+            return await flight.do(key, lambda: fetch_and_store(key, args))
+
+        wrapper.background_tasks = set()
+        wrapper.flight = flight
+        cache.flights[namespace] = flight
+        return wrapper
+    return decorator
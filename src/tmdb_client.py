@@ -0,0 +1,187 @@
+"""
+Async TMDB Client
+
+This module provides one shared, connection-pooled async HTTP client for the
+TMDB API. Connections are kept alive between calls (and multiplexed over
+HTTP/2 when the ``h2`` package is installed), the number of concurrent
+upstream requests is bounded by a semaphore, and every call has its own
+timeout. A circuit breaker refuses calls while TMDB is failing, and slow
+calls are hedged with a second request (see ``src/resilience.py``).
+
+Set ``TMDB_API_BASE`` to point the client at another server (e.g. a local
+stand-in for load tests).
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+import httpx
+
+from src.metrics import counter, gauge, histogram
+from src.resilience import CLOSED, CircuitBreaker, Hedger
+
+TMDB_API_BASE = os.getenv('TMDB_API_BASE', 'https://api.themoviedb.org/3')
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+REQUEST_SECONDS = histogram('movie_match_tmdb_request_seconds',
+                            'Latency of TMDB requests, excluding time queued for a slot', ['endpoint'])
+RESPONSES = counter('movie_match_tmdb_responses_total',
+                    'TMDB responses by HTTP status, or timeout / error / cancelled / short_circuit',
+                    ['endpoint', 'status'])
+IN_FLIGHT = gauge('movie_match_tmdb_requests_in_flight', 'TMDB requests currently in flight')
+QUEUED = gauge('movie_match_tmdb_requests_queued', 'TMDB requests waiting for a concurrency slot')
+
+
+def upstream_healthy(status: str) -> bool:
+    """Whether a status label shows a working upstream: any answer but 429 and 5xx."""
+    return status.isdigit() and status != '429' and not status.startswith('5')
+
+
+def endpoint_label(path: str) -> str:
+    """Metric label for a path, with ids replaced so "/movie/603" becomes "/movie/{id}"."""
+    return re.sub(r'/\d+', '/{id}', path)
+
+
+class TMDBClient:
+    """
+    Shared async client for the TMDB REST API.
+
+    Attributes:
+        api_key (str): TMDB API key sent with every request
+        base_url (str): API root, e.g. https://api.themoviedb.org/3
+        timeout (float): Default per-call timeout in seconds
+        breaker (CircuitBreaker): Opens while TMDB calls fail
+        hedger (Hedger): Hedges calls slower than recent latency
+    """
+
+    def __init__(self, api_key: str, base_url: str = TMDB_API_BASE, max_connections: int = 32,
+                 max_concurrency: int = 16, timeout: float = 5.0,
+                 breaker: Optional[CircuitBreaker] = None, hedger: Optional[Hedger] = None):
+        """
+        Initialize the client. The underlying connection pool is created
+        lazily on first use, inside the running event loop.
+
+        Args:
+            api_key (str): TMDB API key
+            base_url (str, optional): API root. Defaults to ``TMDB_API_BASE``.
+            max_connections (int, optional): Connection pool size. Defaults to 32.
+            max_concurrency (int, optional): Upstream requests allowed in flight.
+                Defaults to 16.
+            timeout (float, optional): Default timeout in seconds. Defaults to 5.
+            breaker (CircuitBreaker, optional): Defaults to a new breaker.
+            hedger (Hedger, optional): Defaults to a new hedger.
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.hedger = hedger if hedger is not None else Hedger()
+        self._limits = httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, http2=HTTP2_AVAILABLE,
+                                             limits=self._limits, timeout=self.timeout)
+        return self._client
+
+    async def _attempt(self, path: str, query: dict, endpoint: str,
+                       timeout: float) -> Tuple[str, Optional[httpx.Response]]:
+        """
+        Make one request, recording its latency and outcome.
+
+        Returns:
+            Tuple[str, Optional[httpx.Response]]: Status label (HTTP status,
+                'timeout' or 'error') and the response, if any
+        """
+        status = 'error'
+        response = None
+        try:
+            with QUEUED.track_inprogress():
+                await self._semaphore.acquire()
+            try:
+                with IN_FLIGHT.track_inprogress():
+                    start = time.perf_counter()
+                    try:
+                        response = await self._get_client().get(path, params=query, timeout=timeout)
+                    finally:
+                        elapsed = time.perf_counter() - start
+                        REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            finally:
+                self._semaphore.release()
+            status = str(response.status_code)
+            if response.status_code == 200:
+                self.hedger.latencies.observe(endpoint, elapsed)
+        except httpx.TimeoutException as e:
+            status = 'timeout'
+            print(f"Error fetching {path}: {e!r}")
+        except httpx.HTTPError as e:
+            print(f"Error fetching {path}: {e!r}")
+        except asyncio.CancelledError:
+            # Includes the losing copy of a hedged request
+            status = 'cancelled'
+            raise
+        finally:
+            RESPONSES.labels(endpoint, status).inc()
+        return status, response
+
+    async def get_json(self, path: str, params: Optional[dict] = None,
+                       timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        GET a TMDB endpoint and return its decoded JSON body.
+
+        While the circuit breaker is open the call returns None at once, so
+        callers fall back to local data. A call slower than the endpoint's
+        recent latency percentile is hedged with a second request.
+
+        Args:
+            path (str): Endpoint path, e.g. "/movie/603"
+            params (dict, optional): Extra query parameters
+            timeout (float, optional): Timeout for this call in seconds
+
+        Returns:
+            Optional[dict]: The JSON body, or None on errors, timeouts, non-200
+                responses (which are logged) and short-circuited calls
+        """
+        endpoint = endpoint_label(path)
+        if not self.breaker.allow():
+            RESPONSES.labels(endpoint, 'short_circuit').inc()
+            return None
+
+        query = {'api_key': self.api_key, 'language': 'en-US', **(params or {})}
+        outcome = None
+        try:
+            status, response = await self.hedger.run(
+                endpoint, lambda attempt_timeout: self._attempt(path, query, endpoint, attempt_timeout),
+                timeout or self.timeout, accept=lambda result: upstream_healthy(result[0]),
+                can_hedge=lambda: self.breaker.state == CLOSED and not self._semaphore.locked())
+            outcome = upstream_healthy(status)
+        finally:
+            if outcome is None:
+                self.breaker.release()
+            else:
+                self.breaker.record(outcome)
+
+        if status == '200':
+            return response.json()
+        if response is not None:
+            print(f"Error: TMDB returned {status} for {path}")
+        return None
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
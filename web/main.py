@@ -1,53 +1,19 @@
 import sys
 import os
-import requests
-import socket
-import dns.resolver
+import asyncio
+import json
 from typing import List, Optional
 import time
 
-# --- Custom DNS Configuration for TMDB ---
-try:
-    # Create a resolver that uses Google DNS
-    resolver = dns.resolver.Resolver()
-    resolver.nameservers = ['8.8.8.8', '8.8.4.4']
-    
-    # Store original getaddrinfo
-    _original_getaddrinfo = socket.getaddrinfo
-
-    def custom_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
-        """
-        Intercept DNS lookups for api.themoviedb.org and api.themoviedb.org
-        to use Google DNS, bypassing potential ISP blocks.
-        """
-        if host in ['api.themoviedb.org', 'image.tmdb.org']:
-            try:
-                # Resolve using Google DNS
-                answers = resolver.resolve(host, 'A')
-                if answers:
-                    # Use the first resolved IP address
-                    ip_address = answers[0].address
-                    # Delegate to original getaddrinfo using the IP
-                    return _original_getaddrinfo(ip_address, port, family, type, proto, flags)
-            except Exception as e:
-                print(f"Warning: Custom DNS resolution failed for {host}: {e}")
-                # Fallback to default behavior
-        
-        return _original_getaddrinfo(host, port, family, type, proto, flags)
-
-    # Monkeypatch socket.getaddrinfo
-    socket.getaddrinfo = custom_getaddrinfo
-    print("Configured Custom DNS (8.8.8.8) for TMDB Requests")
-    
-except ImportError:
-    print("Warning: dnspython not installed. Using default DNS.")
-except Exception as e:
-    print(f"Warning: Failed to configure custom DNS: {e}")
-# -----------------------------------------
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from typing import Union
+from collections import OrderedDict
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 
 # Define BASE_DIR first
@@ -57,9 +23,51 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
 from src.knn_scratch import MovieRecommender
+from src.index_store import current_generation, generation_paths
 from src.api_auth import API_KEY
+from src.tmdb_client import TMDBClient
+from src.resilience import STATES as CIRCUIT_STATES
+from src.tmdb_cache import TMDBCache, cached
+from src import metrics
+from src.dns_cache import CachedResolver
+
+# --- Custom DNS Configuration for TMDB ---
+# Resolve TMDB hosts through Google DNS (bypassing potential ISP blocks).
+# Answers are cached per record TTL and refreshed in the background, so
+# connections don't wait on a DNS round trip; system DNS is the fallback.
+DNS_NAMESERVERS = os.getenv('DNS_NAMESERVERS', '8.8.8.8,8.8.4.4').split(',')
+dns_resolver = None
+try:
+    dns_resolver = CachedResolver(['api.themoviedb.org', 'image.tmdb.org'], nameservers=DNS_NAMESERVERS)
+    dns_resolver.install()
+    print(f"Configured Custom DNS ({DNS_NAMESERVERS[0]}) for TMDB Requests")
+except ImportError:
+    print("Warning: dnspython not installed. Using default DNS.")
+except Exception as e:
+    print(f"Warning: Failed to configure custom DNS: {e}")
+
+# One pooled async client shared by every request. While TMDB is failing its
+# circuit breaker refuses calls at once, and handlers serve local catalog data
+tmdb = TMDBClient(API_KEY)
+
+# TMDB response cache shared by all workers on this host
+CACHE_PATH = os.getenv('TMDB_CACHE_PATH', os.path.join(BASE_DIR, '.cache', 'tmdb_cache.sqlite'))
+tmdb_cache = TMDBCache(CACHE_PATH)
 
-app = FastAPI()
+# Per-endpoint cache policy (seconds)
+HOUR = 60 * 60
+NEGATIVE_TTL = 60
+STALE_TTL = 24 * HOUR
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watcher = asyncio.create_task(watch_index_store())
+    yield
+    watcher.cancel()
+    await tmdb.aclose()
+    tmdb_cache.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Input your frontend URL here
 origins = [
@@ -78,17 +86,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Metrics (scraped from /metrics, per worker) ---
+HTTP_SECONDS = metrics.histogram('movie_match_http_request_seconds',
+                                 'Latency of HTTP requests by route', ['method', 'route', 'status'])
+HTTP_IN_FLIGHT = metrics.gauge('movie_match_http_requests_in_flight', 'HTTP requests being handled')
+API_STAGE_SECONDS = metrics.histogram('movie_match_api_stage_seconds',
+                                      'Time spent in each stage of a recommendation request', ['stage'])
+metrics.callback('movie_match_tmdb_cache_lookups_total', 'TMDB cache lookups by outcome',
+                 ['namespace', 'outcome'], 'counter', lambda: dict(tmdb_cache.stats))
+metrics.callback('movie_match_tmdb_cache_hit_ratio', 'Share of TMDB cache lookups served from the cache',
+                 ['namespace'], 'gauge',
+                 lambda: {(namespace,): counts['hit_ratio'] for namespace, counts in tmdb_cache.report().items()})
+metrics.callback('movie_match_tmdb_fetches_in_flight', 'Distinct TMDB fetches in flight after coalescing',
+                 ['namespace'], 'gauge',
+                 lambda: {(namespace,): flight.in_flight() for namespace, flight in tmdb_cache.flights.items()})
+metrics.callback('movie_match_dns_lookups_total', 'Cached DNS lookups of TMDB hosts by outcome',
+                 ['outcome'], 'counter',
+                 lambda: {(outcome,): count for outcome, count in dns_resolver.stats.items()} if dns_resolver else {})
+metrics.callback('movie_match_tmdb_circuit_state', 'TMDB circuit breaker state (1 for the current state)',
+                 ['state'], 'gauge',
+                 lambda: {(state,): float(state == tmdb.breaker.state) for state in CIRCUIT_STATES})
+metrics.callback('movie_match_tmdb_circuit_events_total', 'TMDB circuit breaker transitions and refused calls',
+                 ['event'], 'counter', lambda: {(event,): count for event, count in tmdb.breaker.stats.items()})
+metrics.callback('movie_match_tmdb_hedges_total', 'Hedged TMDB requests sent, and those that answered first',
+                 ['outcome'], 'counter',
+                 lambda: {(outcome,): tmdb.hedger.stats[outcome] for outcome in ('sent', 'won')})
+metrics.callback('movie_match_tmdb_background_fetches', 'TMDB fetches still running after missing their deadline',
+                 [], 'gauge', lambda: {(): len(_background_fetches)})
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests in flight and time them per route template"""
+    with HTTP_IN_FLIGHT.track_inprogress():
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Route templates keep the label set small (/api/movie/{movie_id}, not every id)
+            route = request.scope.get('route')
+            HTTP_SECONDS.labels(request.method, route.path if route else 'unmatched', status).observe(
+                time.perf_counter() - start)
+
 # Initialize Recommender
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'movies.csv')
 MATRIX_PATH = os.path.join(BASE_DIR, 'models', 'final_matrix.npz')
+INDEX_DIR = os.path.join(BASE_DIR, 'models', 'index')
+
+# Prefer the memory-mapped, pre-normalized artifact when it has been built
+if os.path.isdir(INDEX_DIR):
+    MATRIX_PATH = INDEX_DIR
+GRAPH_PATH = os.path.join(BASE_DIR, 'models', 'neighbor_graph.npz')
+ANN_INDEX_PATH = os.path.join(BASE_DIR, 'models', 'ivf_index.npz')
+EMBEDDING_PATH = os.path.join(BASE_DIR, 'models', 'embedding')
+QUANTIZED_PATH = os.path.join(BASE_DIR, 'models', 'quantized')
+VECTORIZER_PATH = os.path.join(BASE_DIR, 'models', 'tfidf_vectorizer.joblib')
+FEATURE_NAMES_PATH = os.path.join(BASE_DIR, 'models', 'feature_names.npy')
+
+# 'exact' (default), 'ann' to score through the IVF index for large catalogs,
+# 'embedding' for dense scoring in the low-rank embedding, or 'quantized' to
+# scan int8 codes and re-rank candidates against the memory-mapped index
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'exact')
 
 # Check if files exist, if not try root (as per some confusion in logs)
 if not os.path.exists(DATA_PATH):
     DATA_PATH = os.path.join(BASE_DIR, 'movies.csv')
 
-recommender = MovieRecommender(DATA_PATH, MATRIX_PATH)
-
-from fastapi.concurrency import run_in_threadpool
+# Prefer the columnar catalog (typed columns, overviews read on demand)
+CATALOG_DIR = os.path.join(BASE_DIR, 'data', 'catalog')
+if os.path.isdir(CATALOG_DIR):
+    DATA_PATH = CATALOG_DIR
+
+# Published generations (see src/index_store.py) are memory-mapped, so every
+# worker shares one copy, and are picked up by polling without a restart
+INDEX_STORE = os.getenv('INDEX_STORE', os.path.join(BASE_DIR, 'models', 'store'))
+INDEX_POLL_SECONDS = float(os.getenv('INDEX_POLL_SECONDS', '5'))
+
+def build_recommender(generation: Optional[int] = None) -> MovieRecommender:
+    """Load the recommender from a published generation, or from the files on disk"""
+    data_path, matrix_path, graph_path = DATA_PATH, MATRIX_PATH, GRAPH_PATH
+    if generation is not None:
+        paths = generation_paths(INDEX_STORE, generation)
+        data_path, matrix_path, graph_path = paths['catalog'], paths['index'], paths['graph']
+    return MovieRecommender(data_path, matrix_path, graph_path=graph_path,
+                            search_mode=SEARCH_MODE, ann_index_path=ANN_INDEX_PATH,
+                            vectorizer_path=VECTORIZER_PATH, feature_names_path=FEATURE_NAMES_PATH,
+                            embedding_path=EMBEDDING_PATH, quantized_path=QUANTIZED_PATH)
+
+# Handlers read `recommender` once per request, so swapping in a new index
+# never affects requests that are already running.
+loaded_generation = current_generation(INDEX_STORE)
+recommender = build_recommender(loaded_generation)
+index_version = 1
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def swap_recommender(new_recommender: MovieRecommender, generation: Optional[int] = None) -> int:
+    """Atomically publish a new recommender and return its version"""
+    global recommender, index_version, loaded_generation
+    recommender = new_recommender
+    loaded_generation = generation
+    index_version += 1
+    return index_version
+
+metrics.callback('movie_match_index_generation', 'Index store generation served by this worker (0 if none)',
+                 [], 'gauge', lambda: {(): loaded_generation or 0})
+
+async def watch_index_store():
+    """Swap in newly published generations, checking every INDEX_POLL_SECONDS"""
+    if INDEX_POLL_SECONDS <= 0:
+        return
+    failed_generation = None
+    while True:
+        await asyncio.sleep(INDEX_POLL_SECONDS)
+        generation = current_generation(INDEX_STORE)
+        if generation is None or generation in (loaded_generation, failed_generation):
+            continue
+        try:
+            new_recommender = await run_in_threadpool(build_recommender, generation)
+            version = swap_recommender(new_recommender, generation)
+            print(f"Loaded index generation {generation} (version {version})")
+        except Exception as e:
+            # Don't retry a broken generation until a newer one is published
+            failed_generation = generation
+            print(f"Index Reload Error: {e}")
 
 # --- Helper Functions ---
 
@@ -103,45 +227,57 @@ def transform_movie_data(data: dict) -> dict:
         'backdropUrl': data.get('backdrop'),
         'releaseDate': data.get('release_date'),
         'rating': data.get('vote_average'),
-        'matchPercentage': int(data.get('similarity', 0) * 100) if 'similarity' in data else None
+        'matchPercentage': int(data.get('similarity', 0) * 100) if 'similarity' in data else None,
+        # False when TMDB details missed the latency budget and local catalog data was used
+        'enriched': data.get('enriched', True)
     }
 
-from functools import lru_cache
-from concurrent.futures import ThreadPoolExecutor
+PLACEHOLDER_POSTER = "https://via.placeholder.com/500x750?text=No+Image"
 
-# Validates and gets full details for a movie from TMDB
-@lru_cache(maxsize=256)
-def get_tmdb_details_sync(movie_id):
-    """Fetch full movie details from TMDB (Synchronous, Cached)"""
-    try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={API_KEY}&language=en-US"
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            data = response.json()
-            # Extract relevant fields
-            return {
-                'id': data.get('id'),
-                'title': data.get('title'),
-                'overview': data.get('overview', 'No overview available.'),
-                'poster': f"https://image.tmdb.org/t/p/w500{data.get('poster_path')}" if data.get('poster_path') else "https://via.placeholder.com/500x750?text=No+Image",
-                'backdrop': f"https://image.tmdb.org/t/p/original{data.get('backdrop_path')}" if data.get('backdrop_path') else None,
-                'release_date': data.get('release_date', 'Unknown'),
-                'vote_average': data.get('vote_average', 0),
-                'genres': [g['name'] for g in data.get('genres', [])],
-                'runtime': data.get('runtime', 0)
-            }
-        else:
-            print(f"Error: TMDB returned {response.status_code} for movie {movie_id}")
-    except Exception as e:
-        print(f"Error fetching details for {movie_id}: {e}")
+def poster_url(path: Optional[str]) -> str:
+    """Full poster URL for a TMDB poster path"""
+    return f"https://image.tmdb.org/t/p/w500{path}" if path else PLACEHOLDER_POSTER
 
-    
-    # Minimal fallback if API fails
+def backdrop_url(path: Optional[str]) -> Optional[str]:
+    """Full backdrop URL for a TMDB backdrop path"""
+    return f"https://image.tmdb.org/t/p/original{path}" if path else None
+
+@cached(tmdb_cache, 'movie', ttl=24 * HOUR, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL)
+async def fetch_tmdb_details(movie_id):
+    """Fetch full movie details from TMDB (Cached), None if the call fails"""
+    data = await tmdb.get_json(f"/movie/{movie_id}", timeout=5)
+    if data is not None:
+        # Extract relevant fields
+        return {
+            'id': data.get('id'),
+            'title': data.get('title'),
+            'overview': data.get('overview', 'No overview available.'),
+            'poster': poster_url(data.get('poster_path')),
+            'backdrop': backdrop_url(data.get('backdrop_path')),
+            'release_date': data.get('release_date', 'Unknown'),
+            'vote_average': data.get('vote_average', 0),
+            'genres': [g['name'] for g in data.get('genres', [])],
+            'runtime': data.get('runtime', 0)
+        }
+    return None
+
+# Validates and gets full details for a movie from TMDB
+async def get_tmdb_details(movie_id):
+    """Fetch full movie details from TMDB, with a minimal fallback"""
+    details = await fetch_tmdb_details(movie_id)
+    if details is not None:
+        return details
+
+    # Catalog movies fall back to local data (e.g. while the circuit is open)
+    rec_engine = recommender
+    if rec_engine.get_catalog_entry(movie_id) is not None:
+        return local_movie_data(rec_engine, movie_id)
+
+    # Minimal fallback if API fails (not cached beyond the negative TTL)
     return {
         'id': movie_id,
         'title': 'Unknown',
-        'poster': "https://via.placeholder.com/500x750?text=No+Image",
+        'poster': PLACEHOLDER_POSTER,
         'backdrop': None,
         'overview': 'Could not fetch details.',
         'genres': [],
@@ -149,143 +285,172 @@ def get_tmdb_details_sync(movie_id):
         'release_date': 'Unknown'
     }
 
-@lru_cache(maxsize=128)
-def search_tmdb_fallback_sync(query):
-    """Search TMDB for a movie if not found locally (Cached)"""
-    try:
-        search_url = f"https://api.themoviedb.org/3/search/movie?api_key={API_KEY}&language=en-US&query={requests.utils.quote(query)}&page=1&include_adult=false"
-        response = requests.get(search_url, timeout=2)
-        
-        if response.status_code == 200:
-            results = response.json().get('results', [])
-            if results:
-                # Return the detailed version of the first result
-                return get_tmdb_details_sync(results[0]['id'])
-    except Exception as e:
-        print(f"Error searching TMDB for {query}: {e}")
-    return None
+async def get_tmdb_details_many(movie_ids):
+    """
+    Fetch details for a batch of movies concurrently, in the given order.
 
-def search_tmdb_multiple_sync(query, limit=3):
-    """Search TMDB and return multiple detailed results (Parallelized)"""
-    movies = []
-    try:
-        search_url = f"https://api.themoviedb.org/3/search/movie?api_key={API_KEY}&language=en-US&query={requests.utils.quote(query)}&page=1&include_adult=false"
-        response = requests.get(search_url, timeout=2)
-        
-        if response.status_code == 200:
-            results = response.json().get('results', [])
-            candidate_ids = [r['id'] for r in results[:limit]]
-            
-            # Fetch details in parallel
-            with ThreadPoolExecutor(max_workers=limit) as executor:
-                # map returns results in order
-                movies = list(executor.map(get_tmdb_details_sync, candidate_ids))
-                
-            # Filter out any Nones if fetch failed
-            movies = [m for m in movies if m]
-            
-    except Exception as e:
-        print(f"Error searching TMDB multiple {query}: {e}")
-    return movies
+    Duplicate ids are fetched once, and ids already being fetched by other
+    requests (e.g. the neighbors of a trending movie) join that fetch.
+    """
+    unique_ids = list(dict.fromkeys(movie_ids))
+    details = await asyncio.gather(*(get_tmdb_details(movie_id) for movie_id in unique_ids))
+    by_id = dict(zip(unique_ids, details))
+    return [dict(by_id[movie_id]) for movie_id in movie_ids]
 
-def search_tmdb_mixed_sync(query, movie_limit=6, tv_limit=4):
-    """Search TMDB for both movies and TV shows, return combined results"""
-    results = []
-    try:
-        # Search movies
-        movie_url = f"https://api.themoviedb.org/3/search/movie?api_key={API_KEY}&language=en-US&query={requests.utils.quote(query)}&page=1&include_adult=false"
-        movie_response = requests.get(movie_url, timeout=2)
-        
-        # Search TV shows
-        tv_url = f"https://api.themoviedb.org/3/search/tv?api_key={API_KEY}&language=en-US&query={requests.utils.quote(query)}&page=1&include_adult=false"
-        tv_response = requests.get(tv_url, timeout=2)
-        
-        movie_ids = []
-        tv_ids = []
-        
-        if movie_response.status_code == 200:
-            movie_results = movie_response.json().get('results', [])
-            movie_ids = [r['id'] for r in movie_results[:movie_limit]]
-        
-        if tv_response.status_code == 200:
-            tv_results = tv_response.json().get('results', [])
-            tv_ids = [('tv', r['id']) for r in tv_results[:tv_limit]]
-        
-        # Fetch movie details in parallel
-        if movie_ids:
-            with ThreadPoolExecutor(max_workers=movie_limit) as executor:
-                movies = list(executor.map(get_tmdb_details_sync, movie_ids))
-                results.extend([m for m in movies if m])
-        
-        # Fetch TV show details in parallel
-        if tv_ids:
-            with ThreadPoolExecutor(max_workers=tv_limit) as executor:
-                tv_shows = list(executor.map(lambda x: get_tmdb_tv_details_sync(x[1]), tv_ids))
-                results.extend([t for t in tv_shows if t])
-                
-    except Exception as e:
-        print(f"Error searching TMDB mixed {query}: {e}")
-    return results
+# Latency budget for TMDB enrichment of a recommendation response
+ENRICH_BUDGET = float(os.getenv('ENRICH_BUDGET_MS', '800')) / 1000
 
-def get_tmdb_tv_details_sync(tv_id):
-    """Get TV show details from TMDB"""
-    try:
-        url = f"https://api.themoviedb.org/3/tv/{tv_id}?api_key={API_KEY}&language=en-US"
-        response = requests.get(url, timeout=2)
-        
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'id': f"tv-{data.get('id')}",  # Prefix with 'tv-' to distinguish
-                'title': data.get('name'),
-                'poster': f"https://image.tmdb.org/t/p/w500{data.get('poster_path')}" if data.get('poster_path') else "https://via.placeholder.com/500x750?text=No+Image",
-                'backdrop': f"https://image.tmdb.org/t/p/original{data.get('backdrop_path')}" if data.get('backdrop_path') else None,
-                'overview': data.get('overview', ''),
-                'genres': [g['name'] for g in data.get('genres', [])],
-                'vote_average': data.get('vote_average', 0),
-                'release_date': data.get('first_air_date', 'Unknown'),
-                'media_type': 'tv'
-            }
-    except Exception as e:
-        print(f"Error fetching TV details for {tv_id}: {e}")
+# Fetches that missed their deadline keep running to warm the cache
+_background_fetches = set()
+
+def local_movie_data(rec_engine: MovieRecommender, movie_id) -> dict:
+    """Movie data from the local catalog, used when TMDB details are late"""
+    entry = rec_engine.get_catalog_entry(movie_id) or {'id': movie_id, 'title': 'Unknown', 'overview': '', 'genres': []}
+    return {
+        'id': entry['id'],
+        'title': entry['title'],
+        'overview': entry['overview'] or 'No overview available.',
+        'genres': entry['genres'],
+        'poster': PLACEHOLDER_POSTER,
+        'backdrop': None,
+        'release_date': str(entry['release_year']) if entry.get('release_year') else 'Unknown',
+        'vote_average': None,
+        'enriched': False
+    }
+
+async def get_tmdb_details_within(rec_engine: MovieRecommender, movie_ids, deadline: float):
+    """
+    Fetch details for several movies concurrently, waiting at most until
+    `deadline` (event loop time). Movies whose details are not available by
+    then come back with local catalog data and `enriched: False`.
+    """
+    unique_ids = list(dict.fromkeys(movie_ids))
+    tasks = {movie_id: asyncio.ensure_future(fetch_tmdb_details(movie_id)) for movie_id in unique_ids}
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+
+    by_id = {}
+    for movie_id, task in tasks.items():
+        if task.done() and task.exception() is None and task.result() is not None:
+            by_id[movie_id] = {**task.result(), 'enriched': True}
+        else:
+            if not task.done():
+                _background_fetches.add(task)
+                task.add_done_callback(_background_fetches.discard)
+            by_id[movie_id] = local_movie_data(rec_engine, movie_id)
+    return [dict(by_id[movie_id]) for movie_id in movie_ids]
+
+async def get_local_recommendations(rec_engine: MovieRecommender, movie_id, deadline: float,
+                                    filters: Optional[dict] = None):
+    """
+    Local KNN recommendations enriched within the deadline, None if the movie
+    is not in the catalog. Invalid filters raise ValueError.
+    """
+    if rec_engine.get_catalog_entry(movie_id) is None:
+        return None
+    raw_recs = rec_engine.get_recommendations(movie_id, **(filters or {}))
+
+    with API_STAGE_SECONDS.labels('enrich').time():
+        all_details = await get_tmdb_details_within(rec_engine, [rec['id'] for rec in raw_recs], deadline)
+    with API_STAGE_SECONDS.labels('shape').time():
+        local_recs = []
+        for rec, details in zip(raw_recs, all_details):
+            # Merge details with similarity score
+            details['similarity'] = rec['similarity']
+            local_recs.append(transform_movie_data(details))
+    return local_recs
+
+async def get_target_details(rec_engine: MovieRecommender, movie_id, deadline: float):
+    """Details of the movie recommendations are based on; catalog movies are bounded by the deadline"""
+    with API_STAGE_SECONDS.labels('target').time():
+        if rec_engine.get_catalog_entry(movie_id) is None:
+            return await get_tmdb_details(movie_id)
+        return (await get_tmdb_details_within(rec_engine, [movie_id], deadline))[0]
+
+@cached(tmdb_cache, 'search', ttl=HOUR, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL)
+async def search_tmdb_results(query, media_type='movie'):
+    """Search TMDB movies or TV shows and return the ids of the first page (Cached)"""
+    data = await tmdb.get_json(f"/search/{media_type}",
+                               {'query': query, 'page': 1, 'include_adult': 'false'}, timeout=2)
+    if data is None:
+        return None
+    return [r['id'] for r in data.get('results', [])]
+
+async def search_tmdb_ids(query, media_type='movie', limit=6):
+    """Search TMDB movies or TV shows and return the ids of the top results"""
+    return (await search_tmdb_results(query, media_type) or [])[:limit]
+
+async def search_tmdb_fallback(query):
+    """Search TMDB for a movie if not found locally"""
+    movie_ids = await search_tmdb_ids(query, limit=1)
+    if movie_ids:
+        # Return the detailed version of the first result
+        return await get_tmdb_details(movie_ids[0])
     return None
 
-@lru_cache(maxsize=64)
-def get_tmdb_recommendations_sync(movie_id):
+async def search_tmdb_multiple(query, limit=3):
+    """Search TMDB and return multiple detailed results (Concurrent)"""
+    movie_ids = await search_tmdb_ids(query, limit=limit)
+    movies = await get_tmdb_details_many(movie_ids)
+    return [m for m in movies if m]
+
+async def search_tmdb_mixed(query, movie_limit=6, tv_limit=4):
+    """Search TMDB for both movies and TV shows, return combined results"""
+    # Search movies and TV shows concurrently
+    movie_ids, tv_ids = await asyncio.gather(
+        search_tmdb_ids(query, 'movie', movie_limit),
+        search_tmdb_ids(query, 'tv', tv_limit)
+    )
+
+    # Fetch all details concurrently, movies first
+    movies, tv_shows = await asyncio.gather(
+        get_tmdb_details_many(movie_ids),
+        asyncio.gather(*(get_tmdb_tv_details(tv_id) for tv_id in tv_ids))
+    )
+    return [d for d in movies + list(tv_shows) if d]
+
+@cached(tmdb_cache, 'tv', ttl=24 * HOUR, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL)
+async def get_tmdb_tv_details(tv_id):
+    """Get TV show details from TMDB (Cached)"""
+    data = await tmdb.get_json(f"/tv/{tv_id}", timeout=2)
+    if data is None:
+        return None
+    return {
+        'id': f"tv-{data.get('id')}",  # Prefix with 'tv-' to distinguish
+        'title': data.get('name'),
+        'poster': poster_url(data.get('poster_path')),
+        'backdrop': backdrop_url(data.get('backdrop_path')),
+        'overview': data.get('overview', ''),
+        'genres': [g['name'] for g in data.get('genres', [])],
+        'vote_average': data.get('vote_average', 0),
+        'release_date': data.get('first_air_date', 'Unknown'),
+        'media_type': 'tv'
+    }
+
+@cached(tmdb_cache, 'recommendations', ttl=6 * HOUR, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL)
+async def get_tmdb_recommendations(movie_id):
     """Get recommendations from TMDB (Cached)"""
-    recs = []
-    try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}/recommendations?api_key={API_KEY}&language=en-US&page=1"
-        response = requests.get(url, timeout=2)
-        
-        if response.status_code == 200:
-            results = response.json().get('results', [])
-            for r in results[:5]: # Top 5
-                recs.append({
-                    'id': r.get('id'),
-                    'title': r.get('title'),
-                    'poster': f"https://image.tmdb.org/t/p/w500{r.get('poster_path')}" if r.get('poster_path') else "https://via.placeholder.com/500x750?text=No+Image",
-                    'similarity': 0.0 # TMDB doesn't give similarity score easily that matches ours
-                })
-    except Exception as e:
-        print(f"Error fetching recs for {movie_id}: {e}")
-    return recs
+    data = await tmdb.get_json(f"/movie/{movie_id}/recommendations", {'page': 1}, timeout=2)
+    if data is None:
+        return None
+    return [
+        {
+            'id': r.get('id'),
+            'title': r.get('title'),
+            'poster': poster_url(r.get('poster_path')),
+            'similarity': 0.0 # TMDB doesn't give similarity score easily that matches ours
+        }
+        for r in data.get('results', [])[:5] # Top 5
+    ]
 
-@lru_cache(maxsize=1) # Cache trending for a while, it doesn't change often
-def get_tmdb_trending_sync():
+# Trending changes during the week, so keep it fresh for an hour only
+@cached(tmdb_cache, 'trending', ttl=HOUR, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL)
+async def get_tmdb_trending():
     """Get trending movies from TMDB (Cached)"""
-    movies = []
-    try:
-        url = f"https://api.themoviedb.org/3/trending/movie/week?api_key={API_KEY}"
-        response = requests.get(url, timeout=2)
-        
-        if response.status_code == 200:
-            results = response.json().get('results', [])
-            for r in results:
-                movies.append(r.get('title'))
-    except Exception as e:
-        print(f"Error fetching trending: {e}")
-    return movies
+    data = await tmdb.get_json("/trending/movie/week", timeout=2)
+    if data is None:
+        return None
+    return [r.get('title') for r in data.get('results', [])]
 
 # --- API Endpoints ---
 
@@ -294,25 +459,22 @@ async def search_legacy(title: str):
     """Compatibility endpoint for frontend search"""
     try:
         # 1. Search Logic (reuse logic from search_api)
+        rec_engine = recommender
+        deadline = asyncio.get_running_loop().time() + ENRICH_BUDGET
         try:
-            local_movie = recommender.get_movie_details(title)
-            movie_details = await run_in_threadpool(get_tmdb_details_sync, local_movie['id'])
+            local_movie = rec_engine.get_movie_details(title)
+            movie_details = await get_target_details(rec_engine, local_movie['id'], deadline)
         except ValueError:
-            movie_details = await run_in_threadpool(search_tmdb_fallback_sync, title)
+            movie_details = await search_tmdb_fallback(title)
             
         if not movie_details:
              return {"error": f"Movie '{title}' not found."}
         
         # 2. Recommendation Logic (reuse logic from recommend_api)
-        local_recs = []
-        try:
-            raw_recs = recommender.get_recommendations(movie_details['title'])
-            for rec in raw_recs:
-                details = await run_in_threadpool(get_tmdb_details_sync, rec['id'])
-                details['similarity'] = rec['similarity']
-                local_recs.append(transform_movie_data(details))
-        except (ValueError, IndexError):
-             raw_recs = await run_in_threadpool(get_tmdb_recommendations_sync, movie_details['id'])
+        local_recs = await get_local_recommendations(rec_engine, movie_details['id'], deadline)
+        if local_recs is None:
+             local_recs = []
+             raw_recs = await get_tmdb_recommendations(movie_details['id']) or []
              for rec in raw_recs:
                  local_recs.append(transform_movie_data(rec))
 
@@ -332,7 +494,7 @@ async def search_api(q: str):
     """API Endpoint to search for a movie"""
     try:
         # Search TMDB for both movies (6) and TV shows (4)
-        results_list = await run_in_threadpool(search_tmdb_mixed_sync, q, movie_limit=6, tv_limit=4)
+        results_list = await search_tmdb_mixed(q, movie_limit=6, tv_limit=4)
         
         formatted_results = []
         for m in results_list:
@@ -354,33 +516,45 @@ async def search_api(q: str):
         print(f"Server Error: {e}")
         return {"success": False, "error": str(e)}
 
+def parse_filters(genres: Optional[str], year_min: Optional[int], year_max: Optional[int],
+                  media_type: Optional[str]) -> dict:
+    """Recommendation filters from query parameters; `genres` is comma-separated"""
+    return {
+        'genres': [g for g in genres.split(',') if g.strip()] if genres else None,
+        'year_min': year_min,
+        'year_max': year_max,
+        'media_type': media_type
+    }
+
 @app.get("/api/recommend/{movie_id}")
-async def recommend_api(movie_id: int):
-    """API Endpoint to get recommendations"""
+async def recommend_api(movie_id: int, genres: Optional[str] = None, year_min: Optional[int] = None,
+                        year_max: Optional[int] = None, media_type: Optional[str] = None):
+    """
+    API Endpoint to get recommendations
+
+    Optional filters (e.g. ?genres=Thriller&year_min=2010) restrict the local
+    recommendations; `genres` is comma-separated and all must match. The
+    TMDB fallback for movies outside the catalog is not filtered.
+    """
     try:
-        # Get details of the target movie first
-        movie_details = await run_in_threadpool(get_tmdb_details_sync, movie_id)
-        
-        # Try local recommendations first (needs title)
-        local_recs = []
-        try:
-            # We need the title to use the local recommender. 
-            # Ideally recommender should work with IDs too, but it uses titles.
-            # We trust the title from TMDB details matches closely enough or we use the mapping.
-            # But the local recommender `get_recommendations` takes a title.
-            raw_recs = recommender.get_recommendations(movie_details['title'])
-             
-             # Enrich recommendations with Posters
-            for rec in raw_recs:
-                details = await run_in_threadpool(get_tmdb_details_sync, rec['id'])
-                # Merge details with similarity score
-                details['similarity'] = rec['similarity']
-                local_recs.append(transform_movie_data(details))
-                
-        except (ValueError, IndexError):
+        rec_engine = recommender
+        deadline = asyncio.get_running_loop().time() + ENRICH_BUDGET
+        filters = parse_filters(genres, year_min, year_max, media_type)
+
+        # Fetch the target movie and the enriched local recommendations
+        # together; TMDB calls for catalog movies are bounded by the budget.
+        # The local recommender resolves TMDB ids directly.
+        movie_details, local_recs = await asyncio.gather(
+            get_target_details(rec_engine, movie_id, deadline),
+            get_local_recommendations(rec_engine, movie_id, deadline, filters)
+        )
+
+        if local_recs is None:
              # Fallback to TMDB recommendations
              print(f"Using TMDB fallback recommendations for ID {movie_id}")
-             raw_recs = await run_in_threadpool(get_tmdb_recommendations_sync, movie_id)
+             local_recs = []
+             with API_STAGE_SECONDS.labels('fallback').time():
+                 raw_recs = await get_tmdb_recommendations(movie_id) or []
              for rec in raw_recs:
                  local_recs.append(transform_movie_data(rec))
 
@@ -397,10 +571,273 @@ async def recommend_api(movie_id: int):
         print(f"Server Error: {e}")
         return {"success": False, "error": str(e)}
 
+def ndjson_line(event: dict) -> str:
+    """One newline-delimited JSON event"""
+    return json.dumps(event) + "\n"
+
+async def fetch_tmdb_details_quietly(movie_id):
+    """(movie_id, details) for a streamed card, details None if the fetch failed"""
+    try:
+        return movie_id, await fetch_tmdb_details(movie_id)
+    except Exception as e:
+        print(f"Error enriching {movie_id}: {e}")
+        return movie_id, None
+
+async def stream_recommendations(rec_engine: MovieRecommender, movie_id, raw_recs):
+    """
+    NDJSON events for /api/recommend/{id}/stream:
+
+        {"type": "seed", "data": {"movie": ..., "similarMovies": [...], "similarityScore": 0.0}}
+        {"type": "movie", "data": ...}      enriched details of the seed movie
+        {"type": "similar", "data": ...}    enriched details of one recommendation
+        {"type": "done", "data": {"enriched": 7, "total": 11}}
+
+    The seed event carries local catalog data (`enriched: false`) and is sent
+    before any TMDB call; each card follows as its details arrive.
+    """
+    try:
+        if raw_recs is None:
+            # Not in the catalog: nothing local to send early, use TMDB's recommendations
+            with API_STAGE_SECONDS.labels('fallback').time():
+                movie_details, tmdb_recs = await asyncio.gather(
+                    get_tmdb_details(movie_id), get_tmdb_recommendations(movie_id))
+            similar = [transform_movie_data(rec) for rec in tmdb_recs or []]
+            yield ndjson_line({"type": "seed", "data": {
+                "movie": transform_movie_data(movie_details), "similarMovies": similar, "similarityScore": 0.0}})
+            yield ndjson_line({"type": "done", "data": {"enriched": 0, "total": len(similar) + 1}})
+            return
+
+        similarity = {rec['id']: rec['similarity'] for rec in raw_recs}
+        yield ndjson_line({"type": "seed", "data": {
+            "movie": transform_movie_data(local_movie_data(rec_engine, movie_id)),
+            "similarMovies": [transform_movie_data({**local_movie_data(rec_engine, rec['id']),
+                                                    'similarity': rec['similarity']}) for rec in raw_recs],
+            "similarityScore": 0.0
+        }})
+    except Exception as e:
+        print(f"Stream Error: {e}")
+        yield ndjson_line({"type": "error", "error": str(e)})
+        return
+
+    tasks = [asyncio.ensure_future(fetch_tmdb_details_quietly(i))
+             for i in dict.fromkeys([movie_id] + [rec['id'] for rec in raw_recs])]
+    enriched = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            card_id, details = await next_done
+            if details is None:
+                continue
+            enriched += 1
+            if card_id == movie_id:
+                yield ndjson_line({"type": "movie", "data": transform_movie_data({**details, 'enriched': True})})
+            else:
+                yield ndjson_line({"type": "similar", "data": transform_movie_data(
+                    {**details, 'enriched': True, 'similarity': similarity[card_id]})})
+        yield ndjson_line({"type": "done", "data": {"enriched": enriched, "total": len(tasks)}})
+    finally:
+        # If the client went away, let unfinished fetches complete to warm the cache
+        for task in tasks:
+            if not task.done():
+                _background_fetches.add(task)
+                task.add_done_callback(_background_fetches.discard)
+
+@app.get("/api/recommend/{movie_id}/stream")
+async def recommend_stream_api(movie_id: int, genres: Optional[str] = None, year_min: Optional[int] = None,
+                               year_max: Optional[int] = None, media_type: Optional[str] = None):
+    """
+    Streaming variant of /api/recommend/{movie_id} (same filters)
+
+    Responds with newline-delimited JSON: the seed movie and the local
+    recommendations with catalog data right away, then each card again as
+    its TMDB details arrive (see `stream_recommendations`).
+    """
+    try:
+        rec_engine = recommender
+        raw_recs = None
+        if rec_engine.get_catalog_entry(movie_id) is not None:
+            raw_recs = rec_engine.get_recommendations(movie_id, **parse_filters(genres, year_min, year_max, media_type))
+    except Exception as e:
+        print(f"Server Error: {e}")
+        return {"success": False, "error": str(e)}
+
+    # Ask proxies (e.g. nginx) not to buffer, so events reach the client as they are sent
+    return StreamingResponse(stream_recommendations(rec_engine, movie_id, raw_recs),
+                             media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Largest batch and k per query, so one request cannot tie up a worker with a huge product
+MAX_BATCH_QUERIES = 100
+MAX_BATCH_K = 50
+
+class BatchRecommendRequest(BaseModel):
+    queries: List[Union[int, str]] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    k: Optional[int] = Field(None, ge=1, le=MAX_BATCH_K)
+
+@app.post("/api/recommend/batch")
+async def recommend_batch_api(body: BatchRecommendRequest):
+    """API Endpoint to get local recommendations for many movies in one call"""
+    try:
+        batch = await run_in_threadpool(recommender.get_recommendations_batch, body.queries, body.k)
+        return {
+            "success": True,
+            "data": {
+                "results": [
+                    {
+                        "query": query,
+                        "found": bool(found),
+                        "ids": [int(i) for i in ids] if found else [],
+                        "titles": titles,
+                        "similarity": [float(s) for s in sims] if found else []
+                    }
+                    for query, found, ids, titles, sims in zip(
+                        batch['query'], batch['found'], batch['ids'], batch['titles'], batch['similarity'])
+                ]
+            }
+        }
+    except Exception as e:
+        print(f"Server Error: {e}")
+        return {"success": False, "error": str(e)}
+
+class ProfileSeed(BaseModel):
+    id: int
+    weight: float = 1.0
+
+class ProfileRecommendRequest(BaseModel):
+    liked: List[ProfileSeed]
+    disliked: List[ProfileSeed] = []
+    session_id: Optional[str] = None
+    k: int = Field(10, ge=1, le=MAX_BATCH_K)
+    offset: int = Field(0, ge=0)
+    genres: Optional[List[str]] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+
+# Taste profile vectors per session, so "load more" does not rebuild them
+PROFILE_CACHE_SIZE = 1024
+_profiles = OrderedDict()
+
+def get_profile(rec_engine: MovieRecommender, body: ProfileRecommendRequest):
+    """Build a taste profile, reusing the session's cached one if its seeds are unchanged"""
+    liked = {seed.id: seed.weight for seed in body.liked}
+    disliked = {seed.id: seed.weight for seed in body.disliked}
+    # A profile is only valid for the index it was built from
+    key = (index_version, tuple(sorted(liked.items())), tuple(sorted(disliked.items())))
+    if body.session_id is not None:
+        entry = _profiles.get(body.session_id)
+        if entry is not None and entry[0] == key:
+            _profiles.move_to_end(body.session_id)
+            return entry[1]
+
+    profile = rec_engine.build_profile(liked, disliked)
+    if body.session_id is not None:
+        _profiles[body.session_id] = (key, profile)
+        _profiles.move_to_end(body.session_id)
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+    return profile
+
+@app.post("/api/recommend/profile")
+async def recommend_profile_api(body: ProfileRecommendRequest):
+    """API Endpoint to get recommendations for several liked (and disliked) movies"""
+    try:
+        rec_engine = recommender
+        deadline = asyncio.get_running_loop().time() + ENRICH_BUDGET
+        profile, seed_rows, missing = get_profile(rec_engine, body)
+        raw_recs = rec_engine.recommend_profile(profile, seed_rows, k=body.k, offset=body.offset,
+                                                genres=body.genres, year_min=body.year_min,
+                                                year_max=body.year_max)
+
+        with API_STAGE_SECONDS.labels('enrich').time():
+            all_details = await get_tmdb_details_within(rec_engine, [rec['id'] for rec in raw_recs], deadline)
+        movies = []
+        for rec, details in zip(raw_recs, all_details):
+            details['similarity'] = rec['similarity']
+            movies.append(transform_movie_data(details))
+
+        return {
+            "success": True,
+            "data": {
+                "similarMovies": movies,
+                "missing": missing,
+                "offset": body.offset
+            }
+        }
+    except Exception as e:
+        print(f"Server Error: {e}")
+        return {"success": False, "error": str(e)}
+
+@app.get("/api/describe")
+async def describe_api(q: str, genres: Optional[str] = None, k: int = Query(10, ge=1, le=MAX_BATCH_K),
+                       offset: int = Query(0, ge=0), year_min: Optional[int] = None,
+                       year_max: Optional[int] = None):
+    """API Endpoint to find movies matching a free-text description (e.g. ?q=heist in space&genres=Action)"""
+    try:
+        rec_engine = recommender
+        deadline = asyncio.get_running_loop().time() + ENRICH_BUDGET
+        genre_hints = [g for g in genres.split(',') if g.strip()] if genres else None
+        raw_recs = rec_engine.describe(q, genre_hints, k=k, offset=offset, year_min=year_min, year_max=year_max)
+
+        with API_STAGE_SECONDS.labels('enrich').time():
+            all_details = await get_tmdb_details_within(rec_engine, [rec['id'] for rec in raw_recs], deadline)
+        movies = []
+        for rec, details in zip(raw_recs, all_details):
+            details['similarity'] = rec['similarity']
+            movies.append(transform_movie_data(details))
+
+        return {
+            "success": True,
+            "data": {
+                "query": q,
+                "results": movies,
+                "offset": offset
+            }
+        }
+    except Exception as e:
+        print(f"Server Error: {e}")
+        return {"success": False, "error": str(e)}
+
+@app.post("/api/admin/reload")
+async def reload_index_api(request: Request):
+    """Rebuild the recommender from disk and swap it in without downtime"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return JSONResponse({"success": False, "error": "Forbidden"}, status_code=403)
+    try:
+        generation = current_generation(INDEX_STORE)
+        new_recommender = await run_in_threadpool(build_recommender, generation)
+        version = swap_recommender(new_recommender, generation)
+        return {
+            "success": True,
+            "data": {"version": version, "generation": generation, "movies": len(new_recommender.catalog)}
+        }
+    except Exception as e:
+        print(f"Reload Error: {e}")
+        return {"success": False, "error": str(e)}
+
+@app.get("/api/cache/stats")
+async def cache_stats_api():
+    """Hit/miss statistics of the TMDB cache for this worker"""
+    return {"success": True, "data": tmdb_cache.report()}
+
+@app.get("/api/upstream/stats")
+async def upstream_stats_api():
+    """TMDB circuit breaker state and hedging counts for this worker"""
+    return {
+        "success": True,
+        "data": {
+            "circuit": {"state": tmdb.breaker.state, **tmdb.breaker.stats},
+            "hedging": dict(tmdb.hedger.stats)
+        }
+    }
+
+@app.get("/metrics")
+async def metrics_api():
+    """Prometheus metrics for this worker"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/api/movie/{movie_id}")
 async def movie_details_api(movie_id: int):
     try:
-        movie_details = await run_in_threadpool(get_tmdb_details_sync, movie_id)
+        movie_details = await get_tmdb_details(movie_id)
         return {
             "success": True,
             "data": transform_movie_data(movie_details)
@@ -412,7 +849,7 @@ async def movie_details_api(movie_id: int):
 async def trending_api():
     """API Endpoint to get trending movie titles"""
     try:
-        titles = await run_in_threadpool(get_tmdb_trending_sync)
+        titles = await get_tmdb_trending() or []
         return {
             "success": True,
             "data": titles
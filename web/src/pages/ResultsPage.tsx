@@ -1,10 +1,10 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { SearchBar } from '../components/SearchBar';
 import { Navbar } from '../components/Navbar';
 import { HeroDetails } from '../components/HeroDetails';
 import { MovieGrid } from '../components/MovieGrid';
 import { ProjectDetails } from '../components/ProjectDetails';
-import { getRecommendations } from '../utils/api';
+import { streamRecommendations, getMovieDetails } from '../utils/api';
 import { Movie } from '../types';
 import { ChevronDownIcon } from '../components/Icons';
 
@@ -18,6 +18,10 @@ export const ResultsPage: React.FC<ResultsPageProps> = ({ initialMovie, onSelect
     const [currentMovie, setCurrentMovie] = useState<Movie | null>(initialMovie);
     const [recommendations, setRecommendations] = useState<Movie[]>([]);
     const [loading, setLoading] = useState(false);
+    const streamRef = useRef<AbortController | null>(null);
+
+    // Stop applying updates from a previous movie's stream when the page goes away
+    useEffect(() => () => streamRef.current?.abort(), []);
 
     // When initialMovie changes (from parent navigation or search), update local state and fetch fresh recs
     useEffect(() => {
@@ -30,17 +34,54 @@ export const ResultsPage: React.FC<ResultsPageProps> = ({ initialMovie, onSelect
         setLoading(true);
         setCurrentMovie(movie);
 
-        // Fetch Recommendations based on the new movie
-        // Note: We might want to avoid re-fetching if we already have them, 
-        // but typically a new selection means new recommendations.
-        const recRes = await getRecommendations(movie.id);
+        // Stream recommendations: local results show up at once, cards fill in as TMDB answers
+        streamRef.current?.abort();
+        const controller = new AbortController();
+        streamRef.current = controller;
+        let seeded = false;
+        const recRes = await streamRecommendations(movie.id, (event) => {
+            if (event.type === 'seed') {
+                setCurrentMovie(event.data.movie);
+                setRecommendations(event.data.similarMovies);
+                setLoading(false);
+                seeded = true;
+                window.scrollTo({ top: 0, behavior: 'smooth' });
+            } else if (event.type === 'movie') {
+                setCurrentMovie((prev) => (prev && prev.id === event.data.id ? { ...event.data, matchPercentage: prev.matchPercentage } : prev));
+            } else if (event.type === 'similar') {
+                setRecommendations((prev) => prev.map((m) => (m.id === event.data.id ? event.data : m)));
+            }
+        }, controller.signal);
+        if (controller.signal.aborted) return;
         if (recRes.success) {
             setCurrentMovie(recRes.data.movie);
             setRecommendations(recRes.data.similarMovies);
+            // Whatever the stream could not enrich is fetched one by one
+            fillPartialMovies(recRes.data.movie, recRes.data.similarMovies);
         }
         setLoading(false);
 
-        window.scrollTo({ top: 0, behavior: 'smooth' });
+        if (!seeded) window.scrollTo({ top: 0, behavior: 'smooth' });
+    };
+
+    // Movies the server sent without TMDB details (slow upstream) are filled in lazily
+    const fillPartialMovies = (movie: Movie, similarMovies: Movie[]) => {
+        if (movie.enriched === false) {
+            getMovieDetails(movie.id).then((res) => {
+                if (res.success) {
+                    setCurrentMovie((prev) => (prev && prev.id === movie.id ? { ...res.data, matchPercentage: prev.matchPercentage } : prev));
+                }
+            });
+        }
+        similarMovies.filter((m) => m.enriched === false).forEach((partial) => {
+            getMovieDetails(partial.id).then((res) => {
+                if (res.success) {
+                    setRecommendations((prev) => prev.map((m) =>
+                        m.id === partial.id ? { ...res.data, matchPercentage: m.matchPercentage } : m
+                    ));
+                }
+            });
+        });
     };
 
     // Wrapper for the Navbar's search
@@ -8,6 +8,8 @@ export interface Movie {
     releaseDate: string | null;
     rating: number | null;
     matchPercentage?: number;
+    // false when the server answered with local catalog data because TMDB was slow
+    enriched?: boolean;
 }
 
 export interface SearchResult {
@@ -27,3 +29,11 @@ export interface ApiResponse<T> {
     data: T;
     error?: string;
 }
+
+// One line of /api/recommend/{id}/stream
+export type RecommendationStreamEvent =
+    | { type: 'seed'; data: RecommendationResult }
+    | { type: 'movie'; data: Movie }
+    | { type: 'similar'; data: Movie }
+    | { type: 'done'; data: { enriched: number; total: number } }
+    | { type: 'error'; error: string };
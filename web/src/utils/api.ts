@@ -1,4 +1,4 @@
-import { ApiResponse, SearchResult, RecommendationResult, Movie } from '../types';
+import { ApiResponse, SearchResult, RecommendationResult, RecommendationStreamEvent, Movie } from '../types';
 
 // API Base URL - will be updated with your Render backend URL
 // For now, empty string works in development (same origin)
@@ -38,6 +38,69 @@ export async function getRecommendations(movieId: string): Promise<ApiResponse<R
     }
 }
 
+/**
+ * Stream recommendations: the seed movie and its local recommendations arrive
+ * first (with `enriched: false`), then each card again once its TMDB details are in.
+ * Resolves with the final result; falls back to getRecommendations if streaming fails.
+ */
+export async function streamRecommendations(
+    movieId: string,
+    onEvent: (event: RecommendationStreamEvent) => void,
+    signal?: AbortSignal
+): Promise<ApiResponse<RecommendationResult>> {
+    let result: RecommendationResult | null = null;
+    try {
+        const response = await fetch(`${API_BASE}/api/recommend/${movieId}/stream`, { signal });
+        if (!response.ok) throw new Error('Network response was not ok');
+        if (!response.body || !response.headers.get('content-type')?.includes('ndjson')) {
+            // Errors before the stream starts come back as a regular JSON response
+            const data = await response.json();
+            if (data.success === false) return await getRecommendations(movieId);
+            throw new Error('Unexpected response');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value, { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = done ? '' : lines.pop() ?? '';
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line) as RecommendationStreamEvent;
+                if (event.type === 'error') throw new Error(event.error);
+                if (event.type === 'seed') {
+                    result = event.data;
+                } else if (event.type === 'movie' && result) {
+                    result = { ...result, movie: { ...event.data, matchPercentage: result.movie.matchPercentage } };
+                } else if (event.type === 'similar' && result) {
+                    result = {
+                        ...result,
+                        similarMovies: result.similarMovies.map((m) => (m.id === event.data.id ? event.data : m))
+                    };
+                }
+                onEvent(event);
+            }
+            if (done) break;
+        }
+        if (!result) throw new Error('Stream ended before any recommendations');
+        return { success: true, data: result };
+    } catch (error) {
+        if (signal?.aborted) {
+            return { success: false, data: result ?? { movie: { id: movieId } as Movie, similarMovies: [], similarityScore: 0 }, error: 'aborted' };
+        }
+        if (result) {
+            // The seed already arrived; keep what we have
+            console.error('Recommendation Stream Error:', error);
+            return { success: true, data: result };
+        }
+        console.error('Recommendation Stream Error, retrying without streaming:', error);
+        return await getRecommendations(movieId);
+    }
+}
+
 export async function getMovieDetails(movieId: string): Promise<ApiResponse<Movie>> {
     try {
         const response = await fetch(`${API_BASE}/api/movie/${movieId}`);